@@ -0,0 +1,58 @@
+"""
+Tuned S3 clients shared by the transfer scripts.
+
+A default boto3 client keeps at most 10 pooled connections, so with more
+worker threads than that, requests queue for a connection, urllib3 logs
+"connection pool is full" and connections are dropped and re-opened. The
+factory builds one client per run with the pool sized for every thread that
+will use it. The client also gets adaptive retry mode, which adds client-side
+rate limiting when S3 throttles, and TCP keepalive so long-lived idle
+connections survive between requests. boto3 clients are thread-safe once
+created, so all workers share the one client. Sessions are not thread-safe,
+so every client is built from a fresh session.
+"""
+
+from typing import Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+DEFAULT_MAX_POOL_CONNECTIONS = 64
+
+# botocore's own attempts per request; the scripts' RetryPolicy handles the
+# longer backoff on top, so this stays small
+DEFAULT_MAX_ATTEMPTS = 3
+
+DEFAULT_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+DEFAULT_TRANSFER_CONCURRENCY = 10
+
+
+def s3_config_kwargs(max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+                     max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> dict:
+    """Client settings as keyword arguments, for botocore's Config or aiobotocore's AioConfig."""
+    return {
+        'max_pool_connections': max_pool_connections,
+        'retries': {'mode': 'adaptive', 'total_max_attempts': max_attempts},
+        'tcp_keepalive': True,
+        'connect_timeout': 10,
+        'read_timeout': 120,
+    }
+
+
+def make_s3_client(profile: Optional[str] = None, endpoint_url: Optional[str] = None,
+                   max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+                   max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """Create an S3 client sized for ``max_pool_connections`` concurrent requests, safe to share across threads."""
+    session = boto3.Session(profile_name=profile) if profile else boto3.Session()
+    config = Config(**s3_config_kwargs(max_pool_connections, max_attempts))
+    return session.client('s3', endpoint_url=endpoint_url, config=config)
+
+
+def make_transfer_config(multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                         multipart_chunksize: int = DEFAULT_MULTIPART_CHUNKSIZE,
+                         max_concurrency: int = DEFAULT_TRANSFER_CONCURRENCY) -> TransferConfig:
+    """TransferConfig for the managed download_file/upload_file helpers."""
+    return TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunksize,
+                          max_concurrency=max_concurrency, use_threads=max_concurrency > 1)
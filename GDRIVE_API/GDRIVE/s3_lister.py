@@ -0,0 +1,142 @@
+"""
+Parallel S3 listing for the transfer scripts.
+
+A single ListObjectsV2 stream returns at most 1000 keys per call, strictly one
+call after another. The lister first discovers common prefixes with
+Delimiter='/' down to a configurable depth, then paginates all of those
+sub-prefixes concurrently and merges their streams, so a bucket with tens of
+millions of keys lists at the combined rate of many paginators.
+
+Objects come out in no particular order across sub-prefixes, but each listing
+stream (one prefix paginated in key order) is itself ordered, which is what
+resumable callers checkpoint against.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LIST_DEPTH = 2
+DEFAULT_LIST_WORKERS = 16
+
+# Marks the end of the merged stream
+_DONE = object()
+
+
+class ParallelS3Lister:
+    """Lists everything under a prefix with several ListObjectsV2 streams at once.
+
+    Up to ``depth`` levels below the prefix are walked with Delimiter='/';
+    each common prefix found there is listed on its own worker thread. With
+    ``depth=0`` this is a single plain paginator. ``retry_policy`` (optional)
+    wraps every ListObjectsV2 call.
+    """
+
+    def __init__(self, s3_client, depth=DEFAULT_LIST_DEPTH, workers=DEFAULT_LIST_WORKERS,
+                 retry_policy=None, queue_size=10000):
+        self.s3_client = s3_client
+        self.depth = max(0, depth)
+        self.workers = max(1, workers)
+        self.retry_policy = retry_policy
+        self.queue_size = queue_size
+
+    def _pages(self, bucket, prefix, delimited, start_after=None):
+        kwargs = {'Bucket': bucket, 'Prefix': prefix}
+        if delimited:
+            kwargs['Delimiter'] = '/'
+        if start_after:
+            kwargs['StartAfter'] = start_after
+        while True:
+            if self.retry_policy:
+                page = self.retry_policy.run(self.s3_client.list_objects_v2, **kwargs)
+            else:
+                page = self.s3_client.list_objects_v2(**kwargs)
+            yield page
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+    def iter_objects(self, bucket, prefix=''):
+        """Yield every object under ``prefix`` as ListObjectsV2 'Contents' entries.
+
+        Listing runs ahead of the consumer by at most ``queue_size`` objects. The
+        first listing error is re-raised here, and closing the generator early
+        stops the workers.
+        """
+        for event, _, item in self.iter_events(bucket, prefix):
+            if event == 'object':
+                yield item
+
+    def iter_events(self, bucket, prefix='', streams=None, known_streams=()):
+        """Like iter_objects(), but also reports the listing streams.
+
+        Yields ``('stream', stream_prefix, level)`` when a sub-prefix stream is
+        discovered, ``('object', stream_prefix, obj)`` for each object and
+        ``('end', stream_prefix, None)`` once a stream has been listed completely.
+
+        ``streams`` restarts listing from saved ``(stream_prefix, level,
+        start_after)`` tuples instead of ``prefix``; sub-prefixes listed in
+        ``known_streams`` are never started again.
+        """
+        if streams is None:
+            streams = [(prefix, 0, None)]
+        if not streams:
+            return
+        out = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        lock = threading.Lock()
+        known = set(known_streams)
+        known.update(stream_prefix for stream_prefix, _, _ in streams)
+        pending = [len(streams)]
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=1)
+                    return
+                except queue.Full:
+                    pass
+
+        def walk(sub_prefix, level, start_after=None):
+            try:
+                for page in self._pages(bucket, sub_prefix, level < self.depth, start_after):
+                    # Sub-prefixes are reported before the page's objects, so a
+                    # checkpoint never moves past a stream it has not recorded
+                    for common in page.get('CommonPrefixes', []):
+                        child = common['Prefix']
+                        with lock:
+                            # A restarted parent can report sub-prefixes again
+                            if child in known:
+                                continue
+                            known.add(child)
+                            pending[0] += 1
+                        put(('stream', child, level + 1))
+                        executor.submit(walk, child, level + 1)
+                    for obj in page.get('Contents', []):
+                        put(('object', sub_prefix, obj))
+                    if stop.is_set():
+                        return
+                put(('end', sub_prefix, None))
+            except Exception as e:
+                put(e)
+            finally:
+                with lock:
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    put(_DONE)
+
+        for stream_prefix, level, start_after in streams:
+            executor.submit(walk, stream_prefix, level, start_after)
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -7,6 +7,8 @@ from GDRIVE.gup import *
 from GDRIVE.gdown import *
 from GDRIVE.s3_to_gdrive import *
 from GDRIVE.gdrive_to_s3 import GDriveToS3Transfer
+from GDRIVE.s3_client import make_s3_client
+from GDRIVE.s3_lister import DEFAULT_LIST_DEPTH, DEFAULT_LIST_WORKERS, ParallelS3Lister
 import typer
 app=typer.Typer()
 
@@ -52,13 +54,13 @@ def s3_to_gdrive_transfer(
 @app.command()
 def list_s3_files(
     s3_path: str = typer.Argument(..., help="S3 path to list"),
-    aws_profile: str = typer.Option(None, "--profile", "-p", help="AWS profile name")):
+    aws_profile: str = typer.Option(None, "--profile", "-p", help="AWS profile name"),
+    list_depth: int = typer.Option(DEFAULT_LIST_DEPTH, "--list-depth",
+                                   help="Folder levels to fan out over when listing (0 = single listing stream)"),
+    list_workers: int = typer.Option(DEFAULT_LIST_WORKERS, "--list-workers",
+                                     help="Number of concurrent listing streams")):
     try:
-        if aws_profile:
-            session = boto3.Session(profile_name=aws_profile)
-            s3_client = session.client('s3')
-        else:
-            s3_client = boto3.client('s3')
+        s3_client = make_s3_client(aws_profile, max_pool_connections=list_workers + 4)
         
         s3_path = s3_path.replace('s3://', '')
         parts = s3_path.split('/', 1)
@@ -67,19 +69,17 @@ def list_s3_files(
         
         console.print(f"\n[cyan]Listing:[/cyan] s3://{bucket}/{prefix}\n")
         
-        paginator = s3_client.get_paginator('list_objects_v2')
+        lister = ParallelS3Lister(s3_client, depth=list_depth, workers=list_workers)
         count = 0
+        rows=[]
         
-        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-            rows=[]
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    if not obj['Key'].endswith('/'):
-                        row={}
-                        row['S3PATH']=obj['Key']
-                        console.print(f"  📄 {obj['Key']}")
-                        count += 1
-                        rows.append(row)
+        for obj in lister.iter_objects(bucket, prefix):
+            if not obj['Key'].endswith('/'):
+                row={}
+                row['S3PATH']=obj['Key']
+                console.print(f"  📄 {obj['Key']}")
+                count += 1
+                rows.append(row)
                         
         write_csv("S3_file_Metadata.csv",["S3PATH"],rows)
         console.print(f"\n[green]Total files: {count}[/green]")
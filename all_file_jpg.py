@@ -5,13 +5,14 @@ import gc
 import time
 import shutil
 import tempfile
+import threading
 from pathlib import Path
 from typing import Tuple
 
 import typer
 from PIL import Image
 from pillow_heif import register_heif_opener
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from concurrent.futures import ThreadPoolExecutor,as_completed
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -21,6 +22,8 @@ from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn, TimeElapsedColumn, MofNCompleteColumn
 
+from byte_budget import ByteBudget, parse_size
+
 import pickle
 
 
@@ -31,8 +34,11 @@ register_heif_opener()
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 app = typer.Typer(help="SAFE PDF/Image to JPG converter from Google Drive")
 
+# Render resolution for PDF pages
+PDF_DPI = 300
+
 # ---------------- GOOGLE DRIVE AUTH ----------------
-def get_gdrive_service():
+def get_gdrive_credentials():
     creds = None
     if os.path.exists("token.pickle"):
         with open("token.pickle", "rb") as f:
@@ -50,7 +56,11 @@ def get_gdrive_service():
         with open("token.pickle", "wb") as f:
             pickle.dump(creds, f)
 
-    return build("drive", "v3", credentials=creds)
+    return creds
+
+
+def get_gdrive_service(creds=None):
+    return build("drive", "v3", credentials=creds or get_gdrive_credentials())
 
 
 # ---------------- HELPERS ----------------
@@ -81,25 +91,52 @@ def detect_file_type(path: Path) -> str:
     return "unknown"
 
 
-def download_drive_file(service, file_id: str, dest: str):
+def conversion_size(path: Path) -> int:
+    """Estimate the bytes convert_to_jpg() holds in memory for this file.
+
+    Images count their decoded size plus the RGB copy; PDFs count the first
+    page rendered at PDF_DPI, read from the page size pdfinfo reports.
+    """
+    file_type = detect_file_type(path)
+
+    if file_type == "image":
+        with Image.open(path) as img:
+            width, height = img.size
+            return width * height * (len(img.getbands()) + 3)
+
+    if file_type == "pdf":
+        try:
+            page_size = pdfinfo_from_path(str(path), first_page=1, last_page=1)["Page size"]
+            width_pts, height_pts = (float(v) for v in page_size.split()[0:3:2])
+        except Exception:
+            width_pts, height_pts = 612, 792  # US Letter
+        return int(width_pts / 72 * PDF_DPI) * int(height_pts / 72 * PDF_DPI) * 3
+
+    return 0
+
+
+def download_drive_file(service, file_id: str, dest: str, budget: ByteBudget = None):
     meta = service.files().get(
         fileId=file_id,
-        fields="mimeType,name"
+        fields="mimeType,name,size"
     ).execute()
 
     if meta["mimeType"].startswith("application/vnd.google-apps"):
         raise ValueError("Google Docs/Sheets/Slides not supported")
 
-    request = service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, request)
+    # The whole file is buffered, so hold its size against the in-flight budget
+    budget = budget or ByteBudget()
+    with budget.reserve(int(meta.get("size", 0))):
+        request = service.files().get_media(fileId=file_id)
+        fh = io.BytesIO()
+        downloader = MediaIoBaseDownload(fh, request)
 
-    done = False
-    while not done:
-        _, done = downloader.next_chunk()
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
 
-    with open(dest, "wb") as f:
-        f.write(fh.getvalue())
+        with open(dest, "wb") as f:
+            f.write(fh.getvalue())
 
 
 def upload_to_drive(service, file_path: str, folder_id: str, name: str) -> str:
@@ -169,9 +206,12 @@ def convert_to_jpg(input_path: Path, output_dir: Path) -> Path:
         img.close()
 
     elif file_type == "pdf":
+        # Only the first page is kept, so only the first page is rendered
         images = convert_from_path(
             str(input_path),
-            dpi=300,
+            dpi=PDF_DPI,
+            first_page=1,
+            last_page=1,
             thread_count=1,  # must be 1 for stability
         )
         img = images[0]
@@ -198,12 +238,17 @@ def csv_gdrive(
     folder_id: str,
     output_csv: str = "output.csv",
     column: str = "drive_link",
+    max_inflight_bytes: str = typer.Option(None, help="Cap on downloaded and decoded data held in memory, e.g. 2G or 512M"),
 ):
+    try:
+        budget = ByteBudget(parse_size(max_inflight_bytes) if max_inflight_bytes else None)
+    except ValueError as e:
+        typer.echo(f"Error: {e}", err=True)
+        raise typer.Exit(1)
+
     with open(csv_input, newline="", encoding="utf-8") as f:
         rows = list(csv.DictReader(f))
 
-    results = []
-
     progress = Progress(
         SpinnerColumn(),
         TextColumn("[bold blue]{task.description}"),
@@ -213,63 +258,81 @@ def csv_gdrive(
         TimeElapsedColumn(),
     )
 
-    with progress:
-        task = progress.add_task("Processing files...", total=len(rows))
-        with ThreadPoolExecutor(max_workers=8) as e:
-
-            for idx, row in enumerate(rows):
-                old_link = row.get(column, "").strip()
-
-                try:
-                    if not old_link:
-                        raise ValueError("Empty link")
-
-                    service = get_gdrive_service()
-                    file_id = extract_file_id(old_link)
-
-                    # 🔧 GET ORIGINAL FILENAME FROM DRIVE
-                    meta = service.files().get(
-                        fileId=file_id,
-                        fields="name"
-                    ).execute()
-                    original_name = Path(meta["name"]).stem  # filename without extension
-
-                    temp_dir = tempfile.mkdtemp()
-                    inp = Path(temp_dir) / "input"
-
-                    # 1️⃣ Download
-                    download_drive_file(service, file_id, str(inp))
-
-                    # 2️⃣ Convert
-                    out = convert_to_jpg(inp, Path(temp_dir))
+    # Log in (or refresh the token) once; the workers share these credentials
+    # and never read or rewrite token.pickle themselves
+    creds = get_gdrive_credentials()
+    local = threading.local()
+
+    def thread_service():
+        # One service per thread: httplib2 connections are not thread-safe
+        if not hasattr(local, "service"):
+            local.service = get_gdrive_service(creds)
+        return local.service
+
+    def process_row(row: dict) -> dict:
+        old_link = row.get(column, "").strip()
+        temp_dir = None
+
+        try:
+            if not old_link:
+                raise ValueError("Empty link")
+
+            service = thread_service()
+            file_id = extract_file_id(old_link)
+
+            # 🔧 GET ORIGINAL FILENAME FROM DRIVE
+            meta = service.files().get(
+                fileId=file_id,
+                fields="name"
+            ).execute()
+            original_name = Path(meta["name"]).stem  # filename without extension
+
+            temp_dir = tempfile.mkdtemp()
+            inp = Path(temp_dir) / "input"
+
+            # 1️⃣ Download (waits for room in the in-flight budget)
+            download_drive_file(service, file_id, str(inp), budget)
+
+            # 2️⃣ Convert (the decoded image is held against the budget too)
+            with budget.reserve(conversion_size(inp)):
+                out = convert_to_jpg(inp, Path(temp_dir))
+
+            # 3️⃣ Upload with ORIGINAL name + .jpg
+            new_link = upload_to_drive(
+                service,
+                str(out),
+                folder_id,
+                f"{original_name}.jpg"  # 🔧 USE ORIGINAL NAME
+            )
 
-                    # 3️⃣ Upload with ORIGINAL name + .jpg
-                    new_link = upload_to_drive(
-                        service,
-                        str(out),
-                        folder_id,
-                        f"{original_name}.jpg"  # 🔧 USE ORIGINAL NAME
-                    )
+            status = "Success"
 
-                    status = "Success"
+        except Exception as e:
+            new_link = ""
+            status = str(e)
 
-                except Exception as e:
-                    new_link = ""
-                    status = str(e)
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            gc.collect()
+            progress.advance(task)
 
-                finally:
-                    shutil.rmtree(temp_dir, ignore_errors=True)
-                    gc.collect()
-                    progress.advance(task)
+        time.sleep(0.5)
 
-                results.append({
-                    **row,
-                    "old_drive_link": old_link,
-                    "new_drive_link": new_link,
-                    "status": status
-                })
+        return {
+            **row,
+            "old_drive_link": old_link,
+            "new_drive_link": new_link,
+            "status": status
+        }
 
-                time.sleep(0.5)
+    with progress:
+        task = progress.add_task("Processing files...", total=len(rows))
+        # Rows run concurrently; the budget keeps the downloads and decoded
+        # images held at once under --max-inflight-bytes. map() keeps the
+        # input order.
+        with ThreadPoolExecutor(max_workers=8) as e:
+            results = list(e.map(process_row, rows))
 
         with open(output_csv, "w", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=results[0].keys())
@@ -0,0 +1,106 @@
+"""
+Shared in-flight memory budget for the Drive and S3 transfer scripts.
+
+Worker count alone does not bound memory when workers buffer whole files: a
+handful of multi-GB files fetched at once can exhaust the host. Workers reserve
+the bytes they are about to hold in memory before fetching, so the total held
+across all workers stays under one configurable limit whatever the mix of file
+sizes.
+
+Thread workers use reserve(); coroutines use reserve_async(), which waits on
+the event loop instead of blocking it. Both draw on the same counter.
+"""
+
+import asyncio
+import re
+from contextlib import asynccontextmanager, contextmanager
+from threading import Condition
+from typing import Optional
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte count such as '2G', '512M', '1.5GB' or '1048576'."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)(?:I?B)?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size '{value}' (expected e.g. 2G, 512M or a byte count)")
+    number, unit = match.groups()
+    return int(float(number) * SIZE_UNITS[unit.upper()])
+
+
+class ByteBudget:
+    """Counting semaphore over bytes instead of slots.
+
+    A reservation larger than the whole budget is clamped to it, so an oversized
+    file still transfers, just with nothing else in flight. ``max_bytes=None``
+    disables the limit.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.condition = Condition()
+        # (loop, future) of coroutines waiting for a release
+        self.waiters = []
+
+    def _clamp(self, size: int) -> int:
+        return max(0, min(int(size), self.max_bytes))
+
+    def acquire(self, size: int) -> int:
+        """Block until ``size`` bytes fit in the budget; returns the amount reserved."""
+        if self.max_bytes is None:
+            return 0
+        size = self._clamp(size)
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight + size <= self.max_bytes)
+            self.in_flight += size
+        return size
+
+    async def acquire_async(self, size: int) -> int:
+        """As acquire(), but waits without blocking the running event loop."""
+        if self.max_bytes is None:
+            return 0
+        size = self._clamp(size)
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                if self.in_flight + size <= self.max_bytes:
+                    self.in_flight += size
+                    return size
+                waiter = loop.create_future()
+                self.waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, size: int):
+        if self.max_bytes is None or not size:
+            return
+        with self.condition:
+            self.in_flight -= size
+            self.condition.notify_all()
+            waiters, self.waiters = self.waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    @contextmanager
+    def reserve(self, size: int):
+        """Hold ``size`` bytes of the budget for the duration of the block."""
+        reserved = self.acquire(size)
+        try:
+            yield
+        finally:
+            self.release(reserved)
+
+    @asynccontextmanager
+    async def reserve_async(self, size: int):
+        """As reserve(), for coroutines."""
+        reserved = await self.acquire_async(size)
+        try:
+            yield
+        finally:
+            self.release(reserved)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
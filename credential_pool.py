@@ -0,0 +1,279 @@
+"""
+Pool of Google credentials for the Drive scripts.
+
+Drive quotas apply per user and per project, so a single OAuth token caps
+throughput however many workers run. The pool holds several credentials
+(OAuth token pickles and/or service-account keys) and hands each Drive call a
+service bound to one of them. The credential is picked least-loaded (fewest
+requests in flight) or round-robin. Each credential has its own token-bucket
+rate limiter and its own backoff state, so one throttled credential slows
+down alone while work moves to the others.
+
+Retrying helpers take the pool itself (see pick_service), so a retry after a
+throttled response is sent with a newly picked credential. The async engines
+draw bearer tokens from the same pool through gup_async.TokenProvider.
+
+Every credential in the pool must have access to the folders being read or
+written, e.g. through a shared drive or by sharing the folder with each
+service account.
+"""
+
+import itertools
+import pickle
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build
+from googleapiclient.http import DEFAULT_HTTP_TIMEOUT_SEC
+
+from retry_policy import RETRYABLE_403_REASONS
+
+POOL_STRATEGIES = ('least-loaded', 'round-robin')
+
+# Per-credential backoff after a throttled response, doubled while throttling lasts
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 64.0
+
+
+class RateLimiter:
+    """Token bucket: at most ``rate`` requests per second, bursts up to ``burst``. ``rate=None`` never waits.
+
+    The default burst of one spaces requests evenly, so no one-second window
+    sees more than about ``rate`` of them. ``clock`` returns monotonic seconds.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token now, even if that leaves the bucket in debt; returns the seconds to wait it off."""
+        if not self.rate:
+            return 0.0
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self):
+        # The debt is slept off outside the lock
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+
+class PooledCredential:
+    """One credential with its own rate limiter, backoff state and request counters."""
+
+    def __init__(self, name: str, creds, rate: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.creds = creds
+        self.clock = clock
+        self.limiter = RateLimiter(rate, clock=clock)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled_count = 0
+        self.backoff = 0.0
+        self.backoff_until = 0.0
+
+    def backing_off(self) -> bool:
+        return self.clock() < self.backoff_until
+
+    def turn_delay(self) -> float:
+        """Seconds until this credential is out of backoff and under its rate limit; takes the rate token."""
+        return max(self.backoff_until - self.clock(), self.limiter.reserve(), 0.0)
+
+    def wait_turn(self):
+        """Block until this credential is out of backoff and under its rate limit."""
+        delay = self.turn_delay()
+        if delay > 0:
+            time.sleep(delay)
+
+    def started(self):
+        with self.lock:
+            self.in_flight += 1
+            self.requests += 1
+
+    def finished(self, status: Optional[int] = None, content: bytes = b'', retry_after: Optional[str] = None):
+        """Record a request's outcome; ``status`` is None when no response came back."""
+        with self.lock:
+            self.in_flight -= 1
+        if status is None:
+            return
+        if is_throttled(status, content):
+            try:
+                self.throttled(float(retry_after))
+            except (TypeError, ValueError):
+                self.throttled()
+        else:
+            self.succeeded()
+
+    def throttled(self, retry_after: Optional[float] = None):
+        with self.lock:
+            self.throttled_count += 1
+            now = self.clock()
+            # Requests already in flight come back throttled together; only
+            # the first one after the previous backoff expired escalates it
+            if now >= self.backoff_until:
+                self.backoff = min(MAX_BACKOFF, max(BASE_BACKOFF, self.backoff * 2))
+            self.backoff_until = max(self.backoff_until, now + max(self.backoff, retry_after or 0.0))
+
+    def succeeded(self):
+        with self.lock:
+            self.backoff = 0.0
+
+
+def is_throttled(status: int, content: bytes) -> bool:
+    if status == 429:
+        return True
+    if status == 403:
+        text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else str(content)
+        return any(reason in text for reason in RETRYABLE_403_REASONS)
+    return False
+
+
+class ThrottledHttp(httplib2.Http):
+    """httplib2 transport that paces requests through a credential's limiter and records throttling."""
+
+    def __init__(self, credential: PooledCredential):
+        super().__init__(timeout=socket.getdefaulttimeout() or DEFAULT_HTTP_TIMEOUT_SEC)
+        self.credential = credential
+        # As googleapiclient's own build_http(): Drive answers resumable upload
+        # chunks with 308, which must not be followed as a redirect
+        self.redirect_codes = self.redirect_codes - {308}
+
+    def request(self, *args, **kwargs):
+        credential = self.credential
+        credential.wait_turn()
+        credential.started()
+        resp = content = None
+        try:
+            resp, content = super().request(*args, **kwargs)
+        finally:
+            if resp is None:
+                credential.finished()
+            else:
+                credential.finished(resp.status, content, resp.get('retry-after'))
+        return resp, content
+
+
+def load_credentials(path: str, scopes: List[str]):
+    """Load a service-account key (.json) or a pickled OAuth token, refreshing an expired token."""
+    if Path(path).suffix == '.json':
+        return service_account.Credentials.from_service_account_file(path, scopes=scopes)
+    with open(path, 'rb') as token:
+        creds = pickle.load(token)
+    if not creds.valid and creds.expired and creds.refresh_token:
+        creds.refresh(Request())
+    return creds
+
+
+class CredentialPool:
+    """Spreads Drive API calls over several credentials.
+
+    ``thread_service()`` picks a credential and returns the calling thread's
+    Drive service for it (httplib2 connections are not thread-safe), so a
+    request, or a whole chunked upload or download made with that service,
+    stays on one credential.
+    """
+
+    def __init__(self, credentials: list, names: Optional[List[str]] = None, rate: Optional[float] = None,
+                 strategy: str = 'least-loaded', api_endpoint: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if not credentials:
+            raise ValueError("The credential pool needs at least one credential")
+        if strategy not in POOL_STRATEGIES:
+            raise ValueError(f"Unknown credential strategy '{strategy}', use one of: {', '.join(POOL_STRATEGIES)}")
+        names = names or [f"credential-{i + 1}" for i in range(len(credentials))]
+        self.members = [PooledCredential(name, creds, rate, clock) for name, creds in zip(names, credentials)]
+        self.strategy = strategy
+        # Overrides the Drive API base URL, e.g. to point the services at a test server
+        self.api_endpoint = api_endpoint
+        self.counter = itertools.count()
+        self._local = threading.local()
+
+    @classmethod
+    def with_extra(cls, creds, extra_files: Optional[List[str]], scopes: List[str], rate: Optional[float] = None,
+                   strategy: str = 'least-loaded') -> 'CredentialPool':
+        """The already authenticated ``creds`` first, followed by the credentials in ``extra_files``."""
+        extra_files = list(extra_files or [])
+        return cls([creds] + [load_credentials(path, scopes) for path in extra_files],
+                   ['primary'] + [Path(path).name for path in extra_files], rate, strategy)
+
+    def __len__(self):
+        return len(self.members)
+
+    def choose(self) -> PooledCredential:
+        if len(self.members) == 1:
+            return self.members[0]
+        start = next(self.counter) % len(self.members)
+        ordered = self.members[start:] + self.members[:start]
+        if self.strategy == 'round-robin':
+            ready = [member for member in ordered if not member.backing_off()]
+            return ready[0] if ready else min(ordered, key=lambda member: member.backoff_until)
+        # Least-loaded; ties go to the round-robin order
+        return min(ordered, key=lambda member: (member.backing_off(), member.in_flight))
+
+    def member(self, name: Optional[str]) -> Optional[PooledCredential]:
+        """The credential with this name, or None if the pool has none by that name."""
+        return next((member for member in self.members if member.name == name), None)
+
+    def thread_service(self, member: Optional[PooledCredential] = None):
+        """Drive service for the calling thread, bound to ``member`` or to the credential picked for this call."""
+        member = member or self.choose()
+        services = getattr(self._local, 'services', None)
+        if services is None:
+            services = self._local.services = {}
+        service = services.get(id(member))
+        if service is None:
+            http = AuthorizedHttp(member.creds, http=ThrottledHttp(member))
+            client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
+            service = build('drive', 'v3', http=http, cache_discovery=False, client_options=client_options)
+            services[id(member)] = service
+        return service
+
+    def describe(self) -> str:
+        return f"{len(self.members)} credential(s), {self.strategy}"
+
+    def stats(self) -> list:
+        """(name, requests, throttled responses) per credential."""
+        return [(member.name, member.requests, member.throttled_count) for member in self.members]
+
+
+def pick_service(service):
+    """The Drive service to send one attempt with.
+
+    Helpers that retry accept either a Drive service or a CredentialPool. With a
+    pool, each attempt picks a credential afresh, so a retry after a throttled
+    response goes to a credential that is not backing off.
+    """
+    return service.thread_service() if isinstance(service, CredentialPool) else service
+
+
+def pinned_service(service, name: Optional[str] = None) -> tuple:
+    """(Drive service, credential name) for a session that must stay on one credential.
+
+    With a pool, ``name`` selects the credential an earlier attempt opened the
+    session with; without a name, or when that credential is no longer in the
+    pool, one is picked as usual. Without a pool the name is None.
+    """
+    if not isinstance(service, CredentialPool):
+        return service, None
+    member = service.member(name) or service.choose()
+    return service.thread_service(member), member.name
@@ -0,0 +1,353 @@
+"""
+Shared Google Drive upload helpers for gup, its async engine and s3_to_gdrive.
+
+Holds the types and folder mapping both gup engines work with, so the async
+engine does not have to import the gup CLI script.
+
+Creating a file or folder is not idempotent: when a create times out or
+fails with a 5xx, it may still have taken effect on the server, and simply
+sending it again leaves a duplicate behind. create_once() retries creates
+through the shared retry policy, but before each retry it looks for a file of
+the same name under the same parent created since the first attempt, and
+returns that instead of creating another one.
+"""
+
+import io
+import mimetypes
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import Lock
+from typing import Callable, NamedTuple, Optional
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
+from rich.markup import escape
+
+from credential_pool import pick_service
+from progress_reporter import ProgressReporter, print_error
+from retry_policy import RetryPolicy
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# Fields requested for every uploaded, copied or found file
+FILE_FIELDS = 'id, name, mimeType, size, createdTime, webViewLink'
+
+# Chunk size for resumable stream uploads; smaller payloads go up in one request
+ARCHIVE_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Allowance for clock skew between this machine and Drive when searching for
+# a file an earlier attempt may have created
+CREATE_LOOKBACK = timedelta(minutes=2)
+
+
+class LocalFile(NamedTuple):
+    """A file found during discovery, with the stat data collected in the same pass."""
+    path: Path
+    size: int
+    mtime: float
+
+
+# Thread-safe counter for progress
+class UploadStats:
+    def __init__(self):
+        self.lock = Lock()
+        self.files_uploaded = 0
+        self.files_failed = 0
+        self.files_copied = 0
+        self.total_size = 0
+        self.bytes_deduplicated = 0
+        self.metadata = []
+        self.failed_files = []
+        self.folder_cache = {}  # Cache folder IDs to avoid duplicate creation
+    
+    def add_file(self, size: int, metadata: dict):
+        with self.lock:
+            self.files_uploaded += 1
+            self.total_size += size
+            self.metadata.append(metadata)
+    
+    def add_copied(self, size: int, metadata: dict):
+        with self.lock:
+            self.files_copied += 1
+            self.bytes_deduplicated += size
+            self.metadata.append(metadata)
+    
+    def add_failed(self, file_name: str, error: str):
+        with self.lock:
+            self.files_failed += 1
+            self.failed_files.append({'file_name': file_name, 'error': error})
+    
+    def get_folder_id(self, key: str) -> Optional[str]:
+        with self.lock:
+            return self.folder_cache.get(key)
+    
+    def set_folder_id(self, key: str, folder_id: str):
+        with self.lock:
+            self.folder_cache[key] = folder_id
+
+
+def build_upload_metadata(file_info: dict, size: int, relative_path: Path) -> dict:
+    """Build the metadata CSV row for an uploaded file."""
+    return {
+        'file_id': file_info['id'],
+        'file_name': file_info['name'],
+        'mime_type': file_info['mimeType'],
+        'size_bytes': file_info.get('size', size),
+        'created_time': file_info.get('createdTime', ''),
+        'web_link': file_info.get('webViewLink', ''),
+        'local_path': str(relative_path),
+        'upload_time': datetime.now().isoformat()
+    }
+
+
+def escape_query_value(value: str) -> str:
+    """Escape a string for use inside single quotes in a Drive search query."""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def created_file_query(name: str, parent_id: Optional[str], since: datetime,
+                       mime_type: Optional[str] = None) -> str:
+    """Drive search query for non-trashed files named ``name`` under ``parent_id`` created after ``since``."""
+    query = (f"name='{escape_query_value(name)}' and '{parent_id or 'root'}' in parents and trashed=false"
+             f" and createdTime > '{since.strftime('%Y-%m-%dT%H:%M:%S')}'")
+    if mime_type:
+        query += f" and mimeType='{mime_type}'"
+    return query
+
+
+def find_created_file(service, name: str, parent_id: Optional[str], since: datetime, fields: str,
+                      mime_type: Optional[str] = None) -> Optional[dict]:
+    """Return a file an earlier create attempt left behind, or None."""
+    response = pick_service(service).files().list(
+        q=created_file_query(name, parent_id, since, mime_type),
+        fields=f'files({fields})',
+        orderBy='createdTime',
+        pageSize=1
+    ).execute()
+    files = response.get('files', [])
+    return files[0] if files else None
+
+
+def create_once(retry_policy: RetryPolicy, create: Callable, service, name: str, parent_id: Optional[str],
+                fields: str, mime_type: Optional[str] = None, on_retry: Optional[Callable] = None) -> dict:
+    """Run a Drive create (``create()`` returns the new file) with retries but without duplicates.
+
+    ``fields`` is the field list the create asks for, so a file found by the
+    lookup looks the same as a freshly created one. ``service`` may be a
+    CredentialPool, as everywhere in this module.
+    """
+    since = datetime.now(timezone.utc) - CREATE_LOOKBACK
+    attempts = [0]
+
+    def attempt():
+        if attempts[0]:
+            existing = find_created_file(service, name, parent_id, since, fields, mime_type)
+            if existing:
+                return existing
+        attempts[0] += 1
+        return create()
+
+    return retry_policy.run(attempt, on_retry=on_retry)
+
+
+def create_folder(service, folder_name: str, parent_id: Optional[str] = None,
+                  reporter: Optional[ProgressReporter] = None) -> Optional[str]:
+    """Create a folder in Google Drive."""
+    try:
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': 'application/vnd.google-apps.folder'
+        }
+        
+        if parent_id:
+            file_metadata['parents'] = [parent_id]
+        
+        folder = pick_service(service).files().create(
+            body=file_metadata,
+            fields='id'
+        ).execute()
+        
+        return folder.get('id')
+    
+    except Exception as e:
+        print_error(reporter, f"[red]Error creating folder {escape(folder_name)}: {escape(str(e))}[/red]")
+        return None
+
+
+def get_or_create_folder(service, folder_path: Path, parent_id: Optional[str], stats: UploadStats,
+                         reporter: Optional[ProgressReporter] = None) -> Optional[str]:
+    """Get or create folder structure in Google Drive."""
+    if not folder_path or folder_path == Path("."):
+        return parent_id
+    
+    # Create cache key
+    cache_key = f"{parent_id}:{folder_path}"
+    
+    # Check cache first
+    cached_id = stats.get_folder_id(cache_key)
+    if cached_id:
+        return cached_id
+    
+    # Process parent folders first
+    if folder_path.parent != Path("."):
+        parent_id = get_or_create_folder(service, folder_path.parent, parent_id, stats, reporter)
+    
+    # Check if folder already exists
+    try:
+        query = f"name='{folder_path.name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        if parent_id:
+            query += f" and '{parent_id}' in parents"
+        
+        results = pick_service(service).files().list(
+            q=query,
+            spaces='drive',
+            fields='files(id, name)'
+        ).execute()
+        
+        items = results.get('files', [])
+        
+        if items:
+            folder_id = items[0]['id']
+        else:
+            # Create the folder
+            folder_id = create_folder(service, folder_path.name, parent_id, reporter)
+        
+        # Cache the folder ID
+        if folder_id:
+            stats.set_folder_id(cache_key, folder_id)
+        
+        return folder_id
+    
+    except Exception as e:
+        print_error(reporter,
+                    f"[red]Error getting/creating folder {escape(str(folder_path))}: {escape(str(e))}[/red]")
+        return None
+
+
+class MemberStream:
+    """Forward-only, seekable-looking view of an archive member for MediaIoBaseUpload.
+
+    The uploader seeks to the end once to learn the size, then seeks to the start
+    of each chunk and reads it. Bytes from the last seek position onwards are
+    retained, so a chunk can be re-sent after the session status query rewinds to
+    the last acknowledged byte; memory stays at about one chunk.
+    """
+
+    def __init__(self, fileobj, size: int):
+        self.fileobj = fileobj
+        self.size = size
+        self.pos = 0
+        self.read_pos = 0
+        self.window_start = 0
+        self.window = bytearray()
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_END:
+            self.pos = self.size + offset
+        elif whence == os.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = offset
+        
+        # Everything before a chunk start can no longer be requested
+        if self.window_start < self.pos <= self.read_pos:
+            del self.window[:self.pos - self.window_start]
+            self.window_start = self.pos
+        return self.pos
+
+    def read(self, n: int = -1) -> bytes:
+        end = self.size if n is None or n < 0 else min(self.size, self.pos + n)
+        if self.pos < self.window_start:
+            raise io.UnsupportedOperation("cannot rewind an archive member past the retained chunk")
+        
+        # Skip forward if the reader jumped ahead
+        if self.pos > self.read_pos:
+            while self.read_pos < self.pos:
+                skipped = self.fileobj.read(min(self.pos - self.read_pos, ARCHIVE_CHUNK_SIZE))
+                if not skipped:
+                    break
+                self.read_pos += len(skipped)
+            self.window = bytearray()
+            self.window_start = self.read_pos
+        
+        while self.read_pos < end:
+            data = self.fileobj.read(end - self.read_pos)
+            if not data:
+                break
+            self.window += data
+            self.read_pos += len(data)
+        
+        result = bytes(self.window[self.pos - self.window_start:end - self.window_start])
+        self.pos += len(result)
+        return result
+
+
+def upload_stream(service, stream, name: str, size: int, parent_id: Optional[str],
+                  retry_policy: Optional[RetryPolicy] = None, file_id: Optional[str] = None) -> tuple:
+    """Upload a file-like object to Google Drive.
+
+    Small payloads go up in a single multipart request; larger ones use a chunked
+    resumable session that is continued, not restarted, when a chunk fails.
+    With ``file_id`` the content replaces that existing file instead.
+    """
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    
+    mime_type, _ = mimetypes.guess_type(name)
+    if not mime_type:
+        mime_type = 'application/octet-stream'
+    
+    file_metadata = {'name': name}
+    if parent_id:
+        file_metadata['parents'] = [parent_id]
+    
+    resumable = size > ARCHIVE_CHUNK_SIZE
+    media = MediaIoBaseUpload(stream, mimetype=mime_type, chunksize=ARCHIVE_CHUNK_SIZE, resumable=resumable)
+    
+    def build_request():
+        files = pick_service(service).files()
+        if file_id:
+            return files.update(
+                fileId=file_id,
+                media_body=media,
+                fields=FILE_FIELDS
+            )
+        return files.create(
+            body=file_metadata,
+            media_body=media,
+            fields=FILE_FIELDS
+        )
+    
+    session = [None]
+    
+    def attempt():
+        if not resumable:
+            stream.seek(0)
+            return build_request().execute()
+        # Once the session has started it stays on its credential; until then
+        # each attempt can move to another one
+        if session[0] is None or session[0].resumable_uri is None:
+            session[0] = build_request()
+        request = session[0]
+        file = None
+        while file is None:
+            _, file = request.next_chunk()
+        return file
+    
+    try:
+        if resumable or file_id:
+            # Chunks of a resumable session and updates are safe to send again
+            file = retry_policy.run(attempt)
+        else:
+            file = create_once(retry_policy, attempt, service, name, parent_id, FILE_FIELDS)
+        return True, size, file, None
+    except HttpError as e:
+        return False, 0, None, f"HTTP Error {e.resp.status}: {str(e)}"
+    except Exception as e:
+        return False, 0, None, str(e)
@@ -424,7 +424,6 @@ Downloads files from Google Drive with metadata export and folder structure pres
 import csv
 import io
 import os
-import time
 from pathlib import Path
 from datetime import datetime
 from typing import Optional, List, Dict
@@ -439,16 +438,23 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn
+from rich.markup import escape
 from rich.table import Table
 import pickle
 
+from byte_budget import ByteBudget, parse_size
+from credential_pool import POOL_STRATEGIES, CredentialPool, pick_service
+from progress_reporter import ProgressReporter, print_error, print_message
+from retry_policy import RetryPolicy
+
 # Scopes required for Google Drive API
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
 app = typer.Typer(help="Download files from Google Drive with metadata")
 console = Console()
 
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
 # Thread-safe counter for progress
 class DownloadStats:
     def __init__(self):
@@ -506,7 +512,7 @@ def authenticate(credentials_file: Path, token_file: Path):
     return creds
 
 
-def get_file_metadata(service, file_id: str) -> dict:
+def get_file_metadata(service, file_id: str, reporter: Optional[ProgressReporter] = None) -> dict:
     """Get detailed metadata for a file."""
     try:
         file = service.files().get(
@@ -515,11 +521,12 @@ def get_file_metadata(service, file_id: str) -> dict:
         ).execute()
         return file
     except Exception as e:
-        console.print(f"[red]Error getting metadata for file {file_id}: {e}[/red]")
+        print_error(reporter, f"[red]Error getting metadata for file {file_id}: {escape(str(e))}[/red]")
         return None
 
 
-def build_folder_structure(service, folder_id: str, parent_path: Path = Path("")) -> Dict[str, Path]:
+def build_folder_structure(service, folder_id: str, parent_path: Path = Path(""),
+                           reporter: Optional[ProgressReporter] = None) -> Dict[str, Path]:
     """Build a mapping of folder IDs to their paths."""
     folder_map = {folder_id: parent_path}
     
@@ -537,16 +544,16 @@ def build_folder_structure(service, folder_id: str, parent_path: Path = Path("")
             folder_path = parent_path / folder['name']
             folder_map[folder['id']] = folder_path
             # Recursively get subfolders
-            subfolder_map = build_folder_structure(service, folder['id'], folder_path)
+            subfolder_map = build_folder_structure(service, folder['id'], folder_path, reporter)
             folder_map.update(subfolder_map)
     
     except Exception as e:
-        console.print(f"[yellow]Warning: Error building folder structure: {e}[/yellow]")
+        print_message(reporter, f"[yellow]Warning: Error building folder structure: {escape(str(e))}[/yellow]")
     
     return folder_map
 
 
-def list_all_files(service, folder_id: str) -> List[dict]:
+def list_all_files(service, folder_id: str, reporter: Optional[ProgressReporter] = None) -> List[dict]:
     """List all files in a folder and its subfolders."""
     all_files = []
     page_token = None
@@ -569,64 +576,63 @@ def list_all_files(service, folder_id: str) -> List[dict]:
                 break
         
         except Exception as e:
-            console.print(f"[red]Error listing files: {e}[/red]")
+            print_error(reporter, f"[red]Error listing files: {escape(str(e))}[/red]")
             break
     
     # Recursively get files from subfolders
     for file in all_files.copy():
         if file['mimeType'] == 'application/vnd.google-apps.folder':
-            subfolder_files = list_all_files(service, file['id'])
+            subfolder_files = list_all_files(service, file['id'], reporter)
             all_files.extend(subfolder_files)
     
     return all_files
 
 
-def download_file(service, file_id: str, output_path: Path, file_name: str, max_retries: int = 3) -> tuple:
-    """Download a single file from Google Drive with retry logic."""
+def download_file(service, file_id: str, output_path: Path, file_name: str,
+                  retry_policy: Optional[RetryPolicy] = None, reporter: Optional[ProgressReporter] = None) -> tuple:
+    """Download a single file from Google Drive with retry logic.
     
-    for attempt in range(max_retries):
-        try:
-            # Create parent directories
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-            
-            # Write to file
-            with open(output_path, 'wb') as f:
-                f.write(fh.getvalue())
-            
-            return True, len(fh.getvalue()), None
+    ``service`` may be a CredentialPool, in which case every attempt picks a
+    credential afresh.
+    """
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    
+    def attempt():
+        # Create parent directories
+        output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        except HttpError as e:
-            error_msg = f"HTTP Error {e.resp.status}: {e.error_details}"
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
-                continue
-            return False, 0, error_msg
+        request = pick_service(service).files().get_media(fileId=file_id)
+        fh = io.BytesIO()
+        downloader = MediaIoBaseDownload(fh, request)
         
-        except Exception as e:
-            error_msg = str(e)
-            if attempt < max_retries - 1:
-                # Wait before retry with exponential backoff
-                time.sleep(2 ** attempt)
-                continue
-            return False, 0, error_msg
+        done = False
+        while not done:
+            status, done = downloader.next_chunk()
+        
+        # Write to file
+        with open(output_path, 'wb') as f:
+            f.write(fh.getvalue())
+        
+        return len(fh.getvalue())
+    
+    def on_retry(attempt_number, delay, error):
+        print_message(reporter, f"[yellow]Retry {attempt_number}/{retry_policy.max_attempts - 1} for "
+                                f"{escape(file_name)} in {delay:.1f}s: {escape(str(error))}[/yellow]")
+    
+    try:
+        size = retry_policy.run(attempt, on_retry=on_retry)
+        return True, size, None
+    
+    except HttpError as e:
+        return False, 0, f"HTTP Error {e.resp.status}: {e.error_details}"
     
-    return False, 0, "Max retries exceeded"
+    except Exception as e:
+        return False, 0, str(e)
 
 
 def download_file_wrapper(args):
     """Wrapper for parallel download."""
-    creds, file_info, output_base, folder_map, stats = args
-    
-    # Create a new service instance for this thread
-    service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+    pool, file_info, output_base, folder_map, stats, retry_policy, budget, reporter = args
     
     file_id = file_info['id']
     file_name = file_info['name']
@@ -634,8 +640,6 @@ def download_file_wrapper(args):
     
     # Skip Google Workspace files (Docs, Sheets, etc.)
     if mime_type.startswith('application/vnd.google-apps'):
-        if mime_type != 'application/vnd.google-apps.folder':
-            console.print(f"[yellow]Skipping Google Workspace file: {file_name}[/yellow]")
         return None
     
     # Get parent folder path
@@ -645,8 +649,11 @@ def download_file_wrapper(args):
     # Create output path
     output_path = output_base / folder_path / file_name
     
-    # Download file with retries
-    success, size, error = download_file(service, file_id, output_path, file_name)
+    # Download file with retries, holding its size against the in-flight budget
+    # since the whole file is buffered in memory
+    with budget.reserve(int(file_info.get('size', 0))):
+        # Each attempt is sent with the credential the pool picks for it
+        success, size, error = download_file(pool, file_id, output_path, file_name, retry_policy, reporter)
     
     if success:
         # Prepare metadata
@@ -664,7 +671,7 @@ def download_file_wrapper(args):
         }
         
         stats.add_file(size, metadata)
-        return ('success', file_name)
+        return ('success', file_name, size)
     else:
         stats.add_failed(file_name, error)
         return ('failed', file_name, error)
@@ -703,6 +710,21 @@ def download(
         "-t",
         help="Path to save/load authentication token"
     ),
+    pool_tokens: Optional[List[str]] = typer.Option(
+        None,
+        "--pool-token",
+        help="Extra OAuth token pickle or service-account key (.json) to spread requests over; repeatable"
+    ),
+    credential_strategy: str = typer.Option(
+        "least-loaded",
+        "--credential-strategy",
+        help=f"How files are spread over credentials: {', '.join(POOL_STRATEGIES)}"
+    ),
+    requests_per_second: Optional[float] = typer.Option(
+        None,
+        "--requests-per-second",
+        help="Drive API request rate limit per credential (default: unlimited)"
+    ),
     metadata_file: Path = typer.Option(
         "metadata.csv",
         "--metadata",
@@ -714,6 +736,32 @@ def download(
         "--workers",
         "-w",
         help="Number of parallel download workers"
+    ),
+    max_retries: int = typer.Option(
+        5,
+        "--max-retries",
+        help="Maximum attempts per file for transient errors"
+    ),
+    retry_budget: int = typer.Option(
+        1000,
+        "--retry-budget",
+        help="Maximum total retries across the whole run"
+    ),
+    max_inflight_bytes: Optional[str] = typer.Option(
+        None,
+        "--max-inflight-bytes",
+        help="Cap on file data buffered in memory across all workers, e.g. 2G or 512M"
+    ),
+    progress_mode: str = typer.Option(
+        "console",
+        "--progress",
+        help="Progress output: console (4 Hz bar), json (periodic JSON lines on stderr) or quiet"
+    ),
+    quiet: bool = typer.Option(
+        False,
+        "--quiet",
+        "-q",
+        help="Shorthand for --progress quiet"
     )
 ):
     """
@@ -728,23 +776,35 @@ def download(
     
     console.print("[bold green]Google Drive Bulk Downloader[/bold green]\n")
     
+    try:
+        budget = ByteBudget(parse_size(max_inflight_bytes) if max_inflight_bytes else None)
+        reporter = ProgressReporter("Downloading files", mode='quiet' if quiet else progress_mode, console=console)
+    except ValueError as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
+    
     # Authenticate
     console.print("[cyan]Authenticating with Google Drive...[/cyan]")
     creds = authenticate(credentials_file, token_file)
+    try:
+        pool = CredentialPool.with_extra(creds, pool_tokens, SCOPES, requests_per_second, credential_strategy)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
     service = build('drive', 'v3', credentials=creds, cache_discovery=False)
-    console.print("[green]✓ Authentication successful[/green]\n")
+    console.print(f"[green]✓ Authentication successful ({pool.describe()})[/green]\n")
     
     # Create output directory
     output_folder.mkdir(parents=True, exist_ok=True)
     
     # Build folder structure
     console.print("[cyan]Building folder structure...[/cyan]")
-    folder_map = build_folder_structure(service, folder_id)
+    folder_map = build_folder_structure(service, folder_id, reporter=reporter)
     console.print(f"[green]✓ Found {len(folder_map)} folder(s)[/green]\n")
     
     # List all files
     console.print("[cyan]Scanning for files...[/cyan]")
-    all_files = list_all_files(service, folder_id)
+    all_files = list_all_files(service, folder_id, reporter)
     
     # Filter out folders
     downloadable_files = [f for f in all_files if f['mimeType'] != 'application/vnd.google-apps.folder']
@@ -756,40 +816,29 @@ def download(
     
     # Initialize stats
     stats = DownloadStats()
+    retry_policy = RetryPolicy(max_attempts=max_retries, max_total_retries=retry_budget)
     
-    # Download files with progress bar
+    # Download files; progress is aggregated and redrawn at a fixed rate
     console.print("[bold]Starting downloads...[/bold]\n")
+    reporter.set_total(len(downloadable_files))
     
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        DownloadColumn(),
-        TransferSpeedColumn(),
-        console=console
-    ) as progress:
-        
-        task = progress.add_task(
-            "[cyan]Downloading files...",
-            total=len(downloadable_files)
-        )
+    with reporter:
         
         # Prepare arguments for parallel download
         download_args = [
-            (creds, file_info, output_folder, folder_map, stats)
+            (pool, file_info, output_folder, folder_map, stats, retry_policy, budget, reporter)
             for file_info in downloadable_files
         ]
         
         # Use ThreadPoolExecutor for parallel downloads
         with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
             for result in executor.map(download_file_wrapper, download_args):
-                if result:
-                    if result[0] == 'success':
-                        progress.console.print(f"  [green]✓ {result[1]}[/green]")
-                    elif result[0] == 'failed':
-                        progress.console.print(f"  [red]✗ {result[1]}: {result[2]}[/red]")
-                progress.advance(task)
+                if result is None:
+                    reporter.file_skipped()
+                elif result[0] == 'success':
+                    reporter.file_done(result[2])
+                else:
+                    reporter.file_failed(result[1], result[2])
     
     # Save metadata
     console.print(f"\n[cyan]Saving metadata to {metadata_file}...[/cyan]")
@@ -812,9 +861,14 @@ def download(
     
     table.add_row("Files Downloaded", str(stats.files_downloaded))
     table.add_row("Files Failed", str(stats.files_failed))
+    if reporter.files_skipped:
+        table.add_row("Workspace Files Skipped", str(reporter.files_skipped))
     table.add_row("Total Size", f"{stats.total_size / (1024*1024):.2f} MB")
     table.add_row("Output Directory", str(output_folder))
     table.add_row("Metadata File", str(output_folder / metadata_file))
+    if len(pool) > 1:
+        for name, requests, throttled in pool.stats():
+            table.add_row(f"Requests ({name})", f"{requests} ({throttled} throttled)")
     
     console.print(table)
     
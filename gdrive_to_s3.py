@@ -7,39 +7,485 @@ and uploads all files to S3 while maintaining the folder structure and logging
 all transfer metadata to a CSV file.
 
 Requirements:
-    pip install google-auth google-auth-oauthlib google-auth-httplib2 google-api-python-client boto3 typer
+    pip install google-auth google-auth-oauthlib google-auth-httplib2 google-api-python-client boto3 typer rich
 """
 
 import os
 import io
+import json
+import sqlite3
+import queue
+import tarfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import typer
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
-import boto3
-from botocore.exceptions import ClientError
 import pickle
 import csv
 
+from byte_budget import ByteBudget, parse_size
+from credential_pool import POOL_STRATEGIES, CredentialPool
+from progress_reporter import ProgressReporter
+from retry_policy import RetryPolicy
+from s3_client import make_s3_client
+
 app = typer.Typer()
 
 # Google Drive API scopes
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# Streaming transfers: S3 allows at most 10,000 parts of at least 5 MB each
+MIN_PART_SIZE = 8 * 1024 * 1024
+MAX_PARTS = 10000
+# Buffers per transfer: one being filled from Drive, the rest uploading to S3
+PART_RING_SIZE = 3
+# S3 user metadata holding the Drive MD5 of multipart objects
+MD5_METADATA_KEY = 'gdrive-md5'
+
+# Small-file packing: files below the threshold go into tar shards of about this size
+DEFAULT_PACK_THRESHOLD = 1024 * 1024
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024
+PACK_DIR = '_packs'
+PACK_UPLOAD_WORKERS = 2
+
+# Drive caps exported content at 10 MB, which is what an export reserves in memory
+EXPORT_SIZE_LIMIT = 10 * 1024 * 1024
+
+# Default export format for each Google Workspace type
+EXPORT_FORMATS = {
+    'application/vnd.google-apps.document': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', '.docx'),
+    'application/vnd.google-apps.spreadsheet': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'application/vnd.google-apps.presentation': ('application/vnd.openxmlformats-officedocument.presentationml.presentation', '.pptx'),
+    'application/vnd.google-apps.drawing': ('application/pdf', '.pdf'),
+    'application/vnd.google-apps.script': ('application/vnd.google-apps.script+json', '.json'),
+    'application/vnd.google-apps.form': ('application/zip', '.zip'),
+}
+
+# Short names accepted by --export-format
+EXPORT_TYPES = {
+    'document': 'application/vnd.google-apps.document',
+    'spreadsheet': 'application/vnd.google-apps.spreadsheet',
+    'presentation': 'application/vnd.google-apps.presentation',
+    'drawing': 'application/vnd.google-apps.drawing',
+}
+EXPORT_MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'odt': 'application/vnd.oasis.opendocument.text',
+    'ods': 'application/vnd.oasis.opendocument.spreadsheet',
+    'odp': 'application/vnd.oasis.opendocument.presentation',
+    'rtf': 'application/rtf',
+    'txt': 'text/plain',
+    'html': 'text/html',
+    'epub': 'application/epub+zip',
+    'csv': 'text/csv',
+    'tsv': 'text/tab-separated-values',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'svg': 'image/svg+xml',
+}
+# Formats Drive can export each type to
+TYPE_EXPORT_FORMATS = {
+    'document': ('pdf', 'docx', 'odt', 'rtf', 'txt', 'html', 'epub'),
+    'spreadsheet': ('pdf', 'xlsx', 'ods', 'csv', 'tsv'),
+    'presentation': ('pdf', 'pptx', 'odp', 'txt', 'png', 'jpg', 'svg'),
+    'drawing': ('pdf', 'png', 'jpg', 'svg'),
+}
+
+
+class PartBuffer:
+    """Fixed-capacity, reusable buffer holding one multipart part"""
+    def __init__(self, capacity: int):
+        self.data = bytearray(capacity)
+        self.length = 0
+    
+    def write(self, content: bytes) -> int:
+        end = self.length + len(content)
+        if end > len(self.data):
+            raise ValueError("Drive returned more data than the part buffer holds")
+        self.data[self.length:end] = content
+        self.length = end
+        return len(content)
+    
+    def body(self):
+        """Part payload; a full buffer is passed as-is, without copying"""
+        if self.length == len(self.data):
+            return self.data
+        return bytes(memoryview(self.data)[:self.length])
+
+
+class PartSink:
+    """Write target for MediaIoBaseDownload that is re-pointed at a ring buffer per chunk"""
+    def __init__(self):
+        self.current = None
+    
+    def write(self, content: bytes) -> int:
+        return self.current.write(content)
+
+
+class TarShard:
+    """One tar shard being streamed to S3 as a multipart upload
+    
+    ``upload`` is the future of the create_multipart_upload call, so opening a
+    shard never waits on S3; its parts wait for the upload ID instead.
+    """
+    def __init__(self, key: str, upload: Future):
+        self.key = key
+        self.upload = upload
+        self.buffer = bytearray()
+        self.size = 0
+        self.part_number = 0
+        self.futures = []
+        self.members = []
+    
+    def write(self, content: bytes):
+        self.buffer += content
+        self.size += len(content)
+    
+    @property
+    def upload_id(self) -> str:
+        return self.upload.result()
+
+
+class TarShardPacker:
+    """Packs small files into size-bounded tar shards uploaded with multipart
+    
+    Workers hand over downloaded files; they are appended to the open shard as
+    tar members and cut into parts that upload in the background. Each completed
+    shard gets a sidecar index (<shard>.index.jsonl) with every member's data
+    offset and size, so a single file can still be read with a ranged GET.
+    Members are recorded as transferred only once their shard is complete.
+    """
+    def __init__(self, transfer: 'GDriveToS3Transfer', shard_size: int = DEFAULT_SHARD_SIZE,
+                 part_size: int = MIN_PART_SIZE):
+        self.transfer = transfer
+        self.shard_size = shard_size
+        self.part_size = part_size
+        self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.shard_number = 0
+        self.shard = None
+        self.lock = threading.Lock()
+        self.uploader = ThreadPoolExecutor(max_workers=PACK_UPLOAD_WORKERS)
+        # Bounds the parts waiting for upload, and with them memory
+        self.part_slots = threading.BoundedSemaphore(PACK_UPLOAD_WORKERS * 2)
+    
+    def _create_upload(self, key: str) -> str:
+        transfer = self.transfer
+        return transfer.retry_policy.run(
+            transfer.s3_client.create_multipart_upload,
+            Bucket=transfer.s3_bucket, Key=key, ContentType='application/x-tar',
+            on_retry=transfer._log_retry
+        )['UploadId']
+    
+    def _open_shard(self) -> TarShard:
+        """Reserve the next shard key; called under the lock, so the S3 call runs on the uploader"""
+        transfer = self.transfer
+        self.shard_number += 1
+        key = f"{transfer.s3_prefix}{PACK_DIR}/pack-{self.run_id}-{self.shard_number:05d}.tar"
+        # Submitted ahead of the shard's parts, so the uploader runs it first
+        return TarShard(key, self.uploader.submit(self._create_upload, key))
+    
+    def _upload_part(self, shard: TarShard, part_number: int, body: bytes) -> dict:
+        transfer = self.transfer
+        try:
+            response = transfer.retry_policy.run(
+                transfer.s3_client.upload_part,
+                Bucket=transfer.s3_bucket,
+                Key=shard.key,
+                UploadId=shard.upload_id,
+                PartNumber=part_number,
+                Body=body,
+                on_retry=transfer._log_retry
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        finally:
+            self.part_slots.release()
+    
+    def _submit_parts(self, shard: TarShard, final: bool = False):
+        """Cut full parts (and on the final call, the remainder) off the shard buffer"""
+        while len(shard.buffer) >= self.part_size or (final and shard.buffer):
+            size = min(self.part_size, len(shard.buffer))
+            body = bytes(shard.buffer[:size])
+            del shard.buffer[:size]
+            shard.part_number += 1
+            self.part_slots.acquire()
+            shard.futures.append(self.uploader.submit(self._upload_part, shard, shard.part_number, body))
+    
+    def add(self, item: dict, full_path: str, data: bytes):
+        """Append one downloaded file to the open shard"""
+        info = tarfile.TarInfo(full_path)
+        info.size = len(data)
+        info.mode = 0o644
+        modified = item.get('modifiedTime')
+        if modified:
+            info.mtime = datetime.fromisoformat(modified.replace('Z', '+00:00')).timestamp()
+        header = info.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8', errors='surrogateescape')
+        
+        finished = None
+        with self.lock:
+            if self.shard is None:
+                self.shard = self._open_shard()
+            shard = self.shard
+            offset = shard.size + len(header)
+            shard.write(header)
+            shard.write(data)
+            shard.write(tarfile.NUL * (-len(data) % tarfile.BLOCKSIZE))
+            shard.members.append((item, full_path, offset, len(data)))
+            
+            if shard.size >= self.shard_size:
+                shard.write(tarfile.NUL * (2 * tarfile.BLOCKSIZE))
+                self._submit_parts(shard, final=True)
+                finished, self.shard = shard, None
+            else:
+                self._submit_parts(shard)
+        
+        if finished:
+            self._complete(finished)
+    
+    def _complete(self, shard: TarShard):
+        """Finish a shard's upload, write its index and record its members"""
+        transfer = self.transfer
+        try:
+            parts = [future.result() for future in shard.futures]
+            transfer.retry_policy.run(
+                transfer.s3_client.complete_multipart_upload,
+                Bucket=transfer.s3_bucket,
+                Key=shard.key,
+                UploadId=shard.upload_id,
+                MultipartUpload={'Parts': parts},
+                on_retry=transfer._log_retry
+            )
+            index = ''.join(
+                json.dumps({'path': full_path, 'offset': offset, 'size': size, 'gdrive_file_id': item['id'],
+                            'md5': item.get('md5Checksum', '')}) + '\n'
+                for item, full_path, offset, size in shard.members
+            )
+            transfer.retry_policy.run(
+                transfer.s3_client.put_object,
+                Bucket=transfer.s3_bucket, Key=shard.key + '.index.jsonl',
+                Body=index.encode('utf-8'), ContentType='application/x-ndjson',
+                on_retry=transfer._log_retry
+            )
+        except Exception as e:
+            transfer.reporter.error(f"❌ Error uploading shard {shard.key}: {e}", markup=False)
+            try:
+                transfer.s3_client.abort_multipart_upload(Bucket=transfer.s3_bucket, Key=shard.key,
+                                                          UploadId=shard.upload_id)
+            except Exception:
+                pass  # Never created, or left for the bucket's lifecycle rule to clean up
+            for item, full_path, _, size in shard.members:
+                transfer.record_result(item, full_path, shard.key, 'FAILED', size,
+                                       error_msg=f'Shard upload failed: {e}')
+            return
+        
+        for item, full_path, _, size in shard.members:
+            transfer.record_result(item, full_path, shard.key, 'SUCCESS', size)
+    
+    def close(self):
+        """Flush the last, partially filled shard"""
+        with self.lock:
+            shard, self.shard = self.shard, None
+            if shard is not None:
+                shard.write(tarfile.NUL * (2 * tarfile.BLOCKSIZE))
+                self._submit_parts(shard, final=True)
+        if shard is not None:
+            self._complete(shard)
+        self.uploader.shutdown()
+
+
+def parse_export_formats(specs: List[str]) -> Dict[str, tuple]:
+    """Build the export format table from TYPE=FORMAT overrides
+    
+    TYPE is document, spreadsheet, presentation, drawing or "all" (every type
+    above), FORMAT an extension such as pdf or odt. Later entries win, so
+    "all=pdf document=docx" exports everything as PDF except Docs. A format
+    Drive cannot export one of the types to is rejected here rather than
+    failing once per file at export time.
+    """
+    formats = dict(EXPORT_FORMATS)
+    for spec in specs or []:
+        type_name, _, format_name = spec.partition('=')
+        type_name, format_name = type_name.strip().lower(), format_name.strip().lower().lstrip('.')
+        if format_name not in EXPORT_MIME_TYPES:
+            raise ValueError(f"Unknown export format '{format_name}' in '{spec}'")
+        if type_name == 'all':
+            type_names = list(EXPORT_TYPES)
+        elif type_name in EXPORT_TYPES:
+            type_names = [type_name]
+        else:
+            raise ValueError(f"Unknown Google Workspace type '{type_name}' in '{spec}'")
+        unsupported = [name for name in type_names if format_name not in TYPE_EXPORT_FORMATS[name]]
+        if unsupported:
+            raise ValueError(f"Google Drive cannot export {', '.join(unsupported)} files as {format_name} "
+                             f"in '{spec}' (supported: "
+                             + '; '.join(f"{name}: {', '.join(TYPE_EXPORT_FORMATS[name])}" for name in unsupported)
+                             + ")")
+        for name in type_names:
+            formats[EXPORT_TYPES[name]] = (EXPORT_MIME_TYPES[format_name], '.' + format_name)
+    return formats
+
+
+def ring_layout(file_size: Optional[int], part_size: int) -> tuple:
+    """(buffer count, buffer size) of the part ring a streamed file needs
+    
+    Buffers never exceed the file, and a file of one or two parts gets only
+    as many buffers as it has parts.
+    """
+    if file_size is None:
+        return PART_RING_SIZE, part_size
+    return min(PART_RING_SIZE, max(1, -(-file_size // part_size))), max(1, min(file_size, part_size))
+
+
+def part_size_for(file_size: Optional[int], min_part_size: int = MIN_PART_SIZE) -> int:
+    """Pick a part size that keeps the object within S3's part count limit"""
+    if not file_size:
+        # Unknown size: leave headroom for objects up to ~160 GB
+        return max(min_part_size, 16 * 1024 * 1024)
+    needed = -(-file_size // MAX_PARTS)
+    mb = 1024 * 1024
+    return max(min_part_size, -(-needed // mb) * mb)
+
+
+class TransferJournal:
+    """SQLite checkpoint of folder listings and per-file transfer status
+    
+    Every listed folder and every finished transfer is committed as it happens,
+    so an interrupted or crashed migration can resume without listing completed
+    folders again or re-transferring files already marked SUCCESS.
+    """
+    def __init__(self, journal_file: str, reset: bool = False):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(journal_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS folders (
+                folder_id TEXT PRIMARY KEY,
+                path TEXT,
+                items_json TEXT,
+                listed_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS transfers (
+                file_id TEXT PRIMARY KEY,
+                modified_time TEXT,
+                status TEXT,
+                s3_key TEXT,
+                record_json TEXT,
+                updated_at TEXT
+            );
+        """)
+        if reset:
+            self.conn.execute("DELETE FROM folders")
+            self.conn.execute("DELETE FROM transfers")
+        self.conn.commit()
+        
+        # Completed files, kept in memory so skip checks cost no queries
+        self.completed = dict(self.conn.execute(
+            "SELECT file_id, modified_time FROM transfers WHERE status IN ('SUCCESS', 'SKIPPED')"
+        ).fetchall())
+    
+    def get_listing(self, folder_id: str) -> Optional[list]:
+        """Return the saved listing of a folder, or None if it was never fully listed"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT items_json FROM folders WHERE folder_id = ?", (folder_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def save_listing(self, folder_id: str, path: str, items: list):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO folders VALUES (?, ?, ?, ?)",
+                (folder_id, path, json.dumps(items), datetime.utcnow().isoformat())
+            )
+            self.conn.commit()
+    
+    def is_complete(self, file_id: str, modified_time: str) -> bool:
+        """True if this exact version of the file was already transferred"""
+        return self.completed.get(file_id) == modified_time
+    
+    def record(self, record: dict):
+        """Persist the outcome of one transfer"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO transfers VALUES (?, ?, ?, ?, ?, ?)",
+                (record['gdrive_file_id'], record['gdrive_modified_time'], record['transfer_status'],
+                 record['s3_key'], json.dumps(record), record['transfer_timestamp'])
+            )
+            self.conn.commit()
+            if record['transfer_status'] in ('SUCCESS', 'SKIPPED'):
+                self.completed[record['gdrive_file_id']] = record['gdrive_modified_time']
+    
+    def successful_records(self) -> list:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT record_json FROM transfers WHERE status IN ('SUCCESS', 'SKIPPED')"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
 class GDriveToS3Transfer:
-    def __init__(self, s3_bucket: str, s3_prefix: str = ""):
-        self.drive_service = None
-        self.s3_client = boto3.client('s3')
+    def __init__(self, s3_bucket: str, s3_prefix: str = "", retry_policy: Optional[RetryPolicy] = None,
+                 stream: bool = True, min_part_size: int = MIN_PART_SIZE,
+                 workers: int = 8, crawlers: int = 4, queue_size: int = 1000,
+                 journal: Optional[TransferJournal] = None, export_workers: int = 4,
+                 export_formats: Optional[Dict[str, tuple]] = None, budget: Optional[ByteBudget] = None,
+                 reporter: Optional[ProgressReporter] = None, pack_threshold: Optional[int] = None,
+                 shard_size: int = DEFAULT_SHARD_SIZE, s3_endpoint_url: Optional[str] = None,
+                 max_pool_connections: Optional[int] = None, pool_tokens: Optional[List[str]] = None,
+                 credential_strategy: str = 'least-loaded', requests_per_second: Optional[float] = None):
+        self.creds = None
+        self.pool = None
+        self.pool_tokens = pool_tokens
+        self.credential_strategy = credential_strategy
+        self.requests_per_second = requests_per_second
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.stream = stream
+        self.min_part_size = min_part_size
         self.s3_bucket = s3_bucket
         self.s3_prefix = s3_prefix.rstrip('/') + '/' if s3_prefix else ''
         self.transferred_count = 0
         self.failed_count = 0
+        self.skipped_count = 0
         self.metadata_records = []
+        self.journal = journal
+        self.s3_index = None
+        self.workers = workers
+        self.crawlers = crawlers
+        self.export_workers = max(1, export_workers)
+        # One client shared by all threads; every worker and exporter can have
+        # a ring's worth of part uploads in flight, plus the shard uploaders
+        pool_size = max_pool_connections or (workers + self.export_workers) * PART_RING_SIZE + PACK_UPLOAD_WORKERS + 4
+        self.s3_client = make_s3_client(endpoint_url=s3_endpoint_url, max_pool_connections=pool_size)
+        self.export_formats = export_formats or EXPORT_FORMATS
+        self.budget = budget or ByteBudget()
+        self.reporter = reporter or ProgressReporter()
+        self.pack_threshold = pack_threshold
+        self.packer = TarShardPacker(self, shard_size, min_part_size) if pack_threshold else None
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+    
+    @property
+    def drive_service(self):
+        """Drive client for the calling thread (httplib2 connections are not thread-safe)
+        
+        Each access picks a credential from the pool, so a single call, or a
+        whole download made through one request, stays on one credential.
+        """
+        return self.pool.thread_service() if self.pool is not None else None
         
     def authenticate_gdrive(self, credentials_file: str = 'credentials.json'):
         """Authenticate with Google Drive API"""
@@ -76,8 +522,15 @@ class GDriveToS3Transfer:
             with open(token_file, 'wb') as token:
                 pickle.dump(creds, token)
         
-        self.drive_service = build('drive', 'v3', credentials=creds)
-        typer.echo("✅ Successfully authenticated with Google Drive")
+        self.creds = creds
+        self.pool = CredentialPool.with_extra(creds, self.pool_tokens, SCOPES, self.requests_per_second,
+                                              self.credential_strategy)
+        typer.echo(f"✅ Successfully authenticated with Google Drive ({self.pool.describe()})")
+    
+    def _log_retry(self, attempt: int, delay: float, error: Exception):
+        """Report a retry scheduled by the retry policy"""
+        self.reporter.message(f"  ⏳ Retry {attempt}/{self.retry_policy.max_attempts - 1} in {delay:.1f}s: {error}",
+                              markup=False)
     
     def get_folder_name(self, folder_id: str) -> str:
         """Get folder name from ID"""
@@ -91,19 +544,46 @@ class GDriveToS3Transfer:
             typer.echo(f"⚠️  Warning: Could not get folder name: {e}")
             return 'root'
     
-    def list_files_in_folder(self, folder_id: str):
-        """List all files and folders in a Google Drive folder"""
+    def fetch_folder_listing(self, folder_id: str) -> list:
+        """List every child of a Google Drive folder, following all pages (raises on error)"""
+        # One service for all pages, so page tokens go back to the credential that issued them
+        service = self.drive_service
+        files = []
+        page_token = None
+        query = f"'{folder_id}' in parents and trashed=false"
+        while True:
+            results = self.retry_policy.run(
+                service.files().list(
+                    q=query,
+                    fields='nextPageToken, files(id, name, mimeType, size, md5Checksum, createdTime, modifiedTime, owners)',
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute,
+                on_retry=self._log_retry
+            )
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
+    
+    def list_files_in_folder(self, folder_id: str, current_path: str = ""):
+        """List all files and folders in a Google Drive folder
+        
+        With a journal, a folder that was fully listed before is served from the
+        journal instead of the Drive API.
+        """
+        if self.journal:
+            items = self.journal.get_listing(folder_id)
+            if items is not None:
+                return items
         try:
-            query = f"'{folder_id}' in parents and trashed=false"
-            results = self.drive_service.files().list(
-                q=query,
-                fields='files(id, name, mimeType, size, createdTime, modifiedTime, owners)',
-                pageSize=1000
-            ).execute()
-            return results.get('files', [])
+            items = self.fetch_folder_listing(folder_id)
         except Exception as e:
-            typer.echo(f"❌ Error listing files in folder {folder_id}: {e}")
+            self.reporter.error(f"❌ Error listing files in folder {folder_id}: {e}", markup=False)
             return []
+        if self.journal:
+            self.journal.save_listing(folder_id, current_path, items)
+        return items
     
     def add_metadata_record(self, item: dict, full_path: str, s3_key: str, status: str, 
                            file_size_bytes: int = 0, exported: bool = False, error_msg: str = ""):
@@ -129,168 +609,443 @@ class GDriveToS3Transfer:
             'transfer_timestamp': datetime.utcnow().isoformat(),
             'error_message': error_msg
         }
-        self.metadata_records.append(record)
+        with self.lock:
+            self.metadata_records.append(record)
+        return record
+    
+    def record_result(self, item: dict, full_path: str, s3_key: str, status: str,
+                      file_size_bytes: int = 0, exported: bool = False, error_msg: str = ""):
+        """Count a transfer outcome and add its metadata record (thread-safe)"""
+        with self.lock:
+            if status == 'SUCCESS':
+                self.transferred_count += 1
+            elif status == 'SKIPPED':
+                self.skipped_count += 1
+            else:
+                self.failed_count += 1
+        # Bytes were already reported chunk by chunk
+        if status == 'SUCCESS':
+            self.reporter.file_done()
+        elif status == 'SKIPPED':
+            self.reporter.file_skipped()
+        else:
+            self.reporter.file_failed(full_path, error_msg)
+        record = self.add_metadata_record(item, full_path, s3_key, status, file_size_bytes, exported, error_msg)
+        if self.journal:
+            self.journal.record(record)
     
     def export_google_workspace_file(self, file_id: str, mime_type: str, file_name: str) -> Optional[tuple]:
-        """Export Google Workspace files to appropriate format"""
-        # Map Google Workspace MIME types to export formats
-        export_formats = {
-            'application/vnd.google-apps.document': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', '.docx'),
-            'application/vnd.google-apps.spreadsheet': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
-            'application/vnd.google-apps.presentation': ('application/vnd.openxmlformats-officedocument.presentationml.presentation', '.pptx'),
-            'application/vnd.google-apps.drawing': ('application/pdf', '.pdf'),
-            'application/vnd.google-apps.script': ('application/vnd.google-apps.script+json', '.json'),
-            'application/vnd.google-apps.form': ('application/zip', '.zip'),
-        }
-        
-        if mime_type not in export_formats:
-            typer.echo(f"  ⚠️  Unsupported Google Workspace type: {mime_type}")
+        """Export Google Workspace files to the configured format"""
+        if mime_type not in self.export_formats:
+            self.reporter.message(f"  ⚠️  Unsupported Google Workspace type: {mime_type}", markup=False)
             return None
         
-        export_mime, extension = export_formats[mime_type]
+        export_mime, extension = self.export_formats[mime_type]
         
-        try:
+        def attempt():
             request = self.drive_service.files().export_media(
                 fileId=file_id,
                 mimeType=export_mime
             )
             file_buffer = io.BytesIO()
             downloader = MediaIoBaseDownload(file_buffer, request)
+            received = 0
             
             done = False
             while not done:
-                status, done = downloader.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    typer.echo(f"  Exporting: {progress}%", nl=False)
-                    typer.echo("\r", nl=False)
+                _, done = downloader.next_chunk()
+                self.reporter.add_bytes(file_buffer.tell() - received)
+                received = file_buffer.tell()
             
             file_buffer.seek(0)
+            return file_buffer.read()
+        
+        try:
+            file_data = self.retry_policy.run(attempt, on_retry=self._log_retry)
             # Add extension if not present
             if not file_name.endswith(extension):
                 file_name = file_name + extension
-            return file_buffer.read(), file_name
+            return file_data, file_name
         except Exception as e:
-            typer.echo(f"❌ Error exporting {file_name}: {e}")
+            self.reporter.error(f"❌ Error exporting {file_name}: {e}", markup=False)
             return None
     
     def download_file(self, file_id: str, file_name: str) -> Optional[bytes]:
         """Download file from Google Drive"""
-        try:
+        def attempt():
             request = self.drive_service.files().get_media(fileId=file_id)
             file_buffer = io.BytesIO()
             downloader = MediaIoBaseDownload(file_buffer, request)
+            received = 0
             
             done = False
             while not done:
-                status, done = downloader.next_chunk()
-                if status:
-                    progress = int(status.progress() * 100)
-                    typer.echo(f"  Downloading: {progress}%", nl=False)
-                    typer.echo("\r", nl=False)
+                _, done = downloader.next_chunk()
+                self.reporter.add_bytes(file_buffer.tell() - received)
+                received = file_buffer.tell()
             
             file_buffer.seek(0)
             return file_buffer.read()
+        
+        try:
+            return self.retry_policy.run(attempt, on_retry=self._log_retry)
         except Exception as e:
-            typer.echo(f"❌ Error downloading {file_name}: {e}")
+            self.reporter.error(f"❌ Error downloading {file_name}: {e}", markup=False)
             return None
     
     def upload_to_s3(self, file_data: bytes, s3_key: str, file_name: str) -> bool:
         """Upload file to S3"""
         try:
-            self.s3_client.put_object(
+            self.retry_policy.run(
+                self.s3_client.put_object,
                 Bucket=self.s3_bucket,
                 Key=s3_key,
-                Body=file_data
+                Body=file_data,
+                on_retry=self._log_retry
             )
-            typer.echo(f"✅ Uploaded: {s3_key}")
             return True
-        except ClientError as e:
-            typer.echo(f"❌ Error uploading {file_name} to S3: {e}")
+        except Exception as e:
+            self.reporter.error(f"❌ Error uploading {file_name} to S3: {e}", markup=False)
             return False
     
-    def process_folder_recursively(self, folder_id: str, current_path: str = ""):
-        """Recursively process all files and folders"""
-        items = self.list_files_in_folder(folder_id)
+    def build_s3_index(self) -> dict:
+        """Index every object under the target prefix as key -> (size, ETag)
         
-        if not items:
-            typer.echo(f"📁 Empty folder: {current_path or 'root'}")
-            return
+        One paginated ListObjectsV2 pass replaces a per-file existence check.
+        """
+        index = {}
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=self.s3_prefix):
+            for obj in page.get('Contents', []):
+                index[obj['Key']] = (obj['Size'], obj['ETag'].strip('"'))
+        self.s3_index = index
+        return index
+    
+    def is_unchanged_in_s3(self, item: dict, s3_key: str) -> bool:
+        """Check whether S3 already holds this Drive file's exact content
         
-        for item in items:
-            item_name = item['name']
-            item_id = item['id']
-            mime_type = item['mimeType']
+        Only binary files with a Drive md5Checksum qualify. A single-part ETag is
+        the object's MD5; for multipart objects the MD5 stored at upload time is
+        read with one HeadObject, and only once the size already matches.
+        """
+        existing = self.s3_index.get(s3_key)
+        md5_checksum = item.get('md5Checksum')
+        if existing is None or not md5_checksum or 'size' not in item:
+            return False
+        
+        size, etag = existing
+        if size != int(item['size']):
+            return False
+        if '-' not in etag:
+            return etag == md5_checksum
+        
+        try:
+            head = self.retry_policy.run(self.s3_client.head_object, Bucket=self.s3_bucket, Key=s3_key,
+                                         on_retry=self._log_retry)
+        except Exception:
+            return False
+        return head.get('Metadata', {}).get(MD5_METADATA_KEY) == md5_checksum
+    
+    def _upload_part(self, s3_key: str, upload_id: str, part_number: int, buffer: PartBuffer) -> dict:
+        response = self.retry_policy.run(
+            self.s3_client.upload_part,
+            Bucket=self.s3_bucket,
+            Key=s3_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=buffer.body(),
+            on_retry=self._log_retry
+        )
+        return {'PartNumber': part_number, 'ETag': response['ETag']}
+    
+    def stream_file_to_s3(self, file_id: str, file_name: str, s3_key: str,
+                          file_size: Optional[int] = None, md5_checksum: Optional[str] = None) -> Optional[int]:
+        """Stream a Drive file into S3 without holding the whole file in memory
+        
+        Drive chunks are downloaded straight into a small ring of reusable part
+        buffers; each full buffer is sent with UploadPart while the next one fills.
+        The ring is sized by ring_layout() and dropped with the transfer, so memory
+        stays at what inflight_size() reserves, at most PART_RING_SIZE x part size
+        whatever the file size, and objects over the 5 GB single-PUT limit transfer. Files that fit in one
+        part go up with a single PutObject. Returns the bytes transferred.
+        
+        Multipart ETags are not content MD5s, so the Drive md5Checksum is kept in
+        the object's metadata for later --skip-existing comparisons.
+        """
+        if file_size == 0:
+            try:
+                self.retry_policy.run(self.s3_client.put_object, Bucket=self.s3_bucket, Key=s3_key,
+                                      Body=b'', on_retry=self._log_retry)
+                return 0
+            except Exception as e:
+                self.reporter.error(f"❌ Error uploading {file_name} to S3: {e}", markup=False)
+                return None
+        
+        part_size = part_size_for(file_size, self.min_part_size)
+        buffer_count, buffer_size = ring_layout(file_size, part_size)
+        ring = [PartBuffer(buffer_size) for _ in range(buffer_count)]
+        sink = PartSink()
+        upload_id = None
+        
+        try:
+            request = self.drive_service.files().get_media(fileId=file_id)
+            downloader = MediaIoBaseDownload(sink, request, chunksize=part_size)
             
-            # Build the full path
-            if current_path:
-                full_path = f"{current_path}/{item_name}"
-            else:
-                full_path = item_name
+            parts = []
+            pending = [None] * len(ring)
+            part_number = 0
+            total = 0
+            done = False
             
-            # Check if it's a folder
-            if mime_type == 'application/vnd.google-apps.folder':
-                typer.echo(f"\n📁 Entering folder: {full_path}")
-                self.process_folder_recursively(item_id, full_path)
-            else:
-                # Handle Google Workspace files
-                if mime_type.startswith('application/vnd.google-apps.'):
-                    typer.echo(f"\n📝 Processing Google Workspace file: {full_path}")
+            with ThreadPoolExecutor(max_workers=max(1, len(ring) - 1)) as uploader:
+                while not done:
+                    slot = part_number % len(ring)
+                    if pending[slot] is not None:
+                        # Wait until the part previously in this buffer is uploaded
+                        parts.append(pending[slot].result())
+                        pending[slot] = None
                     
-                    # Export the file
-                    export_result = self.export_google_workspace_file(item_id, mime_type, item_name)
+                    buffer = ring[slot]
+                    buffer.length = 0
+                    sink.current = buffer
+                    _, done = self.retry_policy.run(downloader.next_chunk, on_retry=self._log_retry)
+                    total += buffer.length
+                    part_number += 1
+                    self.reporter.add_bytes(buffer.length)
                     
-                    if export_result:
-                        file_data, exported_file_name = export_result
-                        # Update the path with the exported filename
-                        if current_path:
-                            full_path_exported = f"{current_path}/{exported_file_name}"
-                        else:
-                            full_path_exported = exported_file_name
-                        
-                        # Upload to S3
-                        s3_key = self.s3_prefix + full_path_exported
-                        file_size = len(file_data)
-                        
-                        if self.upload_to_s3(file_data, s3_key, exported_file_name):
-                            self.transferred_count += 1
-                            self.add_metadata_record(item, full_path_exported, s3_key, 'SUCCESS', 
-                                                    file_size, exported=True)
-                        else:
-                            self.failed_count += 1
-                            self.add_metadata_record(item, full_path_exported, s3_key, 'FAILED', 
-                                                    file_size, exported=True, error_msg='S3 upload failed')
-                    else:
-                        self.failed_count += 1
-                        self.add_metadata_record(item, full_path, '', 'FAILED', 
-                                               exported=True, error_msg='Export failed')
-                    continue
-                
-                # Process regular file
-                typer.echo(f"\n📄 Processing: {full_path}")
-                file_size = item.get('size', 'Unknown')
-                if file_size != 'Unknown':
-                    size_mb = int(file_size) / (1024 * 1024)
-                    typer.echo(f"  Size: {size_mb:.2f} MB")
-                
-                # Download from Google Drive
-                file_data = self.download_file(item_id, item_name)
-                
-                if file_data:
-                    # Upload to S3
-                    s3_key = self.s3_prefix + full_path
-                    transferred_size = len(file_data)
+                    if done and part_number == 1:
+                        # Whole file fit in one part
+                        self.retry_policy.run(self.s3_client.put_object, Bucket=self.s3_bucket, Key=s3_key,
+                                              Body=buffer.body(), on_retry=self._log_retry)
+                        return total
                     
-                    if self.upload_to_s3(file_data, s3_key, item_name):
-                        self.transferred_count += 1
-                        self.add_metadata_record(item, full_path, s3_key, 'SUCCESS', transferred_size)
-                    else:
-                        self.failed_count += 1
-                        self.add_metadata_record(item, full_path, s3_key, 'FAILED', 
-                                               transferred_size, error_msg='S3 upload failed')
+                    if upload_id is None:
+                        upload_id = self.retry_policy.run(
+                            self.s3_client.create_multipart_upload,
+                            Bucket=self.s3_bucket, Key=s3_key,
+                            Metadata={MD5_METADATA_KEY: md5_checksum} if md5_checksum else {},
+                            on_retry=self._log_retry
+                        )['UploadId']
+                    pending[slot] = uploader.submit(self._upload_part, s3_key, upload_id, part_number, buffer)
+                
+                parts.extend(future.result() for future in pending if future is not None)
+            
+            parts.sort(key=lambda part: part['PartNumber'])
+            self.retry_policy.run(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.s3_bucket,
+                Key=s3_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts},
+                on_retry=self._log_retry
+            )
+            return total
+        
+        except Exception as e:
+            self.reporter.error(f"❌ Error streaming {file_name} to S3: {e}", markup=False)
+            if upload_id:
+                try:
+                    self.s3_client.abort_multipart_upload(Bucket=self.s3_bucket, Key=s3_key, UploadId=upload_id)
+                except Exception:
+                    pass  # Left for the bucket's lifecycle rule to clean up
+            return None
+    
+    def process_file(self, item: dict, current_path: str):
+        """Transfer a single (non-folder) Drive item to S3 within the in-flight memory budget"""
+        with self.budget.reserve(self.inflight_size(item)):
+            self._process_file(item, current_path)
+    
+    def inflight_size(self, item: dict) -> int:
+        """Bytes a transfer of this item holds in memory at once"""
+        if item['mimeType'].startswith('application/vnd.google-apps.'):
+            return EXPORT_SIZE_LIMIT
+        file_size = int(item['size']) if 'size' in item else None
+        if not self.stream or (self.packer and file_size is not None and file_size < self.pack_threshold):
+            return file_size or 0
+        buffer_count, buffer_size = ring_layout(file_size, part_size_for(file_size, self.min_part_size))
+        return buffer_count * buffer_size
+    
+    def _process_file(self, item: dict, current_path: str):
+        item_name = item['name']
+        item_id = item['id']
+        mime_type = item['mimeType']
+        
+        # Build the full path
+        if current_path:
+            full_path = f"{current_path}/{item_name}"
+        else:
+            full_path = item_name
+        
+        # Handle Google Workspace files
+        if mime_type.startswith('application/vnd.google-apps.'):
+            # Export the file
+            export_result = self.export_google_workspace_file(item_id, mime_type, item_name)
+        
+            if export_result:
+                file_data, exported_file_name = export_result
+                # Update the path with the exported filename
+                if current_path:
+                    full_path_exported = f"{current_path}/{exported_file_name}"
                 else:
-                    self.failed_count += 1
-                    self.add_metadata_record(item, full_path, '', 'FAILED', error_msg='Download failed')
+                    full_path_exported = exported_file_name
+        
+                # Upload to S3
+                s3_key = self.s3_prefix + full_path_exported
+                file_size = len(file_data)
+        
+                if self.upload_to_s3(file_data, s3_key, exported_file_name):
+                    self.record_result(item, full_path_exported, s3_key, 'SUCCESS', file_size, exported=True)
+                else:
+                    self.record_result(item, full_path_exported, s3_key, 'FAILED', file_size,
+                                       exported=True, error_msg='S3 upload failed')
+            else:
+                self.record_result(item, full_path, '', 'FAILED', exported=True, error_msg='Export failed')
+            return
+        
+        # Process regular file
+        file_size = item.get('size', 'Unknown')
+        
+        if self.packer and file_size != 'Unknown' and int(file_size) < self.pack_threshold:
+            # Small file: goes into a tar shard, recorded once the shard is uploaded
+            file_data = self.download_file(item_id, item_name)
+            if file_data is None:
+                self.record_result(item, full_path, '', 'FAILED', error_msg='Download failed')
+            else:
+                self.packer.add(item, full_path, file_data)
+            return
+        
+        if self.stream:
+            s3_key = self.s3_prefix + full_path
+            transferred_size = self.stream_file_to_s3(
+                item_id, item_name, s3_key,
+                int(file_size) if file_size != 'Unknown' else None,
+                item.get('md5Checksum')
+            )
+            if transferred_size is not None:
+                self.record_result(item, full_path, s3_key, 'SUCCESS', transferred_size)
+            else:
+                self.record_result(item, full_path, s3_key, 'FAILED', error_msg='Streaming transfer failed')
+            return
+        
+        # Download from Google Drive
+        file_data = self.download_file(item_id, item_name)
+        
+        if file_data:
+            # Upload to S3
+            s3_key = self.s3_prefix + full_path
+            transferred_size = len(file_data)
+        
+            if self.upload_to_s3(file_data, s3_key, item_name):
+                self.record_result(item, full_path, s3_key, 'SUCCESS', transferred_size)
+            else:
+                self.record_result(item, full_path, s3_key, 'FAILED', transferred_size,
+                                   error_msg='S3 upload failed')
+        else:
+            self.record_result(item, full_path, '', 'FAILED', error_msg='Download failed')
+    
+    def _crawl(self, folder_queue: queue.Queue, file_queue: queue.Queue, export_queue: queue.Queue):
+        """Crawler thread: list folders, queue subfolders and produce file and export tasks"""
+        while True:
+            task = folder_queue.get()
+            if task is None:
+                folder_queue.task_done()
+                return
+            folder_id, current_path = task
+            try:
+                if self.stop_event.is_set():
+                    continue
+                items = self.list_files_in_folder(folder_id, current_path)
+                if not items:
+                    self.reporter.message(f"📁 Empty folder: {current_path or 'root'}", markup=False)
+                for item in items:
+                    full_path = f"{current_path}/{item['name']}" if current_path else item['name']
+                    if item['mimeType'] == 'application/vnd.google-apps.folder':
+                        folder_queue.put((item['id'], full_path))
+                        continue
+                    if self.journal and self.journal.is_complete(item['id'], item.get('modifiedTime', '')):
+                        with self.lock:
+                            self.skipped_count += 1
+                        self.reporter.file_skipped()
+                        continue
+                    s3_key = self.s3_prefix + full_path
+                    if self.s3_index is not None and self.is_unchanged_in_s3(item, s3_key):
+                        self.record_result(item, full_path, s3_key, 'SKIPPED', int(item['size']),
+                                           error_msg='Identical object already in S3')
+                        continue
+                    # Workspace exports are slow server-side conversions, so they go
+                    # to their own pool instead of holding up binary transfers
+                    target_queue = export_queue if item['mimeType'].startswith('application/vnd.google-apps.') else file_queue
+                    # Blocks while the workers are behind, which bounds memory
+                    while not self.stop_event.is_set():
+                        try:
+                            target_queue.put((item, current_path), timeout=1)
+                            break
+                        except queue.Full:
+                            pass
+            finally:
+                folder_queue.task_done()
+    
+    def _work(self, file_queue: queue.Queue):
+        """Worker thread: run download/export -> upload for file tasks until the sentinel"""
+        while True:
+            task = file_queue.get()
+            if task is None or self.stop_event.is_set():
+                return
+            item, current_path = task
+            try:
+                self.process_file(item, current_path)
+            except Exception as e:
+                full_path = f"{current_path}/{item['name']}" if current_path else item['name']
+                self.record_result(item, full_path, '', 'FAILED', error_msg=str(e))
+    
+    def process_folder_recursively(self, folder_id: str, current_path: str = ""):
+        """Transfer a folder tree through a crawler -> bounded queue -> worker pipeline
+        
+        Crawler threads list folders and feed file tasks into a bounded queue,
+        while a pool of workers runs download -> upload on many files at once, so
+        a large migration runs at aggregate bandwidth instead of per-file latency.
+        Google Workspace exports run on a separate, smaller pool alongside, and
+        in pack mode small files are collected into tar shards.
+        """
+        self.stop_event.clear()
+        folder_queue = queue.Queue()
+        file_queue = queue.Queue(maxsize=self.queue_size)
+        export_queue = queue.Queue(maxsize=self.queue_size)
+        folder_queue.put((folder_id, current_path))
+        
+        crawlers = [threading.Thread(target=self._crawl, args=(folder_queue, file_queue, export_queue), daemon=True)
+                    for _ in range(self.crawlers)]
+        workers = [threading.Thread(target=self._work, args=(file_queue,), daemon=True)
+                   for _ in range(self.workers)]
+        exporters = [threading.Thread(target=self._work, args=(export_queue,), daemon=True)
+                     for _ in range(self.export_workers)]
+        for thread in crawlers + workers + exporters:
+            thread.start()
+        
+        def finish_crawl():
+            # Once every queued folder has been listed, stop the crawlers and
+            # send each worker a sentinel behind the remaining file tasks
+            folder_queue.join()
+            for _ in crawlers:
+                folder_queue.put(None)
+            for _ in workers:
+                file_queue.put(None)
+            for _ in exporters:
+                export_queue.put(None)
+        
+        threading.Thread(target=finish_crawl, daemon=True).start()
+        
+        try:
+            # Join with a timeout so Ctrl-C still reaches the main thread
+            for thread in workers + exporters:
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            raise
+        
+        if self.packer:
+            self.packer.close()
     
     def save_metadata_to_csv(self, output_file: str = None):
         """Save metadata records to CSV file"""
@@ -337,7 +1092,38 @@ def transfer(
     folder_id: str = typer.Argument(..., help="Google Drive folder ID"),
     s3_path: str = typer.Argument(..., help="S3 path (e.g., 's3://bucket/prefix/' or 'bucket/prefix/')"),
     credentials_file: str = typer.Option("credentials.json", help="Path to Google OAuth credentials JSON file"),
-    csv_output: str = typer.Option(None, help="Custom CSV output filename (default: auto-generated with timestamp)")
+    csv_output: str = typer.Option(None, help="Custom CSV output filename (default: auto-generated with timestamp)"),
+    max_retries: int = typer.Option(5, help="Maximum attempts per request for transient errors"),
+    retry_budget: int = typer.Option(1000, help="Maximum total retries across the whole run"),
+    stream: bool = typer.Option(True, "--stream/--no-stream", help="Stream files to S3 in multipart chunks instead of buffering whole files"),
+    part_size_mb: int = typer.Option(8, help="Minimum multipart part size in MB for streamed transfers (at least 5)"),
+    workers: int = typer.Option(8, help="Number of concurrent download -> upload workers"),
+    crawlers: int = typer.Option(4, help="Number of folder-listing threads"),
+    queue_size: int = typer.Option(1000, help="Maximum file tasks queued between crawlers and workers"),
+    journal_file: str = typer.Option(None, "--journal", help="SQLite checkpoint journal (default: gdrive_to_s3_<folder_id>.journal.db)"),
+    resume: bool = typer.Option(False, "--resume", help="Resume from the journal, skipping folders already listed and files already transferred"),
+    fresh: bool = typer.Option(False, "--fresh", help="Discard an existing journal and start the migration over"),
+    skip_existing: bool = typer.Option(False, "--skip-existing", help="List the S3 prefix once and skip files whose size and MD5 already match"),
+    max_inflight_bytes: Optional[str] = typer.Option(None, "--max-inflight-bytes", help="Cap on file data held in memory across all workers, e.g. 2G or 512M"),
+    pack: bool = typer.Option(False, "--pack", help="Pack small files into tar shards with a sidecar offset index instead of one object each"),
+    pack_threshold_kb: int = typer.Option(1024, help="Files smaller than this (KB) are packed in --pack mode"),
+    shard_size_mb: int = typer.Option(256, help="Target tar shard size in MB for --pack"),
+    progress_mode: str = typer.Option("console", "--progress", help="Progress output: console (4 Hz bar), json (periodic JSON lines on stderr) or quiet"),
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Shorthand for --progress quiet"),
+    export_workers: int = typer.Option(4, help="Number of concurrent Google Workspace export workers"),
+    engine: str = typer.Option("thread", "--engine", help="Transfer engine: 'thread' (worker threads) or 'async' (asyncio, needs aiohttp and aiobotocore)"),
+    list_concurrency: int = typer.Option(8, help="Concurrent folder listings for the async engine"),
+    download_concurrency: int = typer.Option(32, help="Concurrent Drive downloads for the async engine"),
+    upload_concurrency: int = typer.Option(32, help="Concurrent S3 part uploads for the async engine"),
+    s3_endpoint_url: Optional[str] = typer.Option(None, help="Custom S3 endpoint, e.g. a local S3 stand-in"),
+    max_pool_connections: Optional[int] = typer.Option(None, help="S3 connection pool size (default: sized from the worker counts)"),
+    pool_token: Optional[List[str]] = typer.Option(None, "--pool-token", help="Extra OAuth token pickle or service-account key (.json) to spread Drive requests over. Can be repeated"),
+    credential_strategy: str = typer.Option("least-loaded", help=f"How Drive requests are spread over credentials: {', '.join(POOL_STRATEGIES)}"),
+    requests_per_second: Optional[float] = typer.Option(None, help="Drive API request rate limit per credential (default: unlimited)"),
+    export_format: Optional[List[str]] = typer.Option(
+        None, "--export-format",
+        help="Export format override as TYPE=FORMAT (TYPE: document, spreadsheet, presentation, drawing or all), e.g. all=pdf. Can be repeated"
+    )
 ):
     """
     Transfer all files from a Google Drive folder to S3 recursively.
@@ -346,11 +1132,21 @@ def transfer(
         python script.py 1a2b3c4d5e6f s3://my-bucket/gdrive-backup/
         python script.py 1a2b3c4d5e6f my-bucket/gdrive-backup/
         python script.py 1a2b3c4d5e6f my-bucket --csv-output=transfer_log.csv
+        python script.py 1a2b3c4d5e6f my-bucket --export-format all=pdf
+        python script.py 1a2b3c4d5e6f my-bucket --pack --shard-size-mb 512
     """
     typer.echo("=" * 60)
     typer.echo("🚀 Google Drive to S3 Transfer Tool")
     typer.echo("=" * 60)
     
+    if engine not in ('thread', 'async'):
+        typer.echo(f"❌ Unknown engine '{engine}', use 'thread' or 'async'")
+        raise typer.Exit(code=1)
+    if engine == 'async' and (pack or not stream):
+        # The async engine always streams and uploads one object per file
+        typer.echo("⚠️  --pack and --no-stream apply to the thread engine only")
+        pack, stream = False, True
+    
     # Parse S3 path
     try:
         s3_bucket, s3_prefix = parse_s3_path(s3_path)
@@ -361,8 +1157,44 @@ def transfer(
         typer.echo("\nExpected format: 's3://bucket-name/prefix/' or 'bucket-name/prefix/'")
         raise typer.Exit(code=1)
     
+    try:
+        export_formats = parse_export_formats(export_format)
+        budget = ByteBudget(parse_size(max_inflight_bytes) if max_inflight_bytes else None)
+        reporter = ProgressReporter("Transferring files", mode='quiet' if quiet else progress_mode)
+    except ValueError as e:
+        typer.echo(f"❌ {e}")
+        raise typer.Exit(code=1)
+    
+    # An existing journal is the checkpoint of an earlier run; only wipe it when asked to
+    journal_file = journal_file or f"gdrive_to_s3_{folder_id}.journal.db"
+    if resume and fresh:
+        typer.echo("❌ --resume and --fresh cannot be combined")
+        raise typer.Exit(code=1)
+    if Path(journal_file).exists() and not (resume or fresh):
+        typer.echo(f"❌ Journal {journal_file} holds an earlier run's checkpoint; "
+                   f"pass --resume to continue it or --fresh to start over")
+        raise typer.Exit(code=1)
+    
     # Initialize transfer object
-    transfer_obj = GDriveToS3Transfer(s3_bucket, s3_prefix)
+    retry_policy = RetryPolicy(max_attempts=max_retries, max_total_retries=retry_budget)
+    transfer_obj = GDriveToS3Transfer(s3_bucket, s3_prefix, retry_policy, stream=stream,
+                                      min_part_size=max(5, part_size_mb) * 1024 * 1024,
+                                      workers=workers, crawlers=crawlers, queue_size=queue_size,
+                                      export_workers=export_workers,
+                                      export_formats=export_formats, budget=budget, reporter=reporter,
+                                      pack_threshold=pack_threshold_kb * 1024 if pack else None,
+                                      shard_size=shard_size_mb * 1024 * 1024, s3_endpoint_url=s3_endpoint_url,
+                                      max_pool_connections=max_pool_connections, pool_tokens=pool_token,
+                                      credential_strategy=credential_strategy,
+                                      requests_per_second=requests_per_second)
+    if skip_existing:
+        typer.echo(f"\n🔎 Indexing existing objects under s3://{s3_bucket}/{s3_prefix}...")
+        try:
+            index = transfer_obj.build_s3_index()
+        except Exception as e:
+            typer.echo(f"❌ Error listing S3 objects: {e}")
+            raise typer.Exit(code=1)
+        typer.echo(f"✅ Indexed {len(index)} existing object(s)")
     
     # Authenticate with Google Drive
     try:
@@ -375,6 +1207,9 @@ def transfer(
     folder_name = transfer_obj.get_folder_name(folder_id)
     typer.echo(f"\n📂 Source folder: {folder_name}")
     typer.echo(f"☁️  Target S3: s3://{s3_bucket}/{s3_prefix}")
+    if pack:
+        typer.echo(f"📦 Packing files under {pack_threshold_kb} KB into ~{shard_size_mb} MB tar shards "
+                   f"at s3://{s3_bucket}/{transfer_obj.s3_prefix}{PACK_DIR}/")
     typer.echo("\n" + "=" * 60)
     
     # Confirm before starting
@@ -383,10 +1218,24 @@ def transfer(
         typer.echo("❌ Transfer cancelled")
         raise typer.Exit()
     
+    # Open the checkpoint journal only once the run is confirmed; --fresh starts it empty
+    journal = TransferJournal(journal_file, reset=fresh)
+    transfer_obj.journal = journal
+    if resume:
+        typer.echo(f"\n🔁 Resuming from {journal_file}: {len(journal.completed)} file(s) already transferred")
+        # Earlier runs' successes belong in this run's metadata CSV too
+        transfer_obj.metadata_records.extend(journal.successful_records())
+    
     # Start transfer
     start_time = datetime.now()
     try:
-        transfer_obj.process_folder_recursively(folder_id)
+        with reporter:
+            if engine == 'async':
+                from gdrive_to_s3_async import run_async_transfer
+                run_async_transfer(transfer_obj, folder_id, list_concurrency, download_concurrency,
+                                   upload_concurrency, queue_size, s3_endpoint_url)
+            else:
+                transfer_obj.process_folder_recursively(folder_id)
     except KeyboardInterrupt:
         typer.echo("\n\n⚠️  Transfer interrupted by user")
     except Exception as e:
@@ -402,11 +1251,17 @@ def transfer(
     typer.echo("=" * 60)
     typer.echo(f"✅ Successfully transferred: {transfer_obj.transferred_count} files")
     typer.echo(f"❌ Failed: {transfer_obj.failed_count} files")
+    if resume or skip_existing:
+        typer.echo(f"⏭️  Already in S3 (skipped): {transfer_obj.skipped_count} files")
+    if transfer_obj.pool is not None and len(transfer_obj.pool) > 1:
+        for name, requests, throttled in transfer_obj.pool.stats():
+            typer.echo(f"🔑 {name}: {requests} Drive request(s), {throttled} throttled")
     typer.echo(f"⏱️  Total time: {duration}")
     typer.echo("=" * 60)
     
     # Save metadata to CSV
     transfer_obj.save_metadata_to_csv(csv_output)
+    journal.close()
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Asyncio transfer engine for gdrive_to_s3.
+
+Lists, downloads and uploads on one event loop, with aiohttp for Drive and
+aiobotocore for S3, so hundreds of transfers can be in flight on a single core.
+Each stage has its own concurrency limit and the stages are joined by bounded
+queues, so a fast stage waits for a slow one instead of piling up data. Each
+file reserves its buffers from the transfer's in-flight budget
+(--max-inflight-bytes) before it is fetched, as in the thread engine.
+Used by `gdrive_to_s3.py transfer --engine async`.
+
+Requirements:
+    pip install aiohttp aiobotocore
+"""
+
+import asyncio
+import json
+from typing import Optional
+
+from gdrive_to_s3 import MD5_METADATA_KEY, PART_RING_SIZE, GDriveToS3Transfer, part_size_for
+from gup_async import DriveResponseError, TokenProvider, request
+from s3_client import s3_config_kwargs
+
+DRIVE_API_URL = 'https://www.googleapis.com/drive/v3'
+LIST_FIELDS = 'nextPageToken, files(id, name, mimeType, size, md5Checksum, createdTime, modifiedTime, owners)'
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+# Read size for streamed Drive responses
+READ_CHUNK_SIZE = 256 * 1024
+
+
+class FileUpload:
+    """Tracks the parts of one file that are waiting in, or moving through, the upload stage"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.upload_id = None
+        self.parts = []
+        self.pending = 0
+        self.all_queued = False
+        self.error = None
+        self.done = asyncio.Event()
+        self.part_done = asyncio.Event()
+
+    def part_finished(self, part: Optional[dict] = None, error: Optional[Exception] = None):
+        self.pending -= 1
+        if part:
+            self.parts.append(part)
+        if error and self.error is None:
+            self.error = error
+        self.part_done.set()
+        if self.error is not None or (self.all_queued and self.pending == 0):
+            self.done.set()
+
+
+class AsyncTransferEngine:
+    """Runs a GDriveToS3Transfer's folder tree through list -> download -> upload stages.
+
+    The transfer object supplies credentials, the S3 target, retry policy,
+    journal, export formats, progress reporter and result bookkeeping, so both
+    engines produce the same CSV and journal records.
+    """
+
+    def __init__(self, transfer: GDriveToS3Transfer, list_concurrency: int = 8, download_concurrency: int = 32,
+                 upload_concurrency: int = 32, queue_size: int = 1000, s3_endpoint_url: Optional[str] = None,
+                 drive_url: str = DRIVE_API_URL):
+        self.transfer = transfer
+        self.list_concurrency = list_concurrency
+        self.download_concurrency = download_concurrency
+        self.upload_concurrency = upload_concurrency
+        self.queue_size = queue_size
+        self.s3_endpoint_url = s3_endpoint_url
+        self.drive_url = drive_url.rstrip('/')
+        self.tokens = None
+        self.session = None
+        self.s3 = None
+
+    # -- Drive -------------------------------------------------------------
+
+    async def drive_get(self, path: str, **params) -> bytes:
+        _, _, body = await self.transfer.retry_policy.run_async(
+            request, self.session, self.tokens, 'GET', f"{self.drive_url}/{path}",
+            params=params, on_retry=self.transfer._log_retry
+        )
+        return body
+
+    async def list_folder(self, folder_id: str, current_path: str) -> list:
+        """List a folder's children, from the journal when it was listed before"""
+        journal = self.transfer.journal
+        if journal:
+            items = journal.get_listing(folder_id)
+            if items is not None:
+                return items
+
+        items = []
+        params = {'q': f"'{folder_id}' in parents and trashed=false", 'fields': LIST_FIELDS, 'pageSize': 1000}
+        while True:
+            page = json.loads(await self.drive_get('files', **params))
+            items.extend(page.get('files', []))
+            if not page.get('nextPageToken'):
+                break
+            params['pageToken'] = page['nextPageToken']
+
+        if journal:
+            journal.save_listing(folder_id, current_path, items)
+        return items
+
+    # -- stages ------------------------------------------------------------
+
+    async def list_worker(self, folder_queue: asyncio.Queue, file_queue: asyncio.Queue):
+        transfer = self.transfer
+        while True:
+            folder_id, current_path = await folder_queue.get()
+            try:
+                items = await self.list_folder(folder_id, current_path)
+                for item in items:
+                    full_path = f"{current_path}/{item['name']}" if current_path else item['name']
+                    if item['mimeType'] == FOLDER_MIME_TYPE:
+                        folder_queue.put_nowait((item['id'], full_path))
+                        continue
+                    if transfer.journal and transfer.journal.is_complete(item['id'], item.get('modifiedTime', '')):
+                        with transfer.lock:
+                            transfer.skipped_count += 1
+                        transfer.reporter.file_skipped()
+                        continue
+                    s3_key = transfer.s3_prefix + full_path
+                    if transfer.s3_index is not None and await asyncio.to_thread(
+                            transfer.is_unchanged_in_s3, item, s3_key):
+                        transfer.record_result(item, full_path, s3_key, 'SKIPPED', int(item['size']),
+                                               error_msg='Identical object already in S3')
+                        continue
+                    # Blocks while the downloaders are behind
+                    await file_queue.put((item, current_path))
+            except Exception as e:
+                transfer.reporter.error(f"❌ Error listing files in folder {folder_id}: {e}", markup=False)
+            finally:
+                folder_queue.task_done()
+
+    async def download_worker(self, file_queue: asyncio.Queue, part_queue: asyncio.Queue):
+        while True:
+            item, current_path = await file_queue.get()
+            full_path = f"{current_path}/{item['name']}" if current_path else item['name']
+            try:
+                # Waits until the file's buffers fit in the in-flight budget
+                async with self.transfer.budget.reserve_async(self.transfer.inflight_size(item)):
+                    if item['mimeType'].startswith('application/vnd.google-apps.'):
+                        await self.export_file(item, current_path)
+                    else:
+                        await self.transfer_file(item, full_path, part_queue)
+            except Exception as e:
+                self.transfer.record_result(item, full_path, '', 'FAILED', error_msg=str(e))
+            finally:
+                file_queue.task_done()
+
+    async def upload_worker(self, part_queue: asyncio.Queue):
+        transfer = self.transfer
+        while True:
+            upload, part_number, body = await part_queue.get()
+            try:
+                if upload.error is not None:
+                    continue
+                if part_number is None:
+                    await transfer.retry_policy.run_async(
+                        self.s3.put_object, Bucket=transfer.s3_bucket, Key=upload.key, Body=body,
+                        on_retry=transfer._log_retry
+                    )
+                    upload.part_finished()
+                else:
+                    response = await transfer.retry_policy.run_async(
+                        self.s3.upload_part, Bucket=transfer.s3_bucket, Key=upload.key,
+                        UploadId=upload.upload_id, PartNumber=part_number, Body=body,
+                        on_retry=transfer._log_retry
+                    )
+                    upload.part_finished({'PartNumber': part_number, 'ETag': response['ETag']})
+            except Exception as e:
+                upload.part_finished(error=e)
+            finally:
+                part_queue.task_done()
+
+    # -- per-file work -----------------------------------------------------
+
+    async def export_file(self, item: dict, current_path: str):
+        """Export a Google Workspace file (at most 10 MB) and put it as one object"""
+        transfer = self.transfer
+        full_path = f"{current_path}/{item['name']}" if current_path else item['name']
+        if item['mimeType'] not in transfer.export_formats:
+            transfer.reporter.message(f"  ⚠️  Unsupported Google Workspace type: {item['mimeType']}", markup=False)
+            transfer.record_result(item, full_path, '', 'FAILED', exported=True, error_msg='Export failed')
+            return
+
+        export_mime, extension = transfer.export_formats[item['mimeType']]
+        data = await self.drive_get(f"files/{item['id']}/export", mimeType=export_mime)
+        transfer.reporter.add_bytes(len(data))
+
+        file_name = item['name'] if item['name'].endswith(extension) else item['name'] + extension
+        full_path = f"{current_path}/{file_name}" if current_path else file_name
+        s3_key = transfer.s3_prefix + full_path
+        await transfer.retry_policy.run_async(
+            self.s3.put_object, Bucket=transfer.s3_bucket, Key=s3_key, Body=data,
+            on_retry=transfer._log_retry
+        )
+        transfer.record_result(item, full_path, s3_key, 'SUCCESS', len(data), exported=True)
+
+    async def transfer_file(self, item: dict, full_path: str, part_queue: asyncio.Queue):
+        """Stream a Drive file into S3 parts; the upload stage sends them
+
+        A dropped download resumes with a Range request from the last byte
+        received, so no part is fetched twice. As with the thread engine's part
+        ring, a file has at most PART_RING_SIZE - 1 parts waiting for upload
+        besides the one being filled, which is what inflight_size() reserves.
+        """
+        import aiohttp
+
+        transfer = self.transfer
+        s3_key = transfer.s3_prefix + full_path
+        file_size = int(item['size']) if 'size' in item else None
+        part_size = part_size_for(file_size, transfer.min_part_size)
+        upload = FileUpload(s3_key)
+        state = {'received': 0, 'buffer': bytearray(), 'part_number': 0}
+
+        async def queue_parts(final: bool):
+            buffer = state['buffer']
+            if final and state['part_number'] == 0:
+                # The whole file fit in one part: a single PutObject
+                upload.pending += 1
+                await part_queue.put((upload, None, bytes(buffer)))
+                buffer.clear()
+                return
+            while len(buffer) >= part_size or (final and buffer):
+                if upload.upload_id is None:
+                    upload.upload_id = (await transfer.retry_policy.run_async(
+                        self.s3.create_multipart_upload, Bucket=transfer.s3_bucket, Key=s3_key,
+                        Metadata={MD5_METADATA_KEY: item['md5Checksum']} if item.get('md5Checksum') else {},
+                        on_retry=transfer._log_retry
+                    ))['UploadId']
+                while upload.pending >= PART_RING_SIZE - 1 and upload.error is None:
+                    upload.part_done.clear()
+                    await upload.part_done.wait()
+                body = bytes(buffer[:part_size])
+                del buffer[:part_size]
+                state['part_number'] += 1
+                upload.pending += 1
+                # Blocks while the uploaders are behind
+                await part_queue.put((upload, state['part_number'], body))
+
+        async def fetch():
+            auth = await self.tokens.headers()
+            headers = dict(auth)
+            if state['received']:
+                headers['Range'] = f"bytes={state['received']}-"
+            status, retry_after, body = None, None, b''
+            try:
+                async with self.session.get(f"{self.drive_url}/files/{item['id']}", params={'alt': 'media'},
+                                            headers=headers) as resp:
+                    status, retry_after = resp.status, resp.headers.get('Retry-After')
+                    if resp.status == 401:
+                        # Released as a 401, so the token is refreshed before its next use
+                        raise ConnectionError("Access token expired")
+                    if resp.status not in (200, 206):
+                        body = await resp.read()
+                        raise DriveResponseError(resp.status, dict(resp.headers), body)
+                    # A server ignoring Range resends from the start
+                    skip = state['received'] if resp.status == 200 else 0
+                    async for chunk in resp.content.iter_chunked(READ_CHUNK_SIZE):
+                        if skip:
+                            dropped = min(skip, len(chunk))
+                            chunk, skip = chunk[dropped:], skip - dropped
+                        state['buffer'] += chunk
+                        state['received'] += len(chunk)
+                        transfer.reporter.add_bytes(len(chunk))
+                        if len(state['buffer']) >= part_size:
+                            await queue_parts(final=False)
+            except aiohttp.ClientError as e:
+                raise ConnectionError(str(e)) from e
+            finally:
+                self.tokens.release(auth, status, body, retry_after)
+
+        try:
+            await transfer.retry_policy.run_async(fetch, on_retry=transfer._log_retry)
+            await queue_parts(final=True)
+            upload.all_queued = True
+            if upload.pending == 0:
+                upload.done.set()
+            await upload.done.wait()
+            if upload.error is not None:
+                raise upload.error
+
+            if upload.upload_id is not None:
+                upload.parts.sort(key=lambda part: part['PartNumber'])
+                await transfer.retry_policy.run_async(
+                    self.s3.complete_multipart_upload, Bucket=transfer.s3_bucket, Key=s3_key,
+                    UploadId=upload.upload_id, MultipartUpload={'Parts': upload.parts},
+                    on_retry=transfer._log_retry
+                )
+        except Exception as e:
+            upload.error = upload.error or e
+            if upload.upload_id is not None:
+                try:
+                    await self.s3.abort_multipart_upload(Bucket=transfer.s3_bucket, Key=s3_key,
+                                                         UploadId=upload.upload_id)
+                except Exception:
+                    pass  # Left for the bucket's lifecycle rule to clean up
+            transfer.reporter.error(f"❌ Error streaming {item['name']} to S3: {e}", markup=False)
+            transfer.record_result(item, full_path, s3_key, 'FAILED', error_msg='Streaming transfer failed')
+            return
+
+        transfer.record_result(item, full_path, s3_key, 'SUCCESS', state['received'])
+
+    # -- driver ------------------------------------------------------------
+
+    async def run(self, folder_id: str, current_path: str = ""):
+        import aiohttp
+        from aiobotocore.config import AioConfig
+        from aiobotocore.session import get_session
+
+        self.tokens = TokenProvider(self.transfer.pool)
+        http_limit = self.list_concurrency + self.download_concurrency
+        connector = aiohttp.TCPConnector(limit=http_limit, limit_per_host=http_limit)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+        s3_config = AioConfig(**s3_config_kwargs(self.upload_concurrency + self.download_concurrency))
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session, \
+                get_session().create_client('s3', endpoint_url=self.s3_endpoint_url, config=s3_config) as s3:
+            self.session, self.s3 = session, s3
+
+            folder_queue = asyncio.Queue()
+            file_queue = asyncio.Queue(maxsize=self.queue_size)
+            part_queue = asyncio.Queue(maxsize=self.upload_concurrency)
+            folder_queue.put_nowait((folder_id, current_path))
+
+            stages = [
+                (folder_queue, [asyncio.create_task(self.list_worker(folder_queue, file_queue))
+                                for _ in range(self.list_concurrency)]),
+                (file_queue, [asyncio.create_task(self.download_worker(file_queue, part_queue))
+                              for _ in range(self.download_concurrency)]),
+                (part_queue, [asyncio.create_task(self.upload_worker(part_queue))
+                              for _ in range(self.upload_concurrency)]),
+            ]
+            try:
+                # Drain the stages in order: once a queue is empty and no upstream
+                # stage can feed it any more, its workers are done
+                for stage_queue, _ in stages:
+                    await stage_queue.join()
+            finally:
+                workers = [task for _, tasks in stages for task in tasks]
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+
+def run_async_transfer(transfer: GDriveToS3Transfer, folder_id: str, list_concurrency: int = 8,
+                       download_concurrency: int = 32, upload_concurrency: int = 32, queue_size: int = 1000,
+                       s3_endpoint_url: Optional[str] = None, drive_url: str = DRIVE_API_URL):
+    """Entry point used by gdrive_to_s3: transfer a folder tree on an event loop."""
+    engine = AsyncTransferEngine(transfer, list_concurrency, download_concurrency, upload_concurrency,
+                                 queue_size, s3_endpoint_url, drive_url)
+    asyncio.run(engine.run(folder_id))
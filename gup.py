@@ -5,13 +5,19 @@ Uploads files to Google Drive with metadata export and folder structure preserva
 """
 
 import csv
+import fnmatch
+import hashlib
+import io
+import json
 import mimetypes
 import os
+import tarfile
+import time
+import zipfile
 from pathlib import Path
-from datetime import datetime
 from typing import Optional, List, Dict
 import concurrent.futures
-from threading import Lock
+from threading import BoundedSemaphore, Lock
 
 import typer
 from google.oauth2.credentials import Credentials
@@ -21,45 +27,100 @@ from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from googleapiclient.errors import HttpError
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TransferSpeedColumn
+from rich.markup import escape
 from rich.table import Table
 import pickle
 
+from credential_pool import POOL_STRATEGIES, CredentialPool, pick_service, pinned_service
+from drive_upload import (DEFAULT_RETRY_POLICY, FILE_FIELDS, LocalFile, MemberStream, UploadStats,
+                          build_upload_metadata, create_once, get_or_create_folder, upload_stream)
+from progress_reporter import PROGRESS_MODES, ProgressReporter, print_message
+from retry_policy import RetryPolicy
+
 # Scopes required for Google Drive API
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
 app = typer.Typer(help="Upload files to Google Drive with metadata")
 console = Console()
 
-# Thread-safe counter for progress
-class UploadStats:
-    def __init__(self):
+class UploadJournal:
+    """Append-only log of resumable upload sessions so interrupted uploads can continue.
+
+    Each line records the session URI, acknowledged offset and the name of the
+    pool credential that opened the session for one file, or the Drive file info
+    once it has finished. The latest line for a key wins on load.
+    """
+
+    # Drive keeps resumable sessions for about a week; stay safely inside that
+    SESSION_TTL = 6 * 24 * 3600
+
+    def __init__(self, journal_file: Path):
+        self.journal_file = journal_file
         self.lock = Lock()
-        self.files_uploaded = 0
-        self.files_failed = 0
-        self.total_size = 0
-        self.metadata = []
-        self.failed_files = []
-        self.folder_cache = {}  # Cache folder IDs to avoid duplicate creation
-    
-    def add_file(self, size: int, metadata: dict):
-        with self.lock:
-            self.files_uploaded += 1
-            self.total_size += size
-            self.metadata.append(metadata)
-    
-    def add_failed(self, file_name: str, error: str):
+        self.entries = {}
+
+        if journal_file.exists():
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn write from a crash mid-append
+                    if record.get('discard'):
+                        self.entries.pop(record['key'], None)
+                    else:
+                        self.entries[record['key']] = record
+
+        now = time.time()
+        self.entries = {
+            key: entry for key, entry in self.entries.items()
+            if entry.get('file') or now - entry.get('started', 0) < self.SESSION_TTL
+        }
+
+        # Compact the log so it only holds live entries
+        tmp_file = journal_file.with_name(journal_file.name + '.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp_file, journal_file)
+
+        self.log = open(journal_file, 'a', encoding='utf-8')
+
+    @staticmethod
+    def make_key(file_path: Path, parent_id: Optional[str]) -> str:
+        return f"{parent_id or 'root'}:{file_path.resolve()}"
+
+    def get(self, key: str, size: int, mtime: float) -> Optional[dict]:
+        """Return the entry for a file, unless the file changed since it was recorded."""
         with self.lock:
-            self.files_failed += 1
-            self.failed_files.append({'file_name': file_name, 'error': error})
-    
-    def get_folder_id(self, key: str) -> Optional[str]:
+            entry = self.entries.get(key)
+        if entry and entry['size'] == size and entry['mtime'] == mtime:
+            return entry
+        return None
+
+    def _append(self, record: dict):
         with self.lock:
-            return self.folder_cache.get(key)
-    
-    def set_folder_id(self, key: str, folder_id: str):
+            if record.get('discard'):
+                self.entries.pop(record['key'], None)
+            else:
+                self.entries[record['key']] = record
+            self.log.write(json.dumps(record) + '\n')
+            self.log.flush()
+
+    def record_session(self, key: str, size: int, mtime: float, uri: str, offset: int, started: float,
+                       credential: Optional[str] = None):
+        self._append({'key': key, 'size': size, 'mtime': mtime, 'uri': uri,
+                      'offset': offset, 'started': started, 'credential': credential})
+
+    def record_complete(self, key: str, size: int, mtime: float, file_info: dict):
+        self._append({'key': key, 'size': size, 'mtime': mtime, 'file': file_info})
+
+    def discard(self, key: str):
+        self._append({'key': key, 'discard': True})
+
+    def close(self):
         with self.lock:
-            self.folder_cache[key] = folder_id
+            self.log.close()
 
 
 def authenticate(credentials_file: Path, token_file: Path):
@@ -97,143 +158,165 @@ def authenticate(credentials_file: Path, token_file: Path):
     return creds
 
 
-def create_folder(service, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
-    """Create a folder in Google Drive."""
-    try:
-        file_metadata = {
-            'name': folder_name,
-            'mimeType': 'application/vnd.google-apps.folder'
-        }
-        
-        if parent_id:
-            file_metadata['parents'] = [parent_id]
-        
-        folder = service.files().create(
-            body=file_metadata,
-            fields='id'
-        ).execute()
-        
-        return folder.get('id')
-    
-    except Exception as e:
-        console.print(f"[red]Error creating folder {folder_name}: {e}[/red]")
-        return None
+def query_upload_session(http, uri: str, size: int) -> tuple:
+    """Ask Drive how far a resumable session got.
 
+    Sends the documented status query (an empty PUT with ``Content-Range: bytes */size``)
+    and returns (acknowledged bytes, file info if the upload had already finished).
+    Raises HttpError for any other answer, e.g. 404/410 for an expired session.
+    """
+    resp, content = http.request(uri, method='PUT', body=b'',
+                                 headers={'Content-Length': '0', 'Content-Range': f'bytes */{size}'})
+    if resp.status in (200, 201):
+        return size, json.loads(content)
+    if resp.status == 308:
+        # Range is 'bytes=0-<last byte>'; no Range header means nothing was stored yet
+        received = resp.get('range')
+        return (int(received.rsplit('-', 1)[1]) + 1 if received else 0), None
+    raise HttpError(resp, content, uri=uri)
 
-def get_or_create_folder(service, folder_path: Path, parent_id: Optional[str], stats: UploadStats) -> Optional[str]:
-    """Get or create folder structure in Google Drive."""
-    if not folder_path or folder_path == Path("."):
-        return parent_id
-    
-    # Create cache key
-    cache_key = f"{parent_id}:{folder_path}"
-    
-    # Check cache first
-    cached_id = stats.get_folder_id(cache_key)
-    if cached_id:
-        return cached_id
-    
-    # Process parent folders first
-    if folder_path.parent != Path("."):
-        parent_id = get_or_create_folder(service, folder_path.parent, parent_id, stats)
+
+def upload_file(service, file_path: Path, parent_id: Optional[str], retry_policy: Optional[RetryPolicy] = None,
+                file_size: Optional[int] = None, file_mtime: Optional[float] = None,
+                journal: Optional[UploadJournal] = None, journal_key: Optional[str] = None,
+                reporter: Optional[ProgressReporter] = None) -> tuple:
+    """Upload a single file to Google Drive with retry logic.
+
+    ``service`` may be a CredentialPool, in which case every attempt picks a
+    credential afresh. When a journal is given, the resumable session URI and acknowledged offset are
+    recorded after every chunk, and an existing session is continued instead of
+    starting the upload from byte zero, on the credential that opened it.
+    """
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    
+    # Get file size (already known when the file came from discovery)
+    if file_size is None or file_mtime is None:
+        st = file_path.stat()
+        file_size, file_mtime = st.st_size, st.st_mtime
+    
+    # Determine MIME type
+    mime_type, _ = mimetypes.guess_type(str(file_path))
+    if not mime_type:
+        mime_type = 'application/octet-stream'
+    
+    # Prepare file metadata
+    file_metadata = {'name': file_path.name}
+    if parent_id:
+        file_metadata['parents'] = [parent_id]
+    
+    def create_request(drive):
+        media = MediaFileUpload(
+            str(file_path),
+            mimetype=mime_type,
+            resumable=True,
+            chunksize=1024*1024  # 1MB chunks
+        )
+        return drive.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields=FILE_FIELDS
+        )
     
-    # Check if folder already exists
-    try:
-        query = f"name='{folder_path.name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-        if parent_id:
-            query += f" and '{parent_id}' in parents"
+    def attempt():
+        if journal is None:
+            return create_request(pick_service(service)).execute()
         
-        results = service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name)'
-        ).execute()
-        
-        items = results.get('files', [])
-        
-        if items:
-            folder_id = items[0]['id']
-        else:
-            # Create the folder
-            folder_id = create_folder(service, folder_path.name, parent_id)
+        started = time.time()
+        file = None
+        session = journal.get(journal_key, file_size, file_mtime)
+        # A recorded session is queried and continued on the credential that opened it
+        drive, credential = pinned_service(service, session.get('credential') if session else None)
+        request = create_request(drive)
+        if session and session.get('uri'):
+            # Continue from the last byte Drive acknowledged (or take the file
+            # if the upload had finished before the journal caught up)
+            try:
+                offset, file = query_upload_session(request.http, session['uri'], file_size)
+                request.resumable_uri = session['uri']
+                request.resumable_progress = offset
+                started = session['started']
+            except HttpError as e:
+                if e.resp.status not in (404, 410):
+                    raise
+                # Session expired or unknown to Drive; start a fresh one
+                journal.discard(journal_key)
         
-        # Cache the folder ID
-        if folder_id:
-            stats.set_folder_id(cache_key, folder_id)
+        while file is None:
+            _, file = request.next_chunk()
+            if file is None and request.resumable_uri:
+                journal.record_session(journal_key, file_size, file_mtime, request.resumable_uri,
+                                       request.resumable_progress, started, credential)
         
-        return folder_id
+        journal.record_complete(journal_key, file_size, file_mtime, file)
+        return file
     
+    def on_retry(attempt_number, delay, error):
+        print_message(reporter, f"[yellow]Retry {attempt_number}/{retry_policy.max_attempts - 1} for "
+                                f"{escape(file_path.name)} in {delay:.1f}s: {escape(str(error))}[/yellow]")
+    
+    try:
+        # A retry first checks whether the failed attempt created the file after all
+        file = create_once(retry_policy, attempt, service, file_path.name, parent_id, FILE_FIELDS,
+                           on_retry=on_retry)
+        return True, file_size, file, None
+    except HttpError as e:
+        return False, 0, None, f"HTTP Error {e.resp.status}: {str(e)}"
     except Exception as e:
-        console.print(f"[red]Error getting/creating folder {folder_path}: {e}[/red]")
-        return None
+        return False, 0, None, str(e)
 
 
-def upload_file(service, file_path: Path, parent_id: Optional[str], max_retries: int = 3) -> tuple:
-    """Upload a single file to Google Drive with retry logic."""
+def copy_file(service, source_file_id: str, name: str, parent_id: Optional[str],
+              retry_policy: Optional[RetryPolicy] = None) -> tuple:
+    """Create a file in Google Drive as a server-side copy of an already uploaded one."""
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
     
-    for attempt in range(max_retries):
-        try:
-            # Get file size
-            file_size = file_path.stat().st_size
-            
-            # Determine MIME type
-            mime_type, _ = mimetypes.guess_type(str(file_path))
-            if not mime_type:
-                mime_type = 'application/octet-stream'
-            
-            # Prepare file metadata
-            file_metadata = {'name': file_path.name}
-            if parent_id:
-                file_metadata['parents'] = [parent_id]
-            
-            # Create media upload
-            media = MediaFileUpload(
-                str(file_path),
-                mimetype=mime_type,
-                resumable=True,
-                chunksize=1024*1024  # 1MB chunks
-            )
-            
-            # Upload file
-            file = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id, name, mimeType, size, createdTime, webViewLink'
-            ).execute()
-            
-            return True, file_size, file, None
-        
-        except HttpError as e:
-            error_msg = f"HTTP Error {e.resp.status}: {str(e)}"
-            if attempt < max_retries - 1:
-                console.print(f"[yellow]Retry {attempt + 1}/{max_retries} for {file_path.name}[/yellow]")
-                continue
-            return False, 0, None, error_msg
-        
-        except Exception as e:
-            error_msg = str(e)
-            if attempt < max_retries - 1:
-                console.print(f"[yellow]Retry {attempt + 1}/{max_retries} for {file_path.name}[/yellow]")
-                continue
-            return False, 0, None, error_msg
+    body = {'name': name}
+    if parent_id:
+        body['parents'] = [parent_id]
     
-    return False, 0, None, "Max retries exceeded"
+    try:
+        file = create_once(
+            retry_policy,
+            lambda: pick_service(service).files().copy(
+                fileId=source_file_id,
+                body=body,
+                fields=FILE_FIELDS
+            ).execute(),
+            service, name, parent_id, FILE_FIELDS
+        )
+        return True, file, None
+    except HttpError as e:
+        return False, None, f"HTTP Error {e.resp.status}: {str(e)}"
+    except Exception as e:
+        return False, None, str(e)
 
 
 def upload_file_wrapper(args):
-    """Wrapper for parallel upload."""
-    creds, file_path, base_path, parent_folder_id, stats = args
-    
-    # Create a new service instance for this thread
-    service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+    """Wrapper for parallel upload.
+
+    When ``source_file_id`` is set the file's content is already in Drive, so it is
+    created with a server-side copy instead of being uploaded again.
+    """
+    pool, local_file, base_path, parent_folder_id, stats, journal, retry_policy, source_file_id, reporter = args
+    file_path = local_file.path
     
     # Calculate relative path
     relative_path = file_path.relative_to(base_path)
     folder_path = relative_path.parent
     
-    # Get or create folder structure
+    # Skip files a previous run already finished
+    journal_key = None
+    if journal:
+        journal_key = journal.make_key(file_path, parent_folder_id)
+        entry = journal.get(journal_key, local_file.size, local_file.mtime)
+        if entry and entry.get('file'):
+            stats.add_file(local_file.size, build_upload_metadata(entry['file'], local_file.size, relative_path))
+            return ('skipped', str(relative_path), entry['file']['id'])
+    
+    # Get or create folder structure; each request, and each retry, is sent
+    # with the credential the pool picks for it
     if folder_path != Path("."):
-        target_folder_id = get_or_create_folder(service, folder_path, parent_folder_id, stats)
+        target_folder_id = get_or_create_folder(pool, folder_path, parent_folder_id, stats, reporter)
     else:
         target_folder_id = parent_folder_id
     
@@ -242,44 +325,287 @@ def upload_file_wrapper(args):
         stats.add_failed(str(relative_path), error_msg)
         return ('failed', str(relative_path), error_msg)
     
+    if source_file_id:
+        success, file_info, error = copy_file(pool, source_file_id, file_path.name, target_folder_id, retry_policy)
+        if success:
+            if journal:
+                journal.record_complete(journal_key, local_file.size, local_file.mtime, file_info)
+            stats.add_copied(local_file.size, build_upload_metadata(file_info, local_file.size, relative_path))
+            return ('copied', str(relative_path), file_info['id'])
+        stats.add_failed(str(relative_path), error)
+        return ('failed', str(relative_path), error)
+    
     # Upload file
-    success, size, file_info, error = upload_file(service, file_path, target_folder_id)
+    success, size, file_info, error = upload_file(
+        pool, file_path, target_folder_id, retry_policy,
+        file_size=local_file.size, file_mtime=local_file.mtime,
+        journal=journal, journal_key=journal_key, reporter=reporter
+    )
     
     if success:
-        # Prepare metadata
-        metadata = {
-            'file_id': file_info['id'],
-            'file_name': file_info['name'],
-            'mime_type': file_info['mimeType'],
-            'size_bytes': file_info.get('size', size),
-            'created_time': file_info.get('createdTime', ''),
-            'web_link': file_info.get('webViewLink', ''),
-            'local_path': str(relative_path),
-            'upload_time': datetime.now().isoformat()
-        }
-        
-        stats.add_file(size, metadata)
-        return ('success', str(relative_path))
+        stats.add_file(size, build_upload_metadata(file_info, size, relative_path))
+        return ('success', str(relative_path), file_info['id'])
     else:
         stats.add_failed(str(relative_path), error)
         return ('failed', str(relative_path), error)
 
 
-def find_all_files(root_dir: Path, exclude_patterns: List[str] = None) -> List[Path]:
-    """Find all files in directory recursively."""
+def hash_file(file_path: str) -> Optional[str]:
+    """Compute the MD5 of a file (the same digest Drive reports as md5Checksum)."""
+    digest = hashlib.md5()
+    try:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(8 * 1024 * 1024), b''):
+                digest.update(block)
+    except OSError:
+        return None  # Unreadable files are uploaded as-is and fail there
+    return digest.hexdigest()
+
+
+def find_duplicates(all_files: List[LocalFile], hash_workers: Optional[int] = None) -> tuple:
+    """Group files by content.
+
+    Only files whose size matches another file's are hashed, on a process pool.
+    Returns (files to upload, list of (duplicate, original) pairs).
+    """
+    by_size = {}
+    for local_file in all_files:
+        by_size.setdefault(local_file.size, []).append(local_file)
+    
+    candidates = [f for group in by_size.values() if len(group) > 1 for f in group]
+    if not candidates:
+        return all_files, []
+    
+    with concurrent.futures.ProcessPoolExecutor(max_workers=hash_workers) as executor:
+        digests = executor.map(hash_file, [str(f.path) for f in candidates], chunksize=32)
+        originals = {}
+        duplicates = []
+        for local_file, digest in zip(candidates, digests):
+            if digest is None:
+                continue
+            key = (local_file.size, digest)
+            if key in originals:
+                duplicates.append((local_file, originals[key]))
+            else:
+                originals[key] = local_file
+    
+    duplicate_paths = {dup.path for dup, _ in duplicates}
+    unique_files = [f for f in all_files if f.path not in duplicate_paths]
+    return unique_files, duplicates
+
+
+def run_upload_batch(upload_args: list, workers: int, reporter: ProgressReporter) -> Dict[str, str]:
+    """Run upload_file_wrapper over a batch, returning relative path -> Drive file ID."""
+    file_ids = {}
+    
+    # Use ThreadPoolExecutor for parallel uploads
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for args, result in zip(upload_args, executor.map(upload_file_wrapper, upload_args)):
+            local_file = args[1]
+            if result[0] == 'success':
+                reporter.file_done(local_file.size)
+            elif result[0] == 'copied':
+                # Server-side copies move no data
+                reporter.file_done()
+            elif result[0] == 'skipped':
+                reporter.file_skipped()
+            else:
+                reporter.file_failed(result[1], result[2])
+            if result[0] != 'failed':
+                file_ids[result[1]] = result[2]
+    
+    return file_ids
+
+
+DEFAULT_EXCLUDES = ['.git', '__pycache__', '.DS_Store', 'node_modules']
+
+
+def is_excluded(name: str, relative_path: str, exclude_patterns: List[str]) -> bool:
+    """Check a directory entry against glob exclude patterns.
+
+    Patterns without a slash match the entry name (``.git``, ``*.tmp``);
+    patterns with a slash match the path relative to the scan root (``build/*``).
+    """
+    for pattern in exclude_patterns:
+        target = relative_path if '/' in pattern else name
+        if fnmatch.fnmatchcase(target, pattern.rstrip('/')):
+            return True
+    return False
+
+
+def scan_directory(dir_path: str, relative_dir: str, exclude_patterns: List[str]) -> tuple:
+    """Scan a single directory level, returning (files, subdirectories to descend)."""
+    files = []
+    subdirs = []
+
+    try:
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if is_excluded(entry.name, relative_path, exclude_patterns):
+                    continue
+
+                try:
+                    # d_type from readdir answers this without a stat call
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append((entry.path, relative_path))
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files.append(LocalFile(Path(entry.path), st.st_size, st.st_mtime))
+                except OSError as e:
+                    console.print(f"[yellow]Warning: Cannot read {entry.path}: {e}[/yellow]")
+    except OSError as e:
+        console.print(f"[yellow]Warning: Cannot scan {dir_path}: {e}[/yellow]")
+
+    return files, subdirs
+
+
+def find_all_files(root_dir: Path, exclude_patterns: List[str] = None, scan_workers: int = 1) -> List[LocalFile]:
+    """Find all files in directory recursively.
+
+    Excluded directories are pruned before descending. With ``scan_workers`` > 1
+    subdirectories are scanned concurrently, which helps on network filesystems
+    and cold caches where each readdir waits on I/O.
+    """
     if exclude_patterns is None:
-        exclude_patterns = ['.git', '__pycache__', '.DS_Store', 'node_modules']
-    
+        exclude_patterns = DEFAULT_EXCLUDES
+
     all_files = []
+
+    if scan_workers <= 1:
+        pending = [(str(root_dir), '')]
+        while pending:
+            dir_path, relative_dir = pending.pop()
+            files, subdirs = scan_directory(dir_path, relative_dir, exclude_patterns)
+            all_files.extend(files)
+            pending.extend(subdirs)
+        return all_files
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=scan_workers) as executor:
+        pending = {executor.submit(scan_directory, str(root_dir), '', exclude_patterns)}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                all_files.extend(files)
+                for dir_path, relative_dir in subdirs:
+                    pending.add(executor.submit(scan_directory, dir_path, relative_dir, exclude_patterns))
+
+    return all_files
+
+
+ARCHIVE_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz', '.zip')
+
+# Members up to this size are read into memory and uploaded by the worker pool;
+# larger ones are streamed straight from the archive by the reader thread
+ARCHIVE_BUFFER_LIMIT = 32 * 1024 * 1024
+
+
+def is_archive(path: Path) -> bool:
+    """Check whether a path is an archive gup can upload from."""
+    return path.is_file() and path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def clean_member_name(name: str) -> Optional[str]:
+    """Normalize an archive member name into a safe relative path."""
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or '..' in parts:
+        return None
+    return '/'.join(parts)
+
+
+def iter_archive_members(archive_path: Path):
+    """Yield (member path, size, file object) for each regular file, in archive order.
+
+    Tar archives are read as a single forward stream, so each file object is only
+    valid until the next member is requested.
+    """
+    if archive_path.name.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                name = clean_member_name(info.filename)
+                if info.is_dir() or not name:
+                    continue
+                with archive.open(info) as member_file:
+                    yield name, info.file_size, member_file
+    else:
+        with tarfile.open(archive_path, 'r|*') as archive:
+            for member in archive:
+                name = clean_member_name(member.name)
+                if not member.isfile() or not name:
+                    continue
+                yield name, member.size, archive.extractfile(member)
+
+
+def upload_archive_member(pool: CredentialPool, member_name: str, size: int, stream, parent_folder_id: Optional[str],
+                          stats: UploadStats, retry_policy: RetryPolicy,
+                          reporter: Optional[ProgressReporter] = None) -> tuple:
+    """Upload one archive member, recreating its directory as Drive folders."""
+    relative_path = Path(member_name)
+    folder_path = relative_path.parent
     
-    for item in root_dir.rglob('*'):
-        if item.is_file():
-            # Check if any exclude pattern matches
-            if any(pattern in str(item) for pattern in exclude_patterns):
-                continue
-            all_files.append(item)
+    if folder_path != Path("."):
+        target_folder_id = get_or_create_folder(pool, folder_path, parent_folder_id, stats, reporter)
+        if target_folder_id is None:
+            error_msg = f"Failed to create folder structure for {relative_path}"
+            stats.add_failed(member_name, error_msg)
+            return ('failed', member_name, error_msg)
+    else:
+        target_folder_id = parent_folder_id
     
-    return all_files
+    success, size, file_info, error = upload_stream(pool, stream, relative_path.name, size,
+                                                    target_folder_id, retry_policy)
+    if success:
+        stats.add_file(size, build_upload_metadata(file_info, size, relative_path))
+        return ('success', member_name, file_info['id'])
+    stats.add_failed(member_name, error)
+    return ('failed', member_name, error)
+
+
+def upload_archive(pool: CredentialPool, archive_path: Path, parent_folder_id: Optional[str], stats: UploadStats,
+                   workers: int, retry_policy: RetryPolicy, reporter: ProgressReporter):
+    """Upload every file in an archive without extracting it to disk.
+
+    Members are read in archive order. Small ones are buffered and handed to the
+    worker pool (bounded, so memory stays at roughly workers x buffer limit);
+    large ones are streamed chunk by chunk from the archive on this thread.
+    """
+    slots = BoundedSemaphore(workers * 2)
+    
+    def report(result, size):
+        if result[0] == 'success':
+            reporter.file_done(size)
+        else:
+            reporter.file_failed(result[1], result[2])
+    
+    def buffered_upload(member_name, size, data):
+        try:
+            return upload_archive_member(pool, member_name, size, io.BytesIO(data), parent_folder_id,
+                                         stats, retry_policy, reporter)
+        finally:
+            slots.release()
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for member_name, size, member_file in iter_archive_members(archive_path):
+            if size <= ARCHIVE_BUFFER_LIMIT:
+                slots.acquire()
+                futures.append((executor.submit(buffered_upload, member_name, size, member_file.read()), size))
+            else:
+                report(upload_archive_member(pool, member_name, size, MemberStream(member_file, size),
+                                             parent_folder_id, stats, retry_policy, reporter), size)
+            
+            # Report finished background uploads as we go
+            still_running = []
+            for future, member_size in futures:
+                if future.done():
+                    report(future.result(), member_size)
+                else:
+                    still_running.append((future, member_size))
+            futures = still_running
+        
+        for future, member_size in futures:
+            report(future.result(), member_size)
 
 
 def save_metadata_csv(metadata: List[dict], output_file: Path):
@@ -298,10 +624,52 @@ def save_metadata_csv(metadata: List[dict], output_file: Path):
         writer.writerows(metadata)
 
 
+def finish_upload(stats: UploadStats, metadata_file: Path, dedupe: bool = False,
+                  pool: Optional[CredentialPool] = None):
+    """Write the metadata and failure CSVs and print the run summary."""
+    # Save metadata
+    console.print(f"\n[cyan]Saving metadata to {metadata_file}...[/cyan]")
+    save_metadata_csv(stats.metadata, metadata_file)
+    console.print("[green]✓ Metadata saved[/green]\n")
+    
+    # Save failed files log if any
+    if stats.failed_files:
+        failed_log = Path("failed_uploads.csv")
+        with open(failed_log, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=['file_name', 'error'])
+            writer.writeheader()
+            writer.writerows(stats.failed_files)
+        console.print(f"[yellow]Failed uploads logged to {failed_log}[/yellow]\n")
+    
+    # Display summary
+    table = Table(title="Upload Summary")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green")
+    
+    table.add_row("Files Uploaded", str(stats.files_uploaded))
+    table.add_row("Files Failed", str(stats.files_failed))
+    if dedupe:
+        table.add_row("Files Copied (deduplicated)", str(stats.files_copied))
+        table.add_row("Upload Saved", f"{stats.bytes_deduplicated / (1024*1024):.2f} MB")
+    table.add_row("Total Size", f"{stats.total_size / (1024*1024):.2f} MB")
+    table.add_row("Metadata File", str(metadata_file))
+    if pool is not None and len(pool) > 1:
+        for name, requests, throttled in pool.stats():
+            table.add_row(f"Requests ({name})", f"{requests} ({throttled} throttled)")
+    
+    console.print(table)
+    
+    if stats.files_failed > 0:
+        console.print(f"\n[yellow]⚠ {stats.files_failed} file(s) failed to upload. Check failed_uploads.csv for details.[/yellow]")
+    
+    console.print("\n[bold green]✓ Upload complete![/bold green]")
+
+
+
 @app.command()
 def upload(
     folder_id: Optional[str] = typer.Argument(None, help="Google Drive parent folder ID (optional, uploads to root if not provided)"),
-    local_folder: Path = typer.Argument(..., help="Local folder to upload"),
+    local_folder: Path = typer.Argument(..., help="Local folder, or .tar/.tar.gz/.zip archive, to upload"),
     credentials_file: Path = typer.Option(
         "credentials.json",
         "--credentials",
@@ -314,6 +682,21 @@ def upload(
         "-t",
         help="Path to save/load authentication token"
     ),
+    pool_tokens: Optional[List[str]] = typer.Option(
+        None,
+        "--pool-token",
+        help="Extra OAuth token pickle or service-account key (.json) to spread requests over; repeatable"
+    ),
+    credential_strategy: str = typer.Option(
+        "least-loaded",
+        "--credential-strategy",
+        help=f"How files are spread over credentials: {', '.join(POOL_STRATEGIES)}"
+    ),
+    requests_per_second: Optional[float] = typer.Option(
+        None,
+        "--requests-per-second",
+        help="Drive API request rate limit per credential (default: unlimited)"
+    ),
     metadata_file: Path = typer.Option(
         "upload_metadata.csv",
         "--metadata",
@@ -330,7 +713,65 @@ def upload(
         None,
         "--exclude",
         "-e",
-        help="Patterns to exclude (can be specified multiple times)"
+        help="Glob patterns to exclude, matched against names or relative paths (can be specified multiple times)"
+    ),
+    scan_workers: int = typer.Option(
+        1,
+        "--scan-workers",
+        help="Number of parallel directory scan workers"
+    ),
+    journal_file: Optional[Path] = typer.Option(
+        None,
+        "--journal",
+        "-j",
+        help="Resumable session journal for --resume (default: <metadata file>.sessions.jsonl)"
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume/--no-resume",
+        help="Record upload sessions in the journal: interrupted uploads continue where they stopped, "
+             "and files the journal already records as uploaded are skipped on later runs"
+    ),
+    max_retries: int = typer.Option(
+        5,
+        "--max-retries",
+        help="Maximum attempts per file for transient errors"
+    ),
+    retry_budget: int = typer.Option(
+        1000,
+        "--retry-budget",
+        help="Maximum total retries across the whole run"
+    ),
+    dedupe: bool = typer.Option(
+        False,
+        "--dedupe",
+        help="Upload identical files once and create the other copies server-side"
+    ),
+    hash_workers: Optional[int] = typer.Option(
+        None,
+        "--hash-workers",
+        help="Processes used to hash files for --dedupe (default: CPU count)"
+    ),
+    engine: str = typer.Option(
+        "thread",
+        "--engine",
+        help="Upload engine: 'thread' (one blocking worker per thread) or 'async' (asyncio, needs aiohttp)"
+    ),
+    concurrency: int = typer.Option(
+        200,
+        "--concurrency",
+        help="Maximum in-flight uploads for the async engine"
+    ),
+    progress_mode: str = typer.Option(
+        "console",
+        "--progress",
+        help="Progress output: console (4 Hz bar), json (periodic JSON lines on stderr) or quiet"
+    ),
+    quiet: bool = typer.Option(
+        False,
+        "--quiet",
+        "-q",
+        help="Shorthand for --progress quiet"
     )
 ):
     """
@@ -344,25 +785,43 @@ def upload(
         python gdrive_uploader.py ./my_folder 1abc123XYZ
         
         # With exclusions
-        python gdrive_uploader.py ./my_folder -e .git -e node_modules
+        python gdrive_uploader.py ./my_folder -e .git -e node_modules -e '*.tmp'
+        
+        # Straight from an archive, keeping its internal folder structure
+        python gdrive_uploader.py ./scans.tar.gz 1abc123XYZ
     """
     
     console.print("[bold green]Google Drive Bulk Uploader[/bold green]\n")
     
+    if engine not in ('thread', 'async'):
+        console.print(f"[red]Error: Unknown engine '{engine}', use 'thread' or 'async'[/red]")
+        raise typer.Exit(1)
+    
+    progress_mode = 'quiet' if quiet else progress_mode
+    if progress_mode not in PROGRESS_MODES:
+        console.print(f"[red]Error: Unknown progress mode '{progress_mode}', use console, json or quiet[/red]")
+        raise typer.Exit(1)
+    
     # Validate local folder
     if not local_folder.exists():
         console.print(f"[red]Error: Local folder '{local_folder}' does not exist![/red]")
         raise typer.Exit(1)
     
-    if not local_folder.is_dir():
-        console.print(f"[red]Error: '{local_folder}' is not a directory![/red]")
+    archive_mode = is_archive(local_folder)
+    if not local_folder.is_dir() and not archive_mode:
+        console.print(f"[red]Error: '{local_folder}' is not a directory or supported archive![/red]")
         raise typer.Exit(1)
     
     # Authenticate
     console.print("[cyan]Authenticating with Google Drive...[/cyan]")
     creds = authenticate(credentials_file, token_file)
+    try:
+        pool = CredentialPool.with_extra(creds, pool_tokens, SCOPES, requests_per_second, credential_strategy)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Error: {e}[/red]")
+        raise typer.Exit(1)
     service = build('drive', 'v3', credentials=creds)
-    console.print("[green]✓ Authentication successful[/green]\n")
+    console.print(f"[green]✓ Authentication successful ({pool.describe()})[/green]\n")
     
     # Verify parent folder if provided
     if folder_id:
@@ -375,10 +834,23 @@ def upload(
     else:
         console.print("[yellow]No parent folder specified, uploading to Drive root[/yellow]\n")
     
+    if archive_mode:
+        # Archive members are streamed from the archive; the journal and
+        # dedupe work on local files only
+        console.print(f"[cyan]Streaming files from archive {local_folder.name}...[/cyan]\n")
+        stats = UploadStats()
+        retry_policy = RetryPolicy(max_attempts=max_retries, max_total_retries=retry_budget)
+        
+        with ProgressReporter("Uploading archive members", mode=progress_mode, console=console) as reporter:
+            upload_archive(pool, local_folder, folder_id, stats, workers, retry_policy, reporter)
+        
+        finish_upload(stats, metadata_file, pool=pool)
+        return
+    
     # Find all files
     console.print("[cyan]Scanning for files...[/cyan]")
-    exclude_patterns = list(exclude) if exclude else ['.git', '__pycache__', '.DS_Store', 'node_modules']
-    all_files = find_all_files(local_folder, exclude_patterns)
+    exclude_patterns = list(exclude) if exclude else DEFAULT_EXCLUDES
+    all_files = find_all_files(local_folder, exclude_patterns, scan_workers)
     console.print(f"[green]✓ Found {len(all_files)} file(s) to upload[/green]\n")
     
     if not all_files:
@@ -386,77 +858,63 @@ def upload(
         return
     
     # Calculate total size
-    total_size = sum(f.stat().st_size for f in all_files)
+    total_size = sum(f.size for f in all_files)
     console.print(f"[cyan]Total size: {total_size / (1024*1024):.2f} MB[/cyan]\n")
     
+    if engine == 'async' and (dedupe or resume):
+        # The async engine uploads straight from the scan; session journaling
+        # and dedupe are only wired into the thread engine
+        console.print("[yellow]Note: --dedupe and the resume journal apply to the thread engine only[/yellow]\n")
+        dedupe = resume = False
+    
+    # Find duplicate content
+    upload_files, duplicates = all_files, []
+    if dedupe:
+        console.print("[cyan]Hashing files for deduplication...[/cyan]")
+        upload_files, duplicates = find_duplicates(all_files, hash_workers)
+        duplicate_size = sum(dup.size for dup, _ in duplicates)
+        console.print(f"[green]✓ {len(duplicates)} duplicate(s), {duplicate_size / (1024*1024):.2f} MB "
+                      f"will be copied server-side[/green]\n")
+    
     # Initialize stats
     stats = UploadStats()
+    journal_file = journal_file or metadata_file.with_name(metadata_file.stem + '.sessions.jsonl')
+    journal = UploadJournal(journal_file) if resume else None
+    retry_policy = RetryPolicy(max_attempts=max_retries, max_total_retries=retry_budget)
+    if journal and journal.entries:
+        console.print(f"[cyan]Loaded {len(journal.entries)} journal entries from {journal_file}[/cyan]\n")
     
-    # Upload files with progress bar
+    # Upload files; progress is aggregated and redrawn at a fixed rate
     console.print("[bold]Starting uploads...[/bold]\n")
     
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        # UploadColumn(),
-        TransferSpeedColumn(),
-        console=console
-    ) as progress:
-        
-        task = progress.add_task(
-            "[cyan]Uploading files...",
-            total=len(all_files)
-        )
-        
-        # Prepare arguments for parallel upload
-        upload_args = [
-            (creds, file_path, local_folder, folder_id, stats)
-            for file_path in all_files
-        ]
+    with ProgressReporter("Uploading files", total=len(all_files), mode=progress_mode, console=console) as reporter:
         
-        # Use ThreadPoolExecutor for parallel uploads
-        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-            for result in executor.map(upload_file_wrapper, upload_args):
-                if result:
-                    if result[0] == 'success':
-                        progress.console.print(f"  [green]✓ {result[1]}[/green]")
-                    elif result[0] == 'failed':
-                        progress.console.print(f"  [red]✗ {result[1]}: {result[2]}[/red]")
-                progress.advance(task)
-    
-    # Save metadata
-    console.print(f"\n[cyan]Saving metadata to {metadata_file}...[/cyan]")
-    save_metadata_csv(stats.metadata, metadata_file)
-    console.print("[green]✓ Metadata saved[/green]\n")
-    
-    # Save failed files log if any
-    if stats.failed_files:
-        failed_log = Path("failed_uploads.csv")
-        with open(failed_log, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=['file_name', 'error'])
-            writer.writeheader()
-            writer.writerows(stats.failed_files)
-        console.print(f"[yellow]Failed uploads logged to {failed_log}[/yellow]\n")
-    
-    # Display summary
-    table = Table(title="Upload Summary")
-    table.add_column("Metric", style="cyan")
-    table.add_column("Value", style="green")
-    
-    table.add_row("Files Uploaded", str(stats.files_uploaded))
-    table.add_row("Files Failed", str(stats.files_failed))
-    table.add_row("Total Size", f"{stats.total_size / (1024*1024):.2f} MB")
-    table.add_row("Metadata File", str(metadata_file))
-    
-    console.print(table)
-    
-    if stats.files_failed > 0:
-        console.print(f"\n[yellow]⚠ {stats.files_failed} file(s) failed to upload. Check failed_uploads.csv for details.[/yellow]")
-    
-    console.print("\n[bold green]✓ Upload complete![/bold green]")
-
+        if engine == 'async':
+            from gup_async import run_async_upload
+            run_async_upload(pool, all_files, local_folder, folder_id, stats, concurrency,
+                             workers, retry_policy, reporter)
+        else:
+            # Prepare arguments for parallel upload
+            upload_args = [
+                (pool, local_file, local_folder, folder_id, stats, journal, retry_policy, None, reporter)
+                for local_file in upload_files
+            ]
+            file_ids = run_upload_batch(upload_args, workers, reporter)
+            
+            # Create duplicates from their uploaded originals; if an original
+            # failed, fall back to uploading the duplicate itself
+            if duplicates:
+                copy_args = [
+                    (pool, dup, local_folder, folder_id, stats, journal, retry_policy,
+                     file_ids.get(str(original.path.relative_to(local_folder))), reporter)
+                    for dup, original in duplicates
+                ]
+                run_upload_batch(copy_args, workers, reporter)
+    
+    if journal:
+        journal.close()
+    
+    finish_upload(stats, metadata_file, dedupe, pool)
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Asyncio upload engine for gup.
+
+Runs hundreds of Drive uploads concurrently on one event loop instead of one
+blocking OS thread per worker, so small-file throughput scales with the number
+of in-flight requests. Used by `gup.py upload --engine async`.
+
+Requirements:
+    pip install aiohttp
+"""
+
+import asyncio
+import json
+import mimetypes
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from google.auth.transport.requests import Request
+
+from credential_pool import CredentialPool, PooledCredential
+from drive_upload import (CREATE_LOOKBACK, LocalFile, UploadStats, build_upload_metadata, created_file_query,
+                          get_or_create_folder)
+from progress_reporter import ProgressReporter
+from retry_policy import RetryPolicy
+
+UPLOAD_URL = 'https://www.googleapis.com/upload/drive/v3/files'
+FILES_URL = 'https://www.googleapis.com/drive/v3/files'
+FILE_FIELDS = 'id,name,mimeType,size,createdTime,webViewLink'
+
+# Files up to this size go up in one multipart request, larger ones resumable
+MULTIPART_LIMIT = 5 * 1024 * 1024
+# Resumable chunks must be a multiple of 256 KB
+CHUNK_SIZE = 32 * 256 * 1024
+
+
+class DriveResponseError(Exception):
+    """Non-success response from the Drive upload endpoint.
+
+    Exposes ``resp`` (status plus lower-cased headers) and ``content`` like
+    googleapiclient's HttpError, so the shared retry policy can classify it.
+    """
+
+    def __init__(self, status: int, headers: dict, content: bytes):
+        self.resp = ResponseInfo(status, headers)
+        self.content = content
+        super().__init__(f"HTTP Error {status}: {content[:300].decode('utf-8', errors='replace')}")
+
+
+class ResponseInfo(dict):
+    def __init__(self, status: int, headers: dict):
+        super().__init__({key.lower(): value for key, value in headers.items()})
+        self.status = status
+
+
+class TokenProvider:
+    """Hands out bearer tokens from a CredentialPool, one credential per request.
+
+    headers() picks a credential the way the pool does for the thread engines,
+    waits out its backoff and rate limit without blocking the event loop, and
+    refreshes it if it expired or was rejected with a 401. Every headers() call
+    must be matched by a release() with the response, which keeps the pool's
+    load and throttling state current. pin() returns a provider that always
+    uses one credential, for requests that belong together.
+    """
+
+    def __init__(self, pool: CredentialPool, member: Optional[PooledCredential] = None):
+        self.pool = pool
+        self.member = member
+        self.lock = asyncio.Lock()
+        self.issued = {}
+        self.rejected = set()
+
+    def pin(self) -> 'TokenProvider':
+        return TokenProvider(self.pool, self.member or self.pool.choose())
+
+    async def headers(self) -> dict:
+        member = self.member or self.pool.choose()
+        delay = member.turn_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if id(member) in self.rejected or not member.creds.valid:
+            async with self.lock:
+                if id(member) in self.rejected or not member.creds.valid:
+                    await asyncio.to_thread(member.creds.refresh, Request())
+                    self.rejected.discard(id(member))
+        headers = {'Authorization': f'Bearer {member.creds.token}'}
+        self.issued[headers['Authorization']] = member
+        member.started()
+        return headers
+
+    def release(self, headers: dict, status: Optional[int] = None, content: bytes = b'',
+                retry_after: Optional[str] = None):
+        """Report the response to a request sent with ``headers``; no status if none came back."""
+        member = self.issued[headers['Authorization']]
+        if status == 401:
+            self.rejected.add(id(member))
+        member.finished(status, content, retry_after)
+
+
+def read_range(file_path: Path, offset: int, length: int) -> bytes:
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+async def request(session, tokens: TokenProvider, method: str, url: str, ok_statuses=(200, 201), **kwargs):
+    """Send one request, refreshing the token once on 401. Returns (status, headers, body)."""
+    import aiohttp
+
+    extra_headers = kwargs.pop('headers', {})
+    for refreshed in (False, True):
+        auth = await tokens.headers()
+        status, retry_after, body = None, None, b''
+        try:
+            async with session.request(method, url, headers={**extra_headers, **auth}, **kwargs) as resp:
+                body = await resp.read()
+                status, retry_after = resp.status, resp.headers.get('Retry-After')
+                if resp.status == 401 and not refreshed:
+                    continue
+                if resp.status not in ok_statuses:
+                    raise DriveResponseError(resp.status, dict(resp.headers), body)
+                return resp.status, resp.headers, body
+        except aiohttp.ClientError as e:
+            # Let the retry policy see dropped connections as ConnectionError
+            raise ConnectionError(str(e)) from e
+        finally:
+            tokens.release(auth, status, body, retry_after)
+
+
+async def upload_multipart(session, tokens: TokenProvider, local_file: LocalFile, metadata: dict,
+                           mime_type: str) -> dict:
+    """Upload a small file and its metadata in a single request."""
+    data = await asyncio.to_thread(local_file.path.read_bytes)
+    boundary = uuid.uuid4().hex
+    body = b''.join([
+        f'--{boundary}\r\nContent-Type: application/json; charset=UTF-8\r\n\r\n'.encode(),
+        json.dumps(metadata).encode(),
+        f'\r\n--{boundary}\r\nContent-Type: {mime_type}\r\n\r\n'.encode(),
+        data,
+        f'\r\n--{boundary}--'.encode(),
+    ])
+    _, _, content = await request(
+        session, tokens, 'POST', UPLOAD_URL,
+        params={'uploadType': 'multipart', 'fields': FILE_FIELDS},
+        headers={'Content-Type': f'multipart/related; boundary={boundary}'},
+        data=body
+    )
+    return json.loads(content)
+
+
+async def find_created_file(session, tokens: TokenProvider, name: str, parent_id: Optional[str],
+                            since: datetime) -> Optional[dict]:
+    """Return a file an earlier upload attempt created after all, or None."""
+    _, _, content = await request(
+        session, tokens, 'GET', FILES_URL,
+        params={'q': created_file_query(name, parent_id, since), 'fields': f'files({FILE_FIELDS})',
+                'orderBy': 'createdTime', 'pageSize': '1'}
+    )
+    files = json.loads(content).get('files', [])
+    return files[0] if files else None
+
+
+async def upload_resumable(session, tokens: TokenProvider, local_file: LocalFile, metadata: dict,
+                           mime_type: str, retry_policy: RetryPolicy) -> dict:
+    """Upload a large file in chunks through a resumable session.
+
+    A failed chunk is retried after asking Drive how many bytes it already has,
+    so only the unacknowledged tail is re-sent.
+    """
+    async def start_session():
+        # Every chunk of a session goes with the credential that started it;
+        # a retried start may pick another one
+        session_tokens = tokens.pin()
+        _, headers, _ = await request(
+            session, session_tokens, 'POST', UPLOAD_URL,
+            params={'uploadType': 'resumable', 'fields': FILE_FIELDS},
+            headers={'X-Upload-Content-Type': mime_type,
+                     'X-Upload-Content-Length': str(local_file.size)},
+            json=metadata
+        )
+        return session_tokens, headers['Location']
+
+    session_tokens, session_uri = await retry_policy.run_async(start_session)
+    state = {'offset': 0, 'in_error': False}
+
+    async def send_next_chunk():
+        if state['in_error']:
+            # Find out where Drive got to before re-sending anything
+            status, resp_headers, content = await request(
+                session, session_tokens, 'PUT', session_uri, ok_statuses=(200, 201, 308),
+                headers={'Content-Range': f'bytes */{local_file.size}'}
+            )
+            state['in_error'] = False
+            if status in (200, 201):
+                return json.loads(content)
+            received = resp_headers.get('Range')
+            state['offset'] = int(received.rsplit('-', 1)[1]) + 1 if received else 0
+
+        offset = state['offset']
+        chunk = await asyncio.to_thread(read_range, local_file.path, offset, CHUNK_SIZE)
+        end = offset + len(chunk) - 1
+        try:
+            status, resp_headers, content = await request(
+                session, session_tokens, 'PUT', session_uri, ok_statuses=(200, 201, 308),
+                headers={'Content-Range': f'bytes {offset}-{end}/{local_file.size}'},
+                data=chunk
+            )
+        except Exception:
+            state['in_error'] = True
+            raise
+
+        if status in (200, 201):
+            return json.loads(content)
+        received = resp_headers.get('Range')
+        state['offset'] = int(received.rsplit('-', 1)[1]) + 1 if received else 0
+        return None
+
+    file = None
+    while file is None:
+        file = await retry_policy.run_async(send_next_chunk)
+    return file
+
+
+async def upload_one(session, tokens: TokenProvider, local_file: LocalFile, parent_id: Optional[str],
+                     retry_policy: RetryPolicy) -> dict:
+    mime_type, _ = mimetypes.guess_type(str(local_file.path))
+    if not mime_type:
+        mime_type = 'application/octet-stream'
+
+    metadata = {'name': local_file.path.name}
+    if parent_id:
+        metadata['parents'] = [parent_id]
+
+    if local_file.size <= MULTIPART_LIMIT:
+        # A multipart upload is a plain create: before sending it again, check
+        # whether the failed attempt created the file after all
+        since = datetime.now(timezone.utc) - CREATE_LOOKBACK
+        attempts = [0]
+
+        async def attempt():
+            if attempts[0]:
+                existing = await find_created_file(session, tokens, metadata['name'], parent_id, since)
+                if existing:
+                    return existing
+            attempts[0] += 1
+            return await upload_multipart(session, tokens, local_file, metadata, mime_type)
+
+        return await retry_policy.run_async(attempt)
+    return await upload_resumable(session, tokens, local_file, metadata, mime_type, retry_policy)
+
+
+def plan_folders(pool: CredentialPool, all_files: List[LocalFile], base_path: Path, parent_folder_id: Optional[str],
+                 stats: UploadStats, workers: int,
+                 reporter: Optional[ProgressReporter] = None) -> Dict[Path, Optional[str]]:
+    """Resolve every target Drive folder up front with the regular folder mapping.
+
+    Folders are created level by level so siblings never race to create their
+    shared parent.
+    """
+    folders = {f.path.relative_to(base_path).parent for f in all_files}
+    folders = {ancestor for folder in folders for ancestor in [folder, *folder.parents]}
+    folders.discard(Path("."))
+
+    folder_ids = {Path("."): parent_folder_id}
+    by_depth = {}
+    for folder in folders:
+        by_depth.setdefault(len(folder.parts), []).append(folder)
+
+    def resolve(folder):
+        return folder, get_or_create_folder(pool, folder, parent_folder_id, stats, reporter)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for depth in sorted(by_depth):
+            for folder, folder_id in executor.map(resolve, by_depth[depth]):
+                folder_ids[folder] = folder_id
+
+    return folder_ids
+
+
+async def upload_all(pool: CredentialPool, all_files: List[LocalFile], base_path: Path,
+                     folder_ids: Dict[Path, Optional[str]], stats: UploadStats, concurrency: int,
+                     retry_policy: RetryPolicy, reporter: ProgressReporter):
+    import aiohttp
+
+    tokens = TokenProvider(pool)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+        async def worker(local_file: LocalFile):
+            relative_path = local_file.path.relative_to(base_path)
+            async with semaphore:
+                parent_id = folder_ids.get(relative_path.parent)
+                if parent_id is None and relative_path.parent != Path("."):
+                    stats.add_failed(str(relative_path), f"Failed to create folder structure for {relative_path}")
+                    reporter.file_failed(str(relative_path), "folder creation failed")
+                else:
+                    try:
+                        file_info = await upload_one(session, tokens, local_file, parent_id, retry_policy)
+                        stats.add_file(local_file.size, build_upload_metadata(file_info, local_file.size, relative_path))
+                        reporter.file_done(local_file.size)
+                    except Exception as e:
+                        stats.add_failed(str(relative_path), str(e))
+                        reporter.file_failed(str(relative_path), str(e))
+
+        # Bound the number of pending tasks as well, so a million-file tree does
+        # not create a million coroutines up front
+        pending = set()
+        for local_file in all_files:
+            if len(pending) >= concurrency * 4:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            pending.add(asyncio.create_task(worker(local_file)))
+        if pending:
+            await asyncio.wait(pending)
+
+
+def run_async_upload(pool: CredentialPool, all_files: List[LocalFile], base_path: Path, parent_folder_id: Optional[str],
+                     stats: UploadStats, concurrency: int, folder_workers: int, retry_policy: RetryPolicy,
+                     reporter: ProgressReporter):
+    """Entry point used by gup: map folders, then upload everything on an event loop."""
+    folder_ids = plan_folders(pool, all_files, base_path, parent_folder_id, stats, folder_workers, reporter)
+    asyncio.run(upload_all(pool, all_files, base_path, folder_ids, stats, concurrency,
+                           retry_policy, reporter))
@@ -0,0 +1,202 @@
+"""
+Throttled aggregate progress reporting for the Drive and S3 transfer scripts.
+
+Workers only bump counters; a single background thread renders them at a fixed
+rate, so console I/O stays constant no matter how many files or chunks per
+second go through. Three modes:
+
+    console  rich progress bar refreshed at 4 Hz, failures printed as they happen
+    json     one JSON object per line every few seconds plus a final summary,
+             for unattended runs and log collectors
+    quiet    nothing but errors until the script's own final summary
+
+JSON records and quiet-mode errors go to stderr, so they never mix with the
+banners, prompts and summaries the scripts print to stdout: redirect stderr
+(``2> progress.jsonl``) to collect the JSON lines.
+"""
+
+import json
+import sys
+import threading
+import time
+from typing import Optional
+
+from rich.console import Console
+from rich.markup import escape
+from rich.progress import (BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TextColumn,
+                           TimeElapsedColumn)
+from rich.text import Text
+
+PROGRESS_MODES = ('console', 'json', 'quiet')
+
+# Seconds between renders per mode
+CONSOLE_INTERVAL = 0.25
+JSON_INTERVAL = 5.0
+
+
+def format_bytes(size: float) -> str:
+    if size < 1024:
+        return f"{int(size)} B"
+    for unit in ('KB', 'MB', 'GB'):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} TB"
+
+
+class ProgressReporter:
+    """Collects per-file and per-byte events and renders them at a fixed rate.
+
+    All event methods are thread-safe and cheap (a lock and a few additions).
+    Use as a context manager to run the render thread; outside of it the
+    reporter still counts and prints messages, but draws no progress.
+    """
+
+    def __init__(self, description: str = "Transferring", total: Optional[int] = None,
+                 mode: str = 'console', interval: Optional[float] = None, console: Optional[Console] = None):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode '{mode}', use one of: {', '.join(PROGRESS_MODES)}")
+        self.description = description
+        self.total = total
+        self.mode = mode
+        self.interval = interval or (JSON_INTERVAL if mode == 'json' else CONSOLE_INTERVAL)
+        self.console = console or Console()
+        self.error_console = Console(stderr=True)
+
+        self.lock = threading.Lock()
+        self.files_done = 0
+        self.files_failed = 0
+        self.files_skipped = 0
+        self.bytes_done = 0
+        self.started = time.monotonic()
+
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.progress = None
+        self.task = None
+
+    # -- events ------------------------------------------------------------
+
+    def set_total(self, total: Optional[int]):
+        with self.lock:
+            self.total = total
+
+    def add_bytes(self, size: int):
+        with self.lock:
+            self.bytes_done += size
+
+    def file_done(self, size: int = 0):
+        """A file finished; ``size`` is added unless already counted through add_bytes()."""
+        with self.lock:
+            self.files_done += 1
+            self.bytes_done += size
+
+    def file_skipped(self):
+        with self.lock:
+            self.files_skipped += 1
+
+    def file_failed(self, name: str, error: str):
+        with self.lock:
+            self.files_failed += 1
+        if self.mode == 'json':
+            self._emit({'event': 'failed', 'file': name, 'error': str(error)})
+        else:
+            self.error(f"[red]✗ {escape(name)}: {escape(str(error))}[/red]")
+
+    def message(self, text: str, markup: bool = True):
+        """Print an occasional line (errors, retries) without breaking the progress bar."""
+        if self.mode == 'console':
+            self.console.print(text, markup=markup, highlight=False)
+        elif self.mode == 'json':
+            self._emit({'event': 'message', 'message': Text.from_markup(text).plain if markup else text})
+
+    def error(self, text: str, markup: bool = True):
+        """As message(), but quiet mode still prints it, to stderr."""
+        if self.mode == 'quiet':
+            self.error_console.print(text, markup=markup, highlight=False)
+        else:
+            self.message(text, markup)
+
+    # -- rendering ---------------------------------------------------------
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'files_done': self.files_done,
+                'files_failed': self.files_failed,
+                'files_skipped': self.files_skipped,
+                'files_total': self.total,
+                'bytes_done': self.bytes_done,
+                'bytes_per_second': round(self.bytes_done / elapsed) if elapsed > 0 else 0,
+                'elapsed_seconds': round(elapsed, 1),
+            }
+
+    def _emit(self, record: dict):
+        sys.stderr.write(json.dumps(record) + '\n')
+        sys.stderr.flush()
+
+    def _render(self):
+        state = self.snapshot()
+        if self.mode == 'json':
+            self._emit({'event': 'progress', **state})
+        elif self.progress is not None:
+            detail = f"{format_bytes(state['bytes_done'])} • {format_bytes(state['bytes_per_second'])}/s"
+            if state['files_skipped']:
+                detail += f" • {state['files_skipped']} skipped"
+            if state['files_failed']:
+                detail += f" • [red]{state['files_failed']} failed[/red]"
+            processed = state['files_done'] + state['files_failed'] + state['files_skipped']
+            self.progress.update(self.task, completed=processed, total=state['files_total'], detail=detail)
+            self.progress.refresh()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self._render()
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        if self.mode == 'console':
+            self.progress = Progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                MofNCompleteColumn(),
+                TextColumn("{task.fields[detail]}"),
+                TimeElapsedColumn(),
+                console=self.console,
+                auto_refresh=False
+            )
+            self.progress.start()
+            self.task = self.progress.add_task(f"[cyan]{self.description}...", total=self.total, detail="")
+        if self.mode != 'quiet':
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self._render()
+        if self.mode == 'json':
+            self._emit({'event': 'summary', **self.snapshot()})
+        if self.progress is not None:
+            self.progress.stop()
+        return False
+
+
+def print_message(reporter: Optional[ProgressReporter], text: str):
+    """Print through the run's reporter, or straight to the console for helpers called without one."""
+    if reporter is not None:
+        reporter.message(text)
+    else:
+        Console().print(text, highlight=False)
+
+
+def print_error(reporter: Optional[ProgressReporter], text: str):
+    """As print_message(), for errors that quiet mode still shows."""
+    if reporter is not None:
+        reporter.error(text)
+    else:
+        Console().print(text, highlight=False)
@@ -0,0 +1,190 @@
+"""
+Shared retry policy for the Drive and S3 transfer scripts.
+
+Retries only errors that are worth retrying (throttling, server errors,
+dropped connections), waits with decorrelated-jitter backoff, honors the
+server's Retry-After header and caps the total number of retries per run so
+a throttled burst cannot turn into an endless retry storm.
+"""
+
+import asyncio
+import random
+import socket
+import ssl
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Callable, Optional
+
+# HTTP statuses that signal a transient condition
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Drive reports per-user throttling as 403 with one of these reasons
+RETRYABLE_403_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+# S3 error codes that mean "slow down and try again"
+RETRYABLE_S3_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestTimeout',
+                      'RequestTimeTooSkewed', 'InternalError', 'ServiceUnavailable'}
+
+
+class RetryBudgetExceeded(Exception):
+    """Raised when the per-run retry budget has been used up."""
+
+
+def get_error_status(error: Exception) -> Optional[int]:
+    """Extract the HTTP status from a googleapiclient HttpError or botocore ClientError."""
+    resp = getattr(error, 'resp', None)
+    if resp is not None and getattr(resp, 'status', None) is not None:
+        return int(resp.status)
+
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if status is not None:
+            return int(status)
+
+    return None
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the server-requested delay in seconds, if the error carries Retry-After."""
+    value = None
+
+    resp = getattr(error, 'resp', None)
+    if resp is not None and hasattr(resp, 'get'):
+        value = resp.get('retry-after')
+
+    response = getattr(error, 'response', None)
+    if value is None and isinstance(response, dict):
+        headers = response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+        value = headers.get('retry-after')
+
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Decide whether an error is transient."""
+    if isinstance(error, (ConnectionError, TimeoutError, socket.timeout, ssl.SSLError)):
+        return True
+
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        code = response.get('Error', {}).get('Code')
+        if code in RETRYABLE_S3_CODES:
+            return True
+
+    status = get_error_status(error)
+    if status is None:
+        # Transport-level failures from httplib2/urllib3 that are not OSErrors
+        return type(error).__name__ in ('ServerNotFoundError', 'EndpointConnectionError',
+                                        'ConnectionClosedError', 'ReadTimeoutError',
+                                        'IncompleteRead', 'RemoteDisconnected')
+
+    if status in RETRYABLE_STATUS_CODES:
+        return True
+
+    if status == 403:
+        content = getattr(error, 'content', b'') or b''
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        return any(reason in content for reason in RETRYABLE_403_REASONS)
+
+    return False
+
+
+class RetryPolicy:
+    """Retry transient failures with decorrelated-jitter backoff.
+
+    One instance is meant to be shared by all workers of a run: the retry budget
+    is global, so when the remote side is persistently throttling, workers give
+    up instead of multiplying the load.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 max_total_retries: Optional[int] = 1000):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_total_retries = max_total_retries
+        self.lock = Lock()
+        self.total_retries = 0
+
+    def next_delay(self, previous_delay: float) -> float:
+        """Decorrelated jitter: sleep = min(cap, uniform(base, previous * 3))."""
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)))
+
+    def _take_retry(self) -> bool:
+        with self.lock:
+            if self.max_total_retries is not None and self.total_retries >= self.max_total_retries:
+                return False
+            self.total_retries += 1
+            return True
+
+    def _next_wait(self, attempt: int, delay: float, error: Exception) -> Optional[tuple]:
+        """Return (new backoff delay, seconds to wait) for a retry, or None to give up."""
+        if attempt >= self.max_attempts or not is_retryable(error):
+            return None
+        if not self._take_retry():
+            raise RetryBudgetExceeded(
+                f"Retry budget of {self.max_total_retries} exhausted; last error: {error}"
+            ) from error
+
+        delay = self.next_delay(delay)
+        retry_after = get_retry_after(error)
+        wait = min(max(delay, retry_after), self.max_delay * 5) if retry_after is not None else delay
+        return delay, wait
+
+    def run(self, func: Callable, *args, on_retry: Optional[Callable] = None, **kwargs):
+        """Call ``func`` until it succeeds, fails permanently or runs out of attempts.
+
+        ``on_retry(attempt, delay, error)`` is called before each wait, e.g. for logging.
+        The last error is re-raised when retrying stops.
+        """
+        delay = self.base_delay
+        attempt = 0
+
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                retry = self._next_wait(attempt, delay, e)
+                if retry is None:
+                    raise
+                delay, wait = retry
+
+                if on_retry:
+                    on_retry(attempt, wait, e)
+                time.sleep(wait)
+
+    async def run_async(self, func: Callable, *args, on_retry: Optional[Callable] = None, **kwargs):
+        """Coroutine version of run(): awaits ``func(*args, **kwargs)`` and sleeps with asyncio."""
+        delay = self.base_delay
+        attempt = 0
+
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                attempt += 1
+                retry = self._next_wait(attempt, delay, e)
+                if retry is None:
+                    raise
+                delay, wait = retry
+
+                if on_retry:
+                    on_retry(attempt, wait, e)
+                await asyncio.sleep(wait)
@@ -5,45 +5,302 @@ Recursively copies data from S3 to Google Drive maintaining folder structure
 
 import os
 import csv
+import queue
+import sqlite3
 import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import List
 import typer
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from rich.table import Table
-import boto3
 from botocore.exceptions import ClientError
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 import pickle
 
+from byte_budget import parse_size
+from credential_pool import POOL_STRATEGIES, CredentialPool
+from drive_upload import MemberStream, create_once, upload_stream
+from retry_policy import RetryPolicy
+from s3_client import (DEFAULT_MULTIPART_CHUNKSIZE, DEFAULT_TRANSFER_CONCURRENCY, make_s3_client,
+                       make_transfer_config)
+from s3_inventory import InventoryFilter, iter_inventory, parse_date
+from s3_lister import DEFAULT_LIST_DEPTH, DEFAULT_LIST_WORKERS, ParallelS3Lister
+
 # Initialize
 app = typer.Typer(help="Transfer files from S3 to Google Drive")
 console = Console()
 
 SCOPES = ['https://www.googleapis.com/auth/drive']
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+def inventory_objects(inventory, bucket, prefix, inventory_filter=None):
+    """Objects under s3://bucket/prefix read from an S3 Inventory report instead of listed"""
+    for obj in iter_inventory(inventory, inventory_filter):
+        if obj.get('Bucket') not in (None, '', bucket) or not obj['Key'].startswith(prefix):
+            continue
+        # Skip if it's a folder marker
+        if not obj['Key'].endswith('/'):
+            yield obj
+
+
+def build_inventory_filter(include_prefixes, exclude_prefixes, min_size, max_size, modified_after, modified_before):
+    """InventoryFilter from the command-line options (sizes like 10M, ISO dates)"""
+    return InventoryFilter(
+        include_prefixes=include_prefixes or None,
+        exclude_prefixes=exclude_prefixes or None,
+        min_size=parse_size(min_size) if min_size else None,
+        max_size=parse_size(max_size) if max_size else None,
+        modified_after=parse_date(modified_after) if modified_after else None,
+        modified_before=parse_date(modified_before) if modified_before else None,
+    )
+
+
+class S3ObjectReader:
+    """Sequential reader over an S3 object for streamed transfers
+    
+    If the GetObject stream drops mid-way, it is reopened with a Range request
+    from the current offset instead of starting the object over.
+    """
+    def __init__(self, s3_client, bucket, key, retry_policy, on_retry=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.retry_policy = retry_policy
+        self.on_retry = on_retry
+        self.pos = 0
+        self.body = None
+    
+    def read(self, n=-1):
+        def attempt():
+            if self.body is None:
+                kwargs = {'Range': f'bytes={self.pos}-'} if self.pos else {}
+                self.body = self.s3_client.get_object(Bucket=self.bucket, Key=self.key, **kwargs)['Body']
+            try:
+                return self.body.read(n if n is not None and n >= 0 else None)
+            except Exception as e:
+                # Reopen on the next attempt; a broken body is always worth retrying
+                self.body = None
+                raise ConnectionError(f"S3 stream for {self.key} dropped: {e}") from e
+        
+        data = self.retry_policy.run(attempt, on_retry=self.on_retry)
+        self.pos += len(data)
+        return data
+
+
+class WatermarkJournal:
+    """SQLite checkpoint of S3 listing and transfer progress
+    
+    Listing runs as several streams, each one prefix paginated in key order.
+    Every stream keeps a watermark: the highest key up to which every listed key
+    has finished. Keys past the watermark are kept individually while in
+    flight, as are failed keys. A resumed run restarts each unfinished stream
+    with StartAfter=<watermark>, re-checks only the keys that were in flight
+    and retries the failed ones, so finished work is neither listed nor
+    transferred again. The journal records the bucket and prefix it belongs to,
+    so it cannot be resumed against a different S3 path.
+    """
+    def __init__(self, journal_file, reset=False):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(journal_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS streams (
+                prefix TEXT PRIMARY KEY,
+                level INTEGER,
+                watermark TEXT,
+                done INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS keys (
+                key TEXT PRIMARY KEY,
+                stream TEXT,
+                size INTEGER,
+                status TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        if reset:
+            self.conn.execute("DELETE FROM streams")
+            self.conn.execute("DELETE FROM keys")
+            self.conn.execute("DELETE FROM meta")
+        self.conn.commit()
+        
+        # Keys dispatched per stream in key order, and those finished out of order
+        self.pending = {}
+        self.finished = {}
+        self.listed = set()
+        
+        # Work left over from the previous run: keys done past a watermark are
+        # skipped when listed again, in-flight and failed keys are retried first
+        self.done_keys = set()
+        self.retry_keys = {}
+        for key, size, status in self.conn.execute("SELECT key, size, status FROM keys").fetchall():
+            if status == 'done':
+                self.done_keys.add(key)
+            else:
+                self.retry_keys[key] = (size, status)
+    
+    def bind_source(self, bucket, prefix):
+        """Record the S3 path this journal checkpoints; a journal for another path is refused"""
+        source = f"s3://{bucket}/{prefix}"
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'source'").fetchone()
+            if row is None and (self.has_streams() or self.done_keys or self.retry_keys):
+                raise ValueError("The journal does not record which S3 path it belongs to; "
+                                 "run without --resume to start over")
+            if row is not None and row[0] != source:
+                raise ValueError(f"The journal belongs to {row[0]}, not {source}; resume with that path "
+                                 f"or run without --resume to start over")
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source,))
+            self.conn.commit()
+    
+    def has_streams(self):
+        return self.conn.execute("SELECT COUNT(*) FROM streams").fetchone()[0] > 0
+    
+    def open_streams(self):
+        """Unfinished streams as (prefix, level, start_after) tuples for the lister"""
+        return self.conn.execute("SELECT prefix, level, watermark FROM streams WHERE done = 0").fetchall()
+    
+    def known_streams(self):
+        return {row[0] for row in self.conn.execute("SELECT prefix FROM streams").fetchall()}
+    
+    def retry_objects(self):
+        """Objects to retry before listing resumes, as minimal listing entries"""
+        return [{'Key': key, 'Size': size} for key, (size, _) in sorted(self.retry_keys.items())]
+    
+    def needs_recheck(self, key):
+        """True for keys that were in flight when the previous run stopped"""
+        entry = self.retry_keys.get(key)
+        return entry is not None and entry[1] == 'inflight'
+    
+    def is_handled(self, key):
+        """True if a listed key is already done or queued for retry"""
+        return key in self.done_keys or key in self.retry_keys
+    
+    def add_stream(self, prefix, level):
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO streams VALUES (?, ?, NULL, 0)", (prefix, level))
+            self.conn.commit()
+    
+    def end_stream(self, prefix):
+        """The stream has been listed completely"""
+        with self.lock:
+            self.listed.add(prefix)
+            self._check_done(prefix)
+            self.conn.commit()
+    
+    def dispatch(self, stream, obj):
+        """Record a listed key as in flight (committed with the next finish)"""
+        with self.lock:
+            self.pending.setdefault(stream, deque()).append(obj['Key'])
+            self.conn.execute("INSERT OR REPLACE INTO keys VALUES (?, ?, ?, 'inflight')",
+                              (obj['Key'], stream, obj.get('Size')))
+    
+    def finish(self, stream, key, ok):
+        """Record the outcome of one key and advance its stream's watermark"""
+        status = 'done' if ok else 'failed'
+        with self.lock:
+            if stream is None:
+                # A retried key from the previous run, outside any stream
+                if ok:
+                    self.conn.execute("DELETE FROM keys WHERE key = ?", (key,))
+                else:
+                    self.conn.execute("UPDATE keys SET status = 'failed' WHERE key = ?", (key,))
+                self.conn.commit()
+                return
+            
+            self.conn.execute("UPDATE keys SET status = ? WHERE key = ?", (status, key))
+            self.finished[key] = status
+            pending = self.pending[stream]
+            watermark = None
+            while pending and pending[0] in self.finished:
+                watermark = pending.popleft()
+                del self.finished[watermark]
+            if watermark is not None:
+                # Failed keys stay behind the watermark so a resumed run retries them
+                self.conn.execute("UPDATE streams SET watermark = ? WHERE prefix = ?", (watermark, stream))
+                self.conn.execute("DELETE FROM keys WHERE stream = ? AND key <= ? AND status = 'done'",
+                                  (stream, watermark))
+            self._check_done(stream)
+            self.conn.commit()
+    
+    def _check_done(self, stream):
+        if stream in self.listed and not self.pending.get(stream):
+            self.conn.execute("UPDATE streams SET done = 1 WHERE prefix = ?", (stream,))
+    
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
 
 
 class S3ToGDriveTransfer:
-    def __init__(self, aws_profile=None):
+    def __init__(self, aws_profile=None, retry_policy=None, stream=True, workers=8, queue_size=1000,
+                 list_depth=DEFAULT_LIST_DEPTH, list_workers=DEFAULT_LIST_WORKERS, sync=False, replace=False,
+                 journal=None, inventory=None, inventory_filter=None, max_pool_connections=None,
+                 transfer_config=None, pool_tokens=None, credential_strategy='least-loaded',
+                 requests_per_second=None):
         self.s3_client = None
-        self.gdrive_service = None
+        self.max_pool_connections = max_pool_connections
+        self.transfer_config = transfer_config or make_transfer_config()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.stream = stream
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.list_depth = list_depth
+        self.list_workers = list_workers
+        self.sync = sync
+        self.replace = replace
+        self.journal = journal
+        self.inventory = inventory
+        self.inventory_filter = inventory_filter
+        self.drive_files = {}
+        self.skipped_count = 0
+        self.listed_count = 0
+        self.list_error = None
+        self.creds = None
+        self.pool = None
+        self.pool_tokens = pool_tokens
+        self.credential_strategy = credential_strategy
+        self.requests_per_second = requests_per_second
         self.folder_cache = {}
+        self.folder_locks = {}
+        self.folders_created = 0
         self.transferred_files = []
+        self.failed_files = []
         self.aws_profile = aws_profile
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+    
+    @property
+    def gdrive_service(self):
+        """Drive client for the calling thread (httplib2 connections are not thread-safe)
+        
+        Each access picks a credential from the pool, so a single call, or a
+        whole upload made through one service, stays on one credential.
+        """
+        return self.pool.thread_service() if self.pool is not None else None
         
     def setup_s3(self):
-        """Initialize S3 client"""
+        """Initialize the S3 client shared by all workers and listing streams"""
         try:
-            if self.aws_profile:
-                session = boto3.Session(profile_name=self.aws_profile)
-                self.s3_client = session.client('s3')
-            else:
-                self.s3_client = boto3.client('s3')
+            # Each worker holds a GetObject stream (or a managed download's
+            # parallel ranges) while the lister runs its own streams alongside
+            per_worker = 1 if self.stream else self.transfer_config.max_request_concurrency
+            pool_size = self.max_pool_connections or self.workers * per_worker + self.list_workers + 4
+            self.s3_client = make_s3_client(self.aws_profile, max_pool_connections=pool_size)
             console.print("[green]✓[/green] S3 client initialized")
         except Exception as e:
             console.print(f"[red]✗[/red] Error initializing S3: {str(e)}")
@@ -88,8 +345,14 @@ class S3ToGDriveTransfer:
 #             with open('token.pickle', 'wb') as token:
 #                 pickle.dump(creds, token)
         
-        self.gdrive_service = build('drive', 'v3', credentials=creds)
-        console.print("[green]✓[/green] Google Drive authenticated")
+        self.creds = creds
+        self.pool = CredentialPool.with_extra(creds, self.pool_tokens, SCOPES, self.requests_per_second,
+                                              self.credential_strategy)
+        console.print(f"[green]✓[/green] Google Drive authenticated ({self.pool.describe()})")
+    
+    def _log_retry(self, attempt, delay, error):
+        """Report a retry scheduled by the retry policy"""
+        console.print(f"[yellow]↻[/yellow] Retry {attempt}/{self.retry_policy.max_attempts - 1} in {delay:.1f}s: {error}")
     
     def parse_s3_path(self, s3_path):
         """Parse S3 path into bucket and prefix"""
@@ -100,87 +363,223 @@ class S3ToGDriveTransfer:
         return bucket, prefix
     
     def list_s3_objects(self, bucket, prefix):
-        """List all objects in S3 bucket with given prefix"""
-        objects = []
-        paginator = self.s3_client.get_paginator('list_objects_v2')
+        """Yield all objects in S3 bucket with given prefix, listing sub-prefixes in parallel"""
+        lister = ParallelS3Lister(self.s3_client, depth=self.list_depth, workers=self.list_workers,
+                                  retry_policy=self.retry_policy)
         
         try:
-            for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-                if 'Contents' in page:
-                    for obj in page['Contents']:
-                        # Skip if it's a folder marker
-                        if not obj['Key'].endswith('/'):
-                            objects.append(obj)
+            for obj in lister.iter_objects(bucket, prefix):
+                # Skip if it's a folder marker
+                if not obj['Key'].endswith('/'):
+                    yield obj
         except ClientError as e:
             console.print(f"[red]✗[/red] Error listing S3 objects: {str(e)}")
             raise
-        return objects
+    
+    def list_gdrive_children(self, parent_id, folders_only=False):
+        """List the non-trashed children of a Drive folder"""
+        query = f"'{parent_id}' in parents and trashed=false"
+        if folders_only:
+            query += f" and mimeType='{FOLDER_MIME_TYPE}'"
+        
+        # One service for all pages, so page tokens go back to the credential that issued them
+        service = self.gdrive_service
+        children = []
+        page_token = None
+        while True:
+            response = self.retry_policy.run(
+                service.files().list(
+                    q=query,
+                    fields='nextPageToken, files(id, name, mimeType, size, md5Checksum)',
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute,
+                on_retry=self._log_retry
+            )
+            children.extend(response.get('files', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return children
+    
+    def index_gdrive_folders(self, root_folder_id, include_files=False):
+        """Map every existing folder path under the root to its Drive id
+        
+        The tree is read once, one level at a time with the folders of a level
+        listed in parallel, so reruns reuse the folders created last time
+        instead of duplicating them. With ``include_files`` the files are
+        indexed as well, into ``drive_files`` (path -> id, size, md5Checksum).
+        """
+        self.folder_cache = {'': root_folder_id}
+        self.drive_files = {}
+        level = [('', root_folder_id)]
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while level:
+                next_level = []
+                listings = executor.map(
+                    lambda folder: self.list_gdrive_children(folder[1], folders_only=not include_files), level)
+                for (path, _), children in zip(level, listings):
+                    for child in children:
+                        child_path = f"{path}/{child['name']}" if path else child['name']
+                        if child['mimeType'] != FOLDER_MIME_TYPE:
+                            self.drive_files.setdefault(child_path, child)
+                        # With duplicate names in Drive, the first one listed wins
+                        elif child_path not in self.folder_cache:
+                            self.folder_cache[child_path] = child['id']
+                            next_level.append((child_path, child['id']))
+                level = next_level
+        
+        return self.folder_cache
+    
+    def exists_in_gdrive(self, relative_path, size):
+        """True if a file with this path and size is already in Drive
+        
+        Used for keys that were in flight when a run stopped, whose upload may
+        have completed without being recorded.
+        """
+        folder_path, _, name = relative_path.rpartition('/')
+        with self.lock:
+            folder_id = self.folder_cache.get(folder_path)
+        if not folder_id:
+            return False
+        
+        escaped_name = name.replace('\\', '\\\\').replace("'", "\\'")
+        # The service property picks a credential afresh for every attempt
+        response = self.retry_policy.run(
+            lambda: self.gdrive_service.files().list(
+                q=f"name='{escaped_name}' and '{folder_id}' in parents and trashed=false",
+                fields='files(id, size)'
+            ).execute(),
+            on_retry=self._log_retry
+        )
+        return any(str(f.get('size')) == str(size) for f in response.get('files', []))
     
     def create_gdrive_folder(self, folder_name, parent_id=None):
         """Create folder in Google Drive"""
-        cache_key = f"{folder_name}_{parent_id}"
-        if cache_key in self.folder_cache:
-            return self.folder_cache[cache_key]
-        
         file_metadata = {
             'name': folder_name,
-            'mimeType': 'application/vnd.google-apps.folder'
+            'mimeType': FOLDER_MIME_TYPE
         }
         
         if parent_id:
             file_metadata['parents'] = [parent_id]
         
-        folder = self.gdrive_service.files().create(
-            body=file_metadata,
-            fields='id, name, webViewLink'
-        ).execute()
+        folder = create_once(
+            self.retry_policy,
+            lambda: self.gdrive_service.files().create(
+                body=file_metadata,
+                fields='id, name, webViewLink'
+            ).execute(),
+            self.pool, folder_name, parent_id, 'id, name, webViewLink', mime_type=FOLDER_MIME_TYPE,
+            on_retry=self._log_retry
+        )
         
-        folder_id = folder.get('id')
-        self.folder_cache[cache_key] = folder_id
-        return folder_id
+        return folder.get('id')
     
     def ensure_folder_structure(self, path, root_folder_id):
-        """Create folder structure in Google Drive"""
+        """Return the Drive folder id for a relative path, creating only missing folders
+        
+        Paths are looked up in the path -> id map built by index_gdrive_folders().
+        A missing folder is created after its parent, and workers that need the
+        same folder wait on a per-path lock so it is created once.
+        """
+        path = '/'.join(part for part in path.split('/') if part)
         if not path:
             return root_folder_id
         
-        parts = path.split('/')
-        current_parent = root_folder_id
+        with self.lock:
+            folder_id = self.folder_cache.get(path)
+        if folder_id:
+            return folder_id
         
-        for part in parts:
-            if part:
-                current_parent = self.create_gdrive_folder(part, current_parent)
+        parent_path, _, name = path.rpartition('/')
+        parent_id = self.ensure_folder_structure(parent_path, root_folder_id)
         
-        return current_parent
+        with self.lock:
+            folder_lock = self.folder_locks.setdefault(path, threading.Lock())
+        with folder_lock:
+            with self.lock:
+                if path in self.folder_cache:
+                    return self.folder_cache[path]
+            folder_id = self.create_gdrive_folder(name, parent_id)
+            with self.lock:
+                self.folder_cache[path] = folder_id
+                self.folders_created += 1
+        return folder_id
+    
+    def find_unchanged(self, obj, relative_path):
+        """Compare an S3 object with the Drive index
+        
+        Returns (unchanged, existing Drive file or None). Objects match on size
+        and, for single-part uploads whose ETag is the content MD5, on checksum.
+        """
+        existing = self.drive_files.get(relative_path)
+        if existing is None:
+            return False, None
+        if str(obj.get('Size')) != str(existing.get('size')):
+            return False, existing
+        etag = obj.get('ETag', '').strip('"')
+        if etag and '-' not in etag and existing.get('md5Checksum'):
+            return etag == existing['md5Checksum'], existing
+        return True, existing
     
     def download_from_s3(self, bucket, key, local_path):
         """Download file from S3 to local temp file"""
         try:
-            self.s3_client.download_file(bucket, key, local_path)
+            self.retry_policy.run(self.s3_client.download_file, bucket, key, local_path,
+                                  Config=self.transfer_config, on_retry=self._log_retry)
             return True
-        except ClientError as e:
+        except Exception as e:
             console.print(f"[red]✗[/red] Error downloading {key}: {str(e)}")
             return False
     
-    def upload_to_gdrive(self, local_path, filename, parent_id):
-        """Upload file to Google Drive"""
+    def upload_to_gdrive(self, local_path, filename, parent_id, file_id=None):
+        """Upload file to Google Drive, replacing the content of ``file_id`` if given"""
         file_metadata = {
             'name': filename,
             'parents': [parent_id]
         }
         
-        media = MediaFileUpload(local_path, resumable=True)
+        fields = 'id, name, webViewLink, size, mimeType'
         
-        file = self.gdrive_service.files().create(
-            body=file_metadata,
-            media_body=media,
-            fields='id, name, webViewLink, size, mimeType'
-        ).execute()
+        def attempt():
+            # A credential picked afresh for every attempt
+            service = self.gdrive_service
+            media = MediaFileUpload(local_path, resumable=True)
+            if file_id:
+                return service.files().update(
+                    fileId=file_id,
+                    media_body=media,
+                    fields=fields
+                ).execute()
+            return service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields=fields
+            ).execute()
         
-        return file
+        if file_id:
+            return self.retry_policy.run(attempt, on_retry=self._log_retry)
+        # A retry first checks whether the failed attempt created the file after all
+        return create_once(self.retry_policy, attempt, self.pool, filename, parent_id, fields,
+                           on_retry=self._log_retry)
     
-    def transfer_file(self, bucket, s3_key, gdrive_parent_id, base_prefix):
-        """Transfer single file from S3 to Google Drive"""
+    def stream_to_gdrive(self, bucket, s3_key, size, filename, parent_id, file_id=None):
+        """Upload an S3 object to Google Drive straight from its GetObject stream
+        
+        Objects are sent in resumable chunks read from S3 as the upload goes, so
+        nothing touches the disk and memory stays at about one chunk per transfer.
+        """
+        reader = S3ObjectReader(self.s3_client, bucket, s3_key, self.retry_policy, self._log_retry)
+        success, _, gdrive_file, error = upload_stream(self.pool, MemberStream(reader, size), filename,
+                                                       size, parent_id, self.retry_policy, file_id=file_id)
+        if not success:
+            console.print(f"[red]✗[/red] Error transferring {s3_key}: {error}")
+            return None
+        return gdrive_file
+    
+    def transfer_file(self, bucket, s3_key, gdrive_parent_id, base_prefix, size=None, file_id=None):
+        """Transfer single file from S3 to Google Drive, replacing ``file_id`` if given"""
         # Get relative path
         relative_path = s3_key[len(base_prefix):].lstrip('/')
         path_parts = relative_path.split('/')
@@ -190,6 +589,15 @@ class S3ToGDriveTransfer:
         # Ensure folder structure exists
         target_folder_id = self.ensure_folder_structure(folder_path, gdrive_parent_id)
         
+        if self.stream:
+            if size is None:
+                size = self.retry_policy.run(self.s3_client.head_object, Bucket=bucket, Key=s3_key,
+                                             on_retry=self._log_retry)['ContentLength']
+            gdrive_file = self.stream_to_gdrive(bucket, s3_key, size, filename, target_folder_id, file_id)
+            if gdrive_file is None:
+                return None
+            return self.build_metadata(bucket, s3_key, filename, folder_path, gdrive_file)
+        
         # Download to temp file
         with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
             tmp_path = tmp_file.name
@@ -200,27 +608,142 @@ class S3ToGDriveTransfer:
                 return None
             
             # Upload to Google Drive
-            gdrive_file = self.upload_to_gdrive(tmp_path, filename, target_folder_id)
-            
-            # Store metadata
-            metadata = {
-                'filename': filename,
-                's3_path': f"s3://{bucket}/{s3_key}",
-                'folder_path': folder_path or 'Root',
-                'gdrive_link': gdrive_file.get('webViewLink'),
-                'gdrive_id': gdrive_file.get('id'),
-                'file_size': gdrive_file.get('size', 'N/A'),
-                'mime_type': gdrive_file.get('mimeType', 'N/A'),
-                'transfer_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
+            gdrive_file = self.upload_to_gdrive(tmp_path, filename, target_folder_id, file_id)
             
-            return metadata
+            return self.build_metadata(bucket, s3_key, filename, folder_path, gdrive_file)
             
         finally:
             # Clean up temp file
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
     
+    def build_metadata(self, bucket, s3_key, filename, folder_path, gdrive_file):
+        """Metadata record for one transferred file"""
+        return {
+            'filename': filename,
+            's3_path': f"s3://{bucket}/{s3_key}",
+            'folder_path': folder_path or 'Root',
+            'gdrive_link': gdrive_file.get('webViewLink'),
+            'gdrive_id': gdrive_file.get('id'),
+            'file_size': gdrive_file.get('size', 'N/A'),
+            'mime_type': gdrive_file.get('mimeType', 'N/A'),
+            'transfer_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
+    def transfer_object(self, bucket, obj, gdrive_folder_id, prefix):
+        """Transfer one listed object and record the outcome (runs on worker threads)
+        
+        Returns True if the object is in Drive afterwards, whether transferred
+        now or skipped as already there.
+        """
+        s3_key = obj['Key']
+        relative_path = '/'.join(part for part in s3_key[len(prefix):].split('/') if part)
+        file_id = None
+        try:
+            unchanged = (self.journal is not None and self.journal.needs_recheck(s3_key)
+                         and self.exists_in_gdrive(relative_path, obj.get('Size')))
+        except Exception:
+            unchanged = False
+        if self.sync and not unchanged:
+            unchanged, existing = self.find_unchanged(obj, relative_path)
+            if existing and self.replace:
+                file_id = existing['id']
+        if unchanged:
+            with self.lock:
+                self.skipped_count += 1
+            return True
+        
+        try:
+            metadata = self.transfer_file(bucket, s3_key, gdrive_folder_id, prefix, obj.get('Size'), file_id)
+        except Exception as e:
+            console.print(f"[red]✗[/red] Error transferring {s3_key}: {str(e)}")
+            metadata = None
+        
+        with self.lock:
+            if metadata:
+                self.transferred_files.append(metadata)
+            else:
+                self.failed_files.append(s3_key)
+        return metadata is not None
+    
+    def iter_work(self, bucket, prefix):
+        """Yield (stream, object) pairs to transfer, checkpointed in the journal if there is one"""
+        if self.inventory:
+            # Inventory rows are not in key order, so there is no watermark to keep;
+            # use --sync to skip files already transferred by an earlier run
+            for obj in inventory_objects(self.inventory, bucket, prefix, self.inventory_filter):
+                yield None, obj
+            return
+        
+        if self.journal is None:
+            for obj in self.list_s3_objects(bucket, prefix):
+                yield None, obj
+            return
+        
+        # Keys left in flight or failed by the previous run go first
+        for obj in self.journal.retry_objects():
+            yield None, obj
+        
+        if self.journal.has_streams():
+            streams, known = self.journal.open_streams(), self.journal.known_streams()
+        else:
+            self.journal.add_stream(prefix, 0)
+            streams, known = None, ()
+        
+        lister = ParallelS3Lister(self.s3_client, depth=self.list_depth, workers=self.list_workers,
+                                  retry_policy=self.retry_policy)
+        try:
+            for event, stream, item in lister.iter_events(bucket, prefix, streams, known):
+                if event == 'stream':
+                    self.journal.add_stream(stream, item)
+                elif event == 'end':
+                    self.journal.end_stream(stream)
+                elif not item['Key'].endswith('/') and not self.journal.is_handled(item['Key']):
+                    self.journal.dispatch(stream, item)
+                    yield stream, item
+        except ClientError as e:
+            console.print(f"[red]✗[/red] Error listing S3 objects: {str(e)}")
+            raise
+    
+    def _list(self, work_queue, bucket, prefix, progress, task):
+        """Listing thread: feed objects into the bounded work queue as pages arrive
+        
+        The queue blocks listing whenever the workers fall behind, so memory stays
+        flat however many keys the prefix holds. The sentinels for the workers
+        are always queued, even when listing fails.
+        """
+        try:
+            for work in self.iter_work(bucket, prefix):
+                while not self.stop_event.is_set():
+                    try:
+                        work_queue.put(work, timeout=1)
+                        break
+                    except queue.Full:
+                        pass
+                if self.stop_event.is_set():
+                    return
+                self.listed_count += 1
+                progress.update(task, description=f"[cyan]Transferring files ({self.listed_count} listed so far)...")
+            progress.update(task, total=self.listed_count,
+                            description=f"[cyan]Transferring files ({self.workers} workers)...")
+        except Exception as e:
+            self.list_error = e
+        finally:
+            for _ in range(self.workers):
+                work_queue.put(None)
+    
+    def _work(self, work_queue, bucket, gdrive_folder_id, prefix, progress, task):
+        """Worker thread: transfer queued objects until the sentinel"""
+        while True:
+            work = work_queue.get()
+            if work is None or self.stop_event.is_set():
+                return
+            stream, obj = work
+            ok = self.transfer_object(bucket, obj, gdrive_folder_id, prefix)
+            if self.journal is not None:
+                self.journal.finish(stream, obj['Key'], ok)
+            progress.update(task, advance=1)
+    
     def export_metadata_to_csv(self, output_file):
         """Export transfer metadata to CSV"""
         if not self.transferred_files:
@@ -247,24 +770,35 @@ class S3ToGDriveTransfer:
     
     def transfer(self, s3_path, gdrive_folder_id, csv_output='transfer_metadata.csv'):
         """Main transfer method"""
+        # Parse S3 path
+        bucket, prefix = self.parse_s3_path(s3_path)
+        if self.journal:
+            # Refuse to resume another path's checkpoint before doing any work
+            self.journal.bind_source(bucket, prefix)
+        
         # Setup clients
         self.setup_s3()
         self.setup_gdrive()
         
-        # Parse S3 path
-        bucket, prefix = self.parse_s3_path(s3_path)
         console.print(f"\n[cyan]S3 Bucket:[/cyan] {bucket}")
         console.print(f"[cyan]S3 Prefix:[/cyan] {prefix or '(root)'}")
         console.print(f"[cyan]GDrive Folder ID:[/cyan] {gdrive_folder_id}\n")
         
-        # List all objects
-        console.print("[yellow]Scanning S3 bucket...[/yellow]")
-        objects = self.list_s3_objects(bucket, prefix)
-        console.print(f"[green]Found {len(objects)} files to transfer[/green]\n")
+        # Read the existing destination tree once so reruns reuse its folders
+        # (and, when syncing, skip the files already there)
+        console.print("[yellow]Indexing existing Drive folders...[/yellow]")
+        self.index_gdrive_folders(gdrive_folder_id, include_files=self.sync)
+        console.print(f"[green]Found {len(self.folder_cache) - 1} existing folders"
+                      + (f" and {len(self.drive_files)} files" if self.sync else "") + "[/green]")
         
-        if not objects:
-            console.print("[yellow]No files found to transfer[/yellow]")
-            return
+        # Objects are listed while the first ones transfer
+        if self.inventory:
+            console.print(f"[yellow]Reading inventory {self.inventory}...[/yellow]")
+        else:
+            console.print("[yellow]Scanning S3 bucket...[/yellow]")
+        self.listed_count = 0
+        self.list_error = None
+        self.stop_event.clear()
         
         # Transfer files with progress bar
         with Progress(
@@ -275,24 +809,38 @@ class S3ToGDriveTransfer:
             console=console
         ) as progress:
             
-            task = progress.add_task(
-                "[cyan]Transferring files...", 
-                total=len(objects)
-            )
+            # The total stays unknown until listing finishes
+            task = progress.add_task("[cyan]Transferring files...", total=None)
             
-            for obj in objects:
-                s3_key = obj['Key']
-                filename = os.path.basename(s3_key)
-                
-                progress.update(task, description=f"[cyan]Transferring: {filename}")
-                
-                metadata = self.transfer_file(bucket, s3_key, gdrive_folder_id, prefix)
-                
-                if metadata:
-                    self.transferred_files.append(metadata)
-                    progress.update(task, advance=1)
-                else:
-                    progress.update(task, advance=1)
+            # Each worker downloads and uploads one object at a time, so up to
+            # `workers` objects move at once
+            work_queue = queue.Queue(maxsize=self.queue_size)
+            lister = threading.Thread(target=self._list, daemon=True,
+                                      args=(work_queue, bucket, prefix, progress, task))
+            workers = [threading.Thread(target=self._work, daemon=True,
+                                        args=(work_queue, bucket, gdrive_folder_id, prefix, progress, task))
+                       for _ in range(self.workers)]
+            
+            for thread in [lister] + workers:
+                thread.start()
+            try:
+                # Join with a timeout so Ctrl-C still reaches the main thread
+                for thread in [lister] + workers:
+                    while thread.is_alive():
+                        thread.join(timeout=0.5)
+            except KeyboardInterrupt:
+                self.stop_event.set()
+                raise
+        
+        if self.list_error is not None:
+            console.print(f"[red]✗[/red] Listing stopped early after {self.listed_count} files")
+            self.export_metadata_to_csv(csv_output)
+            raise self.list_error
+        
+        console.print(f"[green]Listed {self.listed_count} files[/green]")
+        if not self.listed_count:
+            console.print("[yellow]No files found to transfer[/yellow]")
+            return
         
         # Export metadata
         self.export_metadata_to_csv(csv_output)
@@ -311,7 +859,13 @@ class S3ToGDriveTransfer:
         table.add_column("Value", style="green")
         
         table.add_row("Total Files Transferred", str(len(self.transferred_files)))
-        table.add_row("Total Folders Created", str(len(self.folder_cache)))
+        table.add_row("Total Files Failed", str(len(self.failed_files)))
+        if self.skipped_count:
+            table.add_row("Total Files Skipped (already in Drive)", str(self.skipped_count))
+        table.add_row("Total Folders Created", str(self.folders_created))
+        if self.pool is not None and len(self.pool) > 1:
+            for name, requests, throttled in self.pool.stats():
+                table.add_row(f"Drive Requests ({name})", f"{requests} ({throttled} throttled)")
         
         console.print(table)
 
@@ -336,6 +890,127 @@ def transfer(
         "credentials.json",
         "--credentials",
         help="Path to Google credentials.json"
+    ),
+    max_retries: int = typer.Option(
+        5,
+        "--max-retries",
+        help="Maximum attempts per request for transient errors"
+    ),
+    retry_budget: int = typer.Option(
+        1000,
+        "--retry-budget",
+        help="Maximum total retries across the whole run"
+    ),
+    stream: bool = typer.Option(
+        True,
+        "--stream/--no-stream",
+        help="Stream objects from S3 into Drive instead of staging them in temp files"
+    ),
+    workers: int = typer.Option(
+        8,
+        "--workers",
+        "-w",
+        help="Number of objects transferred in parallel"
+    ),
+    queue_size: int = typer.Option(
+        1000,
+        "--queue-size",
+        help="Maximum number of listed objects waiting for a worker"
+    ),
+    list_depth: int = typer.Option(
+        DEFAULT_LIST_DEPTH,
+        "--list-depth",
+        help="Folder levels to fan out over when listing S3 in parallel (0 = single listing stream)"
+    ),
+    list_workers: int = typer.Option(
+        DEFAULT_LIST_WORKERS,
+        "--list-workers",
+        help="Number of concurrent S3 listing streams"
+    ),
+    sync: bool = typer.Option(
+        False,
+        "--sync",
+        help="Only transfer objects missing from Drive or changed (size / MD5) since the last run"
+    ),
+    replace: bool = typer.Option(
+        False,
+        "--replace",
+        help="With --sync, overwrite changed files in place instead of uploading a second copy"
+    ),
+    journal_file: str = typer.Option(
+        None,
+        "--journal",
+        help="SQLite checkpoint journal (default: s3_to_gdrive_<folder_id>.journal.db)"
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Resume from the journal: list from each saved watermark and re-check only in-flight keys"
+    ),
+    inventory: str = typer.Option(
+        None,
+        "--inventory",
+        help="Read objects from a local S3 Inventory report (manifest.json, CSV or Parquet) instead of listing"
+    ),
+    include_prefix: List[str] = typer.Option(
+        None,
+        "--include-prefix",
+        help="With --inventory, only keys starting with this prefix (repeatable)"
+    ),
+    exclude_prefix: List[str] = typer.Option(
+        None,
+        "--exclude-prefix",
+        help="With --inventory, skip keys starting with this prefix (repeatable)"
+    ),
+    min_size: str = typer.Option(
+        None,
+        "--min-size",
+        help="With --inventory, skip objects smaller than this (e.g. 1M)"
+    ),
+    max_size: str = typer.Option(
+        None,
+        "--max-size",
+        help="With --inventory, skip objects larger than this (e.g. 2G)"
+    ),
+    modified_after: str = typer.Option(
+        None,
+        "--modified-after",
+        help="With --inventory, only objects modified after this ISO date"
+    ),
+    modified_before: str = typer.Option(
+        None,
+        "--modified-before",
+        help="With --inventory, only objects modified before this ISO date"
+    ),
+    max_pool_connections: int = typer.Option(
+        None,
+        "--max-pool-connections",
+        help="S3 connection pool size (default: sized from --workers and --list-workers)"
+    ),
+    multipart_chunk_mb: int = typer.Option(
+        DEFAULT_MULTIPART_CHUNKSIZE // (1024 * 1024),
+        "--multipart-chunk-mb",
+        help="Part size and multipart threshold in MB for --no-stream downloads"
+    ),
+    transfer_concurrency: int = typer.Option(
+        DEFAULT_TRANSFER_CONCURRENCY,
+        "--transfer-concurrency",
+        help="Parallel ranged requests per object for --no-stream downloads"
+    ),
+    pool_tokens: List[str] = typer.Option(
+        None,
+        "--pool-token",
+        help="Extra OAuth token pickle or service-account key (.json) to spread Drive requests over (repeatable)"
+    ),
+    credential_strategy: str = typer.Option(
+        "least-loaded",
+        "--credential-strategy",
+        help=f"How Drive requests are spread over credentials: {', '.join(POOL_STRATEGIES)}"
+    ),
+    requests_per_second: float = typer.Option(
+        None,
+        "--requests-per-second",
+        help="Drive API request rate limit per credential (default: unlimited)"
     )
 ):
     """
@@ -347,46 +1022,83 @@ def transfer(
     console.print("[bold blue]S3 to Google Drive Transfer Tool[/bold blue]")
     console.print("="*60 + "\n")
     
+    # Open the checkpoint journal; without --resume it starts empty
+    journal_file = journal_file or f"s3_to_gdrive_{gdrive_folder_id}.journal.db"
+    journal = WatermarkJournal(journal_file, reset=not resume)
+    if resume:
+        console.print(f"[cyan]Resuming from {journal_file}:[/cyan] {len(journal.open_streams())} listing stream(s) "
+                      f"to continue, {len(journal.retry_keys)} key(s) to re-check or retry\n")
+    
     try:
-        transferer = S3ToGDriveTransfer(aws_profile=aws_profile)
+        retry_policy = RetryPolicy(max_attempts=max_retries, max_total_retries=retry_budget)
+        transferer = S3ToGDriveTransfer(aws_profile=aws_profile, retry_policy=retry_policy, stream=stream,
+                                         workers=workers, queue_size=queue_size,
+                                         list_depth=list_depth, list_workers=list_workers,
+                                         sync=sync, replace=replace, journal=journal, inventory=inventory,
+                                         inventory_filter=build_inventory_filter(include_prefix, exclude_prefix,
+                                                                                 min_size, max_size,
+                                                                                 modified_after, modified_before),
+                                         max_pool_connections=max_pool_connections,
+                                         transfer_config=make_transfer_config(multipart_chunk_mb * 1024 * 1024,
+                                                                              multipart_chunk_mb * 1024 * 1024,
+                                                                              transfer_concurrency),
+                                         pool_tokens=pool_tokens, credential_strategy=credential_strategy,
+                                         requests_per_second=requests_per_second)
         transferer.transfer(s3_path, gdrive_folder_id, csv_output)
         
     except Exception as e:
         console.print(f"\n[bold red]Error:[/bold red] {str(e)}")
         raise typer.Exit(code=1)
+    finally:
+        journal.close()
 
 
 @app.command()
 def list_s3(
     s3_path: str = typer.Argument(..., help="S3 path to list"),
-    aws_profile: str = typer.Option(None, "--profile", "-p", help="AWS profile name")
+    aws_profile: str = typer.Option(None, "--profile", "-p", help="AWS profile name"),
+    list_depth: int = typer.Option(DEFAULT_LIST_DEPTH, "--list-depth",
+                                   help="Folder levels to fan out over when listing (0 = single listing stream)"),
+    list_workers: int = typer.Option(DEFAULT_LIST_WORKERS, "--list-workers",
+                                     help="Number of concurrent listing streams"),
+    inventory: str = typer.Option(None, "--inventory",
+                                  help="Read objects from a local S3 Inventory report instead of listing"),
+    include_prefix: List[str] = typer.Option(None, "--include-prefix",
+                                             help="With --inventory, only keys starting with this prefix"),
+    exclude_prefix: List[str] = typer.Option(None, "--exclude-prefix",
+                                             help="With --inventory, skip keys starting with this prefix"),
+    min_size: str = typer.Option(None, "--min-size", help="With --inventory, skip smaller objects (e.g. 1M)"),
+    max_size: str = typer.Option(None, "--max-size", help="With --inventory, skip larger objects (e.g. 2G)"),
+    modified_after: str = typer.Option(None, "--modified-after",
+                                       help="With --inventory, only objects modified after this ISO date"),
+    modified_before: str = typer.Option(None, "--modified-before",
+                                        help="With --inventory, only objects modified before this ISO date")
 ):
     """
     List files in S3 path (useful for preview before transfer)
     """
     try:
-        if aws_profile:
-            session = boto3.Session(profile_name=aws_profile)
-            s3_client = session.client('s3')
-        else:
-            s3_client = boto3.client('s3')
-        
         s3_path = s3_path.replace('s3://', '')
         parts = s3_path.split('/', 1)
         bucket = parts[0]
         prefix = parts[1] if len(parts) > 1 else ''
         
         console.print(f"\n[cyan]Listing:[/cyan] s3://{bucket}/{prefix}\n")
-        
-        paginator = s3_client.get_paginator('list_objects_v2')
         count = 0
         
-        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    if not obj['Key'].endswith('/'):
-                        console.print(f"  📄 {obj['Key']}")
-                        count += 1
+        if inventory:
+            inventory_filter = build_inventory_filter(include_prefix, exclude_prefix, min_size, max_size,
+                                                      modified_after, modified_before)
+            objects = inventory_objects(inventory, bucket, prefix, inventory_filter)
+        else:
+            s3_client = make_s3_client(aws_profile, max_pool_connections=list_workers + 4)
+            lister = ParallelS3Lister(s3_client, depth=list_depth, workers=list_workers)
+            objects = lister.iter_objects(bucket, prefix)
+        
+        for obj in objects:
+            if not obj['Key'].endswith('/'):
+                console.print(f"  📄 {obj['Key']}")
+                count += 1
         
         console.print(f"\n[green]Total files: {count}[/green]")
         
@@ -0,0 +1,35 @@
+"""
+Shared fixtures: a fake Drive endpoint and, for the S3 side, a moto server.
+
+The scripts are top-level modules, so the repository root goes on sys.path.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_drive import FakeDrive  # noqa: E402
+
+
+@pytest.fixture
+def drive():
+    fake = FakeDrive().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def s3_endpoint(monkeypatch):
+    """URL of a moto server with test credentials set for boto3 and aiobotocore"""
+    server_module = pytest.importorskip('moto.server')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    server = server_module.ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f'http://{host}:{port}'
+    server.stop()
@@ -0,0 +1,289 @@
+"""
+In-process fake of the Drive v3 endpoints the transfer scripts use.
+
+Serves listing (with the query clauses the scripts send), metadata, media
+downloads with Range support, Workspace exports, creates, copies and
+multipart/resumable uploads over plain HTTP on localhost. Faults are opt-in:
+
+    quota            requests per second per bearer token; the rest get 429
+                     with Retry-After, like Drive's per-user rate limit
+    throttle_tokens  bearer tokens whose every request gets that 429
+    drop_downloads   {file_id: bytes} - the next media download of that file
+                     closes the connection after that many body bytes
+    lose_creates     the next N creates take effect but answer 503, like a
+                     response lost after the server committed the write
+
+``requests`` and ``throttled`` count calls per token, ``ranges`` the Range
+header of every media download per file.
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+CLAUSE_PATTERNS = [
+    (re.compile(r"^'([^']*)' in parents$"), lambda f, m: m.group(1) in f['parents']),
+    (re.compile(r"^name\s*=\s*'((?:[^'\\]|\\.)*)'$"),
+     lambda f, m: f['name'] == re.sub(r"\\(.)", r"\1", m.group(1))),
+    (re.compile(r"^mimeType\s*=\s*'([^']*)'$"), lambda f, m: f['mimeType'] == m.group(1)),
+    (re.compile(r"^mimeType\s*!=\s*'([^']*)'$"), lambda f, m: f['mimeType'] != m.group(1)),
+    (re.compile(r"^trashed\s*=\s*false$"), lambda f, m: True),
+    (re.compile(r"^createdTime\s*>\s*'([^']*)'$"), lambda f, m: f['createdTime'] > m.group(1)),
+]
+
+
+def matches(file: dict, query: str) -> bool:
+    for clause in query.split(' and '):
+        clause = clause.strip()
+        for pattern, check in CLAUSE_PATTERNS:
+            match = pattern.match(clause)
+            if match:
+                if not check(file, match):
+                    return False
+                break
+        else:
+            raise ValueError(f"Unsupported query clause: {clause}")
+    return True
+
+
+class FakeDrive:
+    def __init__(self, quota=None):
+        self.quota = quota
+        self.files = {}
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.throttled = Counter()
+        self.windows = Counter()
+        self.throttle_tokens = set()
+        self.drop_downloads = {}
+        self.ranges = defaultdict(list)
+        self.lose_creates = 0
+        self.sessions = {}
+        self.server = None
+
+    # -- setup -------------------------------------------------------------
+
+    def add(self, name, parent='root', content=b'', mime_type='application/octet-stream', file_id=None):
+        file_id = file_id or uuid.uuid4().hex[:12]
+        self.files[file_id] = {
+            'id': file_id, 'name': name, 'mimeType': mime_type, 'parents': [parent], 'content': content,
+            'createdTime': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'modifiedTime': '2024-01-01T00:00:00.000Z',
+        }
+        return file_id
+
+    def add_folder(self, name, parent='root'):
+        return self.add(name, parent, mime_type=FOLDER_MIME_TYPE)
+
+    def named(self, name):
+        return [f for f in self.files.values() if f['name'] == name]
+
+    def start(self):
+        drive = self
+
+        class Handler(RequestHandler):
+            pass
+
+        Handler.drive = drive
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    # -- helpers used by the handler ---------------------------------------
+
+    def admit(self, token) -> bool:
+        """Count a request against the token's quota; False when it is over."""
+        with self.lock:
+            self.requests[token] += 1
+            if token in self.throttle_tokens:
+                self.throttled[token] += 1
+                return False
+            if self.quota is None:
+                return True
+            window = (token, int(time.time()))
+            self.windows[window] += 1
+            if self.windows[window] > self.quota:
+                self.throttled[token] += 1
+                return False
+            return True
+
+    def create(self, metadata, content=b''):
+        file_id = self.add(metadata.get('name', 'untitled'), (metadata.get('parents') or ['root'])[0],
+                           content, metadata.get('mimeType', 'application/octet-stream'))
+        with self.lock:
+            lost = self.lose_creates > 0
+            if lost:
+                self.lose_creates -= 1
+        return self.files[file_id], lost
+
+
+def public(file):
+    info = {key: value for key, value in file.items() if key != 'content'}
+    if file['mimeType'] != FOLDER_MIME_TYPE and not file['mimeType'].startswith('application/vnd.google-apps.'):
+        info['size'] = str(len(file['content']))
+    return info
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    drive = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=b'', headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def error(self, status, reason, headers=None):
+        self.send(status, {'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}, headers)
+
+    def body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def route(self, method):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        # The upload session endpoint is addressed without the API prefix
+        payload = self.body() if method in ('POST', 'PUT') else b''
+        token = self.headers.get('Authorization', '').rpartition(' ')[2]
+        if not self.drive.admit(token):
+            return self.error(429, 'rateLimitExceeded', {'Retry-After': '1'})
+
+        if path.startswith('/session/'):
+            return self.upload_chunk(path.rsplit('/', 1)[1], payload)
+        path = re.sub(r'^/(upload/)?drive/v3', lambda m: '/upload' if m.group(1) else '', path)
+
+        if method == 'GET' and path == '/files':
+            return self.list_files(params)
+        match = re.match(r'^/files/([^/]+)(/export|/copy)?$', path)
+        if method == 'GET' and match and match.group(2) == '/export':
+            file = self.drive.files.get(match.group(1))
+            if file is None:
+                return self.error(404, 'notFound')
+            return self.send(200, b'exported:' + file['name'].encode(), {'Content-Type': params.get('mimeType')})
+        if method == 'GET' and match:
+            file = self.drive.files.get(match.group(1))
+            if file is None:
+                return self.error(404, 'notFound')
+            if params.get('alt') == 'media':
+                return self.download(file)
+            return self.send(200, public(file))
+        if method == 'POST' and match and match.group(2) == '/copy':
+            source = self.drive.files[match.group(1)]
+            metadata = {'mimeType': source['mimeType'], **json.loads(payload or b'{}')}
+            return self.created(*self.drive.create(metadata, source['content']))
+        if method == 'POST' and path == '/files':
+            return self.created(*self.drive.create(json.loads(payload or b'{}')))
+        if method == 'POST' and path == '/upload/files':
+            return self.upload_start(params, payload)
+        return self.error(404, 'notFound')
+
+    def created(self, file, lost):
+        if lost:
+            return self.error(503, 'backendError')
+        self.send(200, public(file))
+
+    def list_files(self, params):
+        query = params.get('q', '')
+        files = sorted((f for f in self.drive.files.values() if matches(f, query)),
+                       key=lambda f: f['createdTime'] if params.get('orderBy') == 'createdTime' else f['name'])
+        start = int(params.get('pageToken') or 0)
+        size = int(params.get('pageSize') or 100)
+        page = {'files': [public(f) for f in files[start:start + size]]}
+        if start + size < len(files):
+            page['nextPageToken'] = str(start + size)
+        self.send(200, page)
+
+    def download(self, file):
+        content = file['content']
+        self.drive.ranges[file['id']].append(self.headers.get('Range'))
+        start, end = 0, len(content) - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(end, int(match.group(2)))
+        body = content[start:end + 1]
+        status = 206 if match else 200
+        drop = self.drive.drop_downloads.pop(file['id'], None)
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        if match:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(content)}')
+        self.end_headers()
+        if drop is not None:
+            # Send part of the body, then cut the connection
+            self.wfile.write(body[:drop])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def upload_start(self, params, payload):
+        upload_type = params.get('uploadType')
+        if upload_type == 'multipart':
+            message = BytesParser().parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + payload)
+            metadata_part, media_part = message.get_payload()
+            metadata = json.loads(metadata_part.get_payload(decode=True))
+            return self.created(*self.drive.create(metadata, media_part.get_payload(decode=True)))
+        if upload_type == 'resumable':
+            session_id = uuid.uuid4().hex
+            self.drive.sessions[session_id] = {'metadata': json.loads(payload or b'{}'), 'data': bytearray()}
+            return self.send(200, b'', {'Location': f'{self.drive.url}/session/{session_id}'})
+        return self.error(400, 'badRequest')
+
+    def upload_chunk(self, session_id, payload):
+        session = self.drive.sessions.get(session_id)
+        if session is None:
+            return self.error(404, 'notFound')
+        if 'file' in session:
+            return self.send(200, public(session['file']))
+        content_range = self.headers.get('Content-Range', '')
+        match = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', content_range)
+        if match:
+            if int(match.group(1)) != len(session['data']):
+                return self.error(400, 'badContentRange')
+            session['data'] += payload
+        total = content_range.rsplit('/', 1)[1]
+        if total != '*' and len(session['data']) == int(total):
+            session['file'], lost = self.drive.create(session['metadata'], bytes(session['data']))
+            return self.created(session['file'], lost)
+        headers = {'Range': f"bytes=0-{len(session['data']) - 1}"} if session['data'] else {}
+        self.send(308, b'', headers)
+
+    def do_GET(self):
+        self.route('GET')
+
+    def do_POST(self):
+        self.route('POST')
+
+    def do_PUT(self):
+        self.route('PUT')
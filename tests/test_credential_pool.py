@@ -0,0 +1,147 @@
+"""
+CredentialPool against the fake Drive endpoint: credential choice, backoff
+and the per-credential token bucket.
+
+Timing is checked on a fake clock, through the waits the pool computes,
+rather than by measuring real sleeps.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('google.oauth2')
+pytest.importorskip('googleapiclient')
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+
+import credential_pool  # noqa: E402
+from credential_pool import CredentialPool, PooledCredential, RateLimiter, pick_service  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+
+class FakeClock:
+    """Monotonic clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_pool(drive, tokens, **kwargs) -> CredentialPool:
+    return CredentialPool([Credentials(token=token) for token in tokens], names=list(tokens),
+                          api_endpoint=f'{drive.url}/drive/v3/', **kwargs)
+
+
+def get_file(pool, file_id, retry_policy=None):
+    retry_policy = retry_policy or RetryPolicy(base_delay=0.01, max_delay=0.05)
+    return retry_policy.run(lambda: pick_service(pool).files().get(fileId=file_id, fields='id, name').execute())
+
+
+def test_rate_limiter_spaces_requests():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=20, clock=clock)
+    # The first token is in the bucket, the other ten arrive at 20 per second
+    waits = [limiter.reserve() for _ in range(11)]
+    assert waits == pytest.approx([i * 0.05 for i in range(11)])
+
+    # Once the debt is paid off the bucket refills at the same rate
+    clock.now = 0.5
+    assert limiter.reserve() == pytest.approx(0.05)
+    clock.now = 10.0
+    assert limiter.reserve() == 0.0
+
+
+def test_rate_limiter_without_rate_never_waits():
+    limiter = RateLimiter()
+    assert [limiter.reserve() for _ in range(100)] == [0.0] * 100
+
+
+def test_concurrent_throttles_escalate_backoff_once():
+    clock = FakeClock()
+    member = PooledCredential('a', creds=None, clock=clock)
+    for _ in range(5):
+        member.throttled()
+    assert member.backoff == credential_pool.BASE_BACKOFF
+    assert member.backing_off()
+    assert member.turn_delay() == credential_pool.BASE_BACKOFF
+
+    clock.now = member.backoff_until
+    assert not member.backing_off()
+    member.throttled(retry_after=10)
+    assert member.backoff == 2 * credential_pool.BASE_BACKOFF
+    assert member.backoff_until == clock.now + 10
+
+    member.succeeded()
+    assert member.backoff == 0
+
+
+@pytest.mark.parametrize('strategy', ['least-loaded', 'round-robin'])
+def test_choose_skips_credentials_in_backoff(drive, strategy):
+    pool = make_pool(drive, ['a', 'b', 'c'], strategy=strategy, clock=FakeClock())
+    pool.members[1].throttled()
+    chosen = {pool.choose().name for _ in range(30)}
+    assert chosen == {'a', 'c'}
+
+
+def test_round_robin_falls_back_to_first_to_recover(drive):
+    pool = make_pool(drive, ['a', 'b', 'c'], strategy='round-robin', clock=FakeClock())
+    for member, delay in zip(pool.members, (30, 5, 20)):
+        member.backoff_until = delay
+    assert {pool.choose().name for _ in range(6)} == {'b'}
+
+
+def test_least_loaded_prefers_idle_credential(drive):
+    pool = make_pool(drive, ['a', 'b'])
+    pool.members[0].in_flight = 3
+    assert {pool.choose().name for _ in range(10)} == {'b'}
+
+
+def test_throttled_response_backs_off_and_retry_moves_credential(drive):
+    file_id = drive.add('x.txt', content=b'x')
+    drive.throttle_tokens.add('a')
+    # The clock stands still, so 'a' stays in backoff for the whole test
+    pool = make_pool(drive, ['a', 'b'], strategy='round-robin', clock=FakeClock())
+
+    for _ in range(4):
+        assert get_file(pool, file_id)['id'] == file_id
+
+    a, b = pool.members
+    assert drive.throttled['a'] >= 1
+    assert a.throttled_count == drive.throttled['a']
+    assert a.backing_off()
+    assert drive.requests['b'] == b.requests == 4
+
+
+def test_pool_spreads_load_over_quota(drive):
+    drive.quota = 5
+    file_id = drive.add('x.txt')
+    pool = make_pool(drive, ['a', 'b', 'c'])
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda _: get_file(pool, file_id), range(30)))
+
+    assert all(result['id'] == file_id for result in results)
+    assert all(drive.requests[name] > 0 for name in 'abc')
+
+
+def test_rate_limit_keeps_each_credential_under_quota(drive):
+    clock = FakeClock()
+    pool = make_pool(drive, ['a', 'b'], rate=4, clock=clock)
+
+    starts = {'a': [], 'b': []}
+    for _ in range(16):
+        member = pool.choose()
+        starts[member.name].append(clock.now + member.turn_delay())
+        member.started()
+        member.finished(200)
+
+    # Least-loaded alternates the idle credentials, and each is spaced at 4 per second
+    for name in ('a', 'b'):
+        assert starts[name] == pytest.approx([i * 0.25 for i in range(8)])
+        # Like the fake Drive's quota, count requests per one-second window
+        windows = Counter(int(round(start, 6)) for start in starts[name])
+        assert max(windows.values()) <= 4
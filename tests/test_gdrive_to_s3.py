@@ -0,0 +1,58 @@
+"""
+GDriveToS3Transfer's thread engine streaming from the fake Drive into moto S3.
+
+Requirements:
+    pip install pytest "moto[server]"
+"""
+
+import pytest
+
+pytest.importorskip('google.oauth2')
+pytest.importorskip('googleapiclient')
+
+import boto3  # noqa: E402
+from google.oauth2.credentials import Credentials  # noqa: E402
+
+import gdrive_to_s3  # noqa: E402
+from credential_pool import CredentialPool  # noqa: E402
+from gdrive_to_s3 import GDriveToS3Transfer  # noqa: E402
+from progress_reporter import ProgressReporter  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+BUCKET = 'transfer-test'
+MB = 1024 * 1024
+PART_SIZE = 5 * MB
+
+
+def pattern(size: int, seed: int = 0) -> bytes:
+    return bytes((i * 7 + seed) % 251 for i in range(size))
+
+
+@pytest.mark.parametrize('size, buffers', [(1000, [1000]), (7 * MB, [PART_SIZE] * 2),
+                                           (12 * MB + 5, [PART_SIZE] * 3)])
+def test_part_ring_matches_the_reservation(drive, s3_endpoint, monkeypatch, size, buffers):
+    s3 = boto3.client('s3', endpoint_url=s3_endpoint)
+    s3.create_bucket(Bucket=BUCKET)
+    content = pattern(size)
+    drive.add('file.bin', content=content)
+    transfer = GDriveToS3Transfer(BUCKET, 'backup', RetryPolicy(base_delay=0.01, max_delay=0.05),
+                                  min_part_size=PART_SIZE, workers=1, s3_endpoint_url=s3_endpoint,
+                                  reporter=ProgressReporter(mode='quiet'))
+    transfer.pool = CredentialPool([Credentials(token='test-token')], api_endpoint=f'{drive.url}/drive/v3/')
+
+    allocated = []
+    part_buffer = gdrive_to_s3.PartBuffer
+
+    def recording_buffer(capacity):
+        allocated.append(capacity)
+        return part_buffer(capacity)
+
+    monkeypatch.setattr(gdrive_to_s3, 'PartBuffer', recording_buffer)
+
+    transfer.process_folder_recursively('root')
+
+    assert transfer.failed_count == 0
+    assert s3.get_object(Bucket=BUCKET, Key='backup/file.bin')['Body'].read() == content
+    # Buffers are sized to the file, and the budget reserves exactly what is allocated
+    assert allocated == buffers
+    assert transfer.inflight_size({'mimeType': 'application/octet-stream', 'size': str(size)}) == sum(buffers)
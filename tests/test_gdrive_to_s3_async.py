@@ -0,0 +1,159 @@
+"""
+AsyncTransferEngine end to end: fake Drive in, moto S3 out.
+
+Requirements:
+    pip install pytest "moto[server]" aiohttp aiobotocore
+"""
+
+import hashlib
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('aiobotocore')
+
+import boto3  # noqa: E402
+from google.oauth2.credentials import Credentials  # noqa: E402
+
+from byte_budget import ByteBudget  # noqa: E402
+from credential_pool import CredentialPool  # noqa: E402
+from gdrive_to_s3 import GDriveToS3Transfer  # noqa: E402
+from gdrive_to_s3_async import run_async_transfer  # noqa: E402
+from progress_reporter import ProgressReporter  # noqa: E402
+from retry_policy import RetryPolicy  # noqa: E402
+
+BUCKET = 'transfer-test'
+MB = 1024 * 1024
+# Smallest part S3 accepts for all but the last part
+PART_SIZE = 5 * MB
+
+
+@pytest.fixture
+def s3(s3_endpoint):
+    client = boto3.client('s3', endpoint_url=s3_endpoint)
+    client.create_bucket(Bucket=BUCKET)
+    return client
+
+
+def make_transfer(s3_endpoint, tokens=('test-token',)) -> GDriveToS3Transfer:
+    transfer = GDriveToS3Transfer(BUCKET, 'backup', retry_policy=RetryPolicy(base_delay=0.01, max_delay=0.05),
+                                  min_part_size=PART_SIZE, s3_endpoint_url=s3_endpoint,
+                                  reporter=ProgressReporter(mode='quiet'))
+    transfer.pool = CredentialPool([Credentials(token=token) for token in tokens], names=list(tokens))
+    return transfer
+
+
+def run(transfer, drive, s3_endpoint, folder_id='root'):
+    run_async_transfer(transfer, folder_id, list_concurrency=2, download_concurrency=4, upload_concurrency=4,
+                       s3_endpoint_url=s3_endpoint, drive_url=f'{drive.url}/drive/v3')
+    return {record['s3_key']: record for record in transfer.metadata_records}
+
+
+def pattern(size: int, seed: int = 0) -> bytes:
+    return bytes((i * 7 + seed) % 251 for i in range(size))
+
+
+def test_small_file_and_folder_tree(drive, s3, s3_endpoint):
+    folder = drive.add_folder('docs')
+    drive.add('a.txt', content=b'hello')
+    drive.add('b.bin', parent=folder, content=pattern(1000))
+    transfer = make_transfer(s3_endpoint)
+
+    records = run(transfer, drive, s3_endpoint)
+
+    assert transfer.failed_count == 0
+    assert set(records) == {'backup/a.txt', 'backup/docs/b.bin'}
+    assert s3.get_object(Bucket=BUCKET, Key='backup/a.txt')['Body'].read() == b'hello'
+    assert s3.get_object(Bucket=BUCKET, Key='backup/docs/b.bin')['Body'].read() == pattern(1000)
+
+
+def test_large_file_completes_multipart_upload(drive, s3, s3_endpoint):
+    content = pattern(12 * MB + 123)
+    drive.add('big.bin', content=content)
+    transfer = make_transfer(s3_endpoint)
+
+    records = run(transfer, drive, s3_endpoint)
+
+    assert records['backup/big.bin']['transfer_status'] == 'SUCCESS'
+    head = s3.head_object(Bucket=BUCKET, Key='backup/big.bin')
+    # 5 MB + 5 MB + the remainder
+    assert head['ETag'].strip('"').endswith('-3')
+    assert head['ContentLength'] == len(content)
+    body = s3.get_object(Bucket=BUCKET, Key='backup/big.bin')['Body'].read()
+    assert hashlib.md5(body).digest() == hashlib.md5(content).digest()
+    assert not s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads')
+
+
+def test_dropped_download_resumes_with_range(drive, s3, s3_endpoint):
+    content = pattern(7 * MB, seed=3)
+    file_id = drive.add('flaky.bin', content=content)
+    # The first download is cut off part-way through the second part
+    drive.drop_downloads[file_id] = 6 * MB
+    transfer = make_transfer(s3_endpoint)
+
+    records = run(transfer, drive, s3_endpoint)
+
+    assert records['backup/flaky.bin']['transfer_status'] == 'SUCCESS'
+    assert file_id not in drive.drop_downloads
+    assert drive.ranges[file_id] == [None, f'bytes={6 * MB}-']
+    assert s3.get_object(Bucket=BUCKET, Key='backup/flaky.bin')['Body'].read() == content
+
+
+class PeakBudget(ByteBudget):
+    """ByteBudget that remembers the most bytes it ever had reserved"""
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes)
+        self.peak = 0
+
+    async def acquire_async(self, size):
+        reserved = await super().acquire_async(size)
+        self.peak = max(self.peak, self.in_flight)
+        return reserved
+
+
+def test_inflight_budget_bounds_concurrent_files(drive, s3, s3_endpoint):
+    contents = {f'big{i}.bin': pattern(6 * MB, seed=i) for i in range(3)}
+    for name, content in contents.items():
+        drive.add(name, content=content)
+    transfer = make_transfer(s3_endpoint)
+    # Each 6 MB file reserves two 5 MB part buffers; the budget fits one file at a time
+    transfer.budget = PeakBudget(11 * MB)
+
+    records = run(transfer, drive, s3_endpoint)
+
+    assert transfer.failed_count == 0
+    assert len(records) == 3
+    assert transfer.budget.peak == 10 * MB
+    assert transfer.budget.in_flight == 0
+    for name, content in contents.items():
+        assert s3.get_object(Bucket=BUCKET, Key=f'backup/{name}')['Body'].read() == content
+
+
+def test_workspace_file_is_exported(drive, s3, s3_endpoint):
+    drive.add('Report', mime_type='application/vnd.google-apps.document')
+    drive.add('Notes', mime_type='application/vnd.google-apps.unknown')
+    transfer = make_transfer(s3_endpoint)
+
+    records = run(transfer, drive, s3_endpoint)
+
+    assert records['backup/Report.docx']['transfer_status'] == 'SUCCESS'
+    assert s3.get_object(Bucket=BUCKET, Key='backup/Report.docx')['Body'].read() == b'exported:Report'
+    assert transfer.transferred_count == 1
+    assert transfer.failed_count == 1
+
+
+def test_requests_move_off_a_throttled_credential(drive, s3, s3_endpoint):
+    for i in range(6):
+        drive.add(f'f{i}.txt', content=pattern(100, seed=i))
+    drive.throttle_tokens.add('a')
+    transfer = make_transfer(s3_endpoint, tokens=('a', 'b'))
+
+    records = run(transfer, drive, s3_endpoint)
+
+    assert transfer.failed_count == 0
+    assert len(records) == 6
+    a, b = transfer.pool.members
+    assert drive.throttled['a'] == a.throttled_count >= 1
+    assert drive.requests['b'] == b.requests >= 7
+    assert a.in_flight == b.in_flight == 0